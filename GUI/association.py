@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from loader import CATEGORY_LIMIT
+
+MEASURES = ('cramers_v', 'mutual_information', 'correlation_ratio')
+# Numeric columns with more distinct values than this are continuous, as in the GUI's column types
+CATEGORICAL_LIMIT = 25
+# Quantile bins a continuous column is cut into for the contingency tables
+BINS = 10
+# Contingency cells and columns counted in one bincount
+BATCH_CELLS = 1 << 22
+BATCH_COLUMNS = 64
+# Rows x columns of pair keys built for one bincount (int64: 128 MB), which caps the batch
+# width on long tables
+BATCH_KEYS = 1 << 24
+# Rows x column pairs below which starting worker processes costs more than it saves
+PARALLEL_MIN_WORK = 20_000_000
+# Results kept per (dataset version, columns)
+CACHE_SIZE = 8
+# Columns above which the heatmap drops its tick labels
+TICK_LABEL_LIMIT = 120
+
+_cache = OrderedDict()
+_worker = {}
+
+
+def _is_numeric(values):
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def encode_columns(data, columns):
+    # Every column factorized once: (n rows, m columns) codes with -1 for missing, their
+    # cardinalities, and the values of the continuous columns, which are cut into quantile
+    # bins for the contingency tables. Text columns with more than CATEGORY_LIMIT values are
+    # identifiers, not attributes, and are skipped.
+    kept, codes, cardinalities, kinds, continuous, skipped = [], [], [], [], {}, []
+    for column in columns:
+        series = data[column]
+        numeric = _is_numeric(series)
+        distinct = series.nunique()
+        if numeric and distinct > CATEGORICAL_LIMIT:
+            numbers = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            bins = pd.qcut(numbers, BINS, labels=False, duplicates='drop')
+            column_codes = np.where(np.isnan(bins), -1, bins).astype(np.int64)
+            continuous[len(kept)] = numbers
+            kinds.append('continuous')
+        elif not numeric and distinct > CATEGORY_LIMIT:
+            skipped.append(column)
+            continue
+        else:
+            column_codes, _ = pd.factorize(series)
+            kinds.append('categorical')
+        kept.append(column)
+        codes.append(column_codes.astype(np.int64, copy=False))
+        cardinalities.append(max(int(column_codes.max(initial=-1)) + 1, 1))
+    matrix = np.column_stack(codes) if codes else np.empty((len(data), 0), dtype=np.int64)
+    return kept, matrix, np.array(cardinalities, dtype=np.int64), kinds, continuous, skipped
+
+
+def _init_worker(codes, cardinalities, kinds, continuous):
+    _worker.update(codes=codes, cardinalities=cardinalities, kinds=kinds, continuous=continuous)
+
+
+def _batches(columns, cells, width=BATCH_COLUMNS):
+    batch, total = [], 0
+    for column, size in zip(columns, cells):
+        if batch and (total + size > BATCH_CELLS or len(batch) == width):
+            yield np.array(batch)
+            batch, total = [], 0
+        batch.append(column)
+        total += size
+    if batch:
+        yield np.array(batch)
+
+
+def _contingency_measures(x, rx, y, cy):
+    # Cramer's V and mutual information (bits) of column x against every column of y at
+    # once: the contingency tables of all pairs are laid end to end and counted with one
+    # bincount, then reduced per table with bincounts over the table index
+    b = y.shape[1]
+    sizes = rx * cy
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    valid = (x >= 0)[:, None] & (y >= 0)
+    keys = offsets + x[:, None] * cy + y
+    table = np.bincount(keys[valid], minlength=int(sizes.sum())).astype(np.float64)
+    segment = np.repeat(np.arange(b), sizes)
+    local = np.arange(len(table)) - offsets[segment]
+    rows, cols = local // cy[segment], local % cy[segment]
+    row_sums = np.bincount(segment * rx + rows, table, minlength=b * rx)
+    col_offsets = np.concatenate([[0], np.cumsum(cy)[:-1]])
+    col_sums = np.bincount(col_offsets[segment] + cols, table, minlength=int(cy.sum()))
+    n = np.bincount(segment, table, minlength=b)
+
+    filled = table > 0
+    cell, seg = table[filled], segment[filled]
+    outer = row_sums[(segment * rx + rows)[filled]] * col_sums[(col_offsets[segment] + cols)[filled]]
+    mutual_information = np.bincount(seg, cell / n[seg] * np.log2(cell * n[seg] / outer), minlength=b)
+    chi2 = n * (np.bincount(seg, cell ** 2 / outer, minlength=b) - 1)
+    used_rows = (row_sums.reshape(b, rx) > 0).sum(axis=1)
+    used_cols = np.bincount(np.repeat(np.arange(b), cy), col_sums > 0, minlength=b)
+    dof = np.minimum(used_rows, used_cols) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cramers_v = np.where((dof > 0) & (n > 0), np.sqrt(np.maximum(chi2, 0) / n / dof), np.nan)
+    return cramers_v, np.where(n > 0, mutual_information, np.nan)
+
+
+def _correlation_ratio(x, rx, y):
+    # eta: how much of the variance of a continuous y the groups of x explain
+    ok = (x >= 0) & ~np.isnan(y)
+    if not ok.any():
+        return np.nan
+    counts = np.bincount(x[ok], minlength=rx)
+    sums = np.bincount(x[ok], y[ok], minlength=rx)
+    mean = y[ok].mean()
+    total = ((y[ok] - mean) ** 2).sum()
+    if not total:
+        return np.nan
+    between = (sums[counts > 0] ** 2 / counts[counts > 0]).sum() - ok.sum() * mean ** 2
+    return float(np.sqrt(min(max(between / total, 0.0), 1.0)))
+
+
+def _column_associations(i):
+    # Row i of the three matrices: V and MI against the columns after i, eta of every
+    # continuous column grouped by column i
+    codes, cardinalities = _worker['codes'], _worker['cardinalities']
+    m = codes.shape[1]
+    x, rx = codes[:, i], cardinalities[i]
+    cramers_v, mutual_information, eta = np.full(m, np.nan), np.full(m, np.nan), np.full(m, np.nan)
+    others = np.arange(i + 1, m)
+    width = min(BATCH_COLUMNS, max(BATCH_KEYS // max(len(codes), 1), 1))
+    for batch in _batches(others, rx * cardinalities[others], width):
+        cramers_v[batch], mutual_information[batch] = _contingency_measures(x, rx, codes[:, batch], cardinalities[batch])
+    if _worker['kinds'][i] == 'categorical':
+        for j, values in _worker['continuous'].items():
+            if j != i:
+                eta[j] = _correlation_ratio(x, rx, values)
+    counts = np.bincount(x[x >= 0], minlength=rx)
+    shares = counts[counts > 0] / counts.sum() if counts.sum() else np.array([])
+    mutual_information[i] = float(-(shares * np.log2(shares)).sum())  # The entropy of the column
+    cramers_v[i] = 1.0
+    return cramers_v, mutual_information, eta
+
+
+def compute_associations(data, columns=None, workers=None):
+    # Cramer's V, mutual information and correlation ratio of every pair of columns. The rows
+    # of the matrices are computed in worker processes (workers=1 runs them in this process,
+    # as does work too small to be worth a pool). Workers are spawned, not forked: the GUI
+    # calls this from a pool thread of a running Qt process, whose threads a fork would copy
+    # in whatever state they are in.
+    start = time.perf_counter()
+    columns = list(data.columns) if columns is None else list(columns)
+    kept, codes, cardinalities, kinds, continuous, skipped = encode_columns(data, columns)
+    m = len(kept)
+    args = (codes, cardinalities, kinds, continuous)
+    if workers == 1 or (os.cpu_count() or 1) == 1 or len(codes) * m * (m - 1) // 2 < PARALLEL_MIN_WORK:
+        _init_worker(*args)
+        try:
+            rows = [_column_associations(i) for i in range(m)]
+        finally:
+            _worker.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=args) as executor:
+            rows = list(executor.map(_column_associations, range(m)))
+
+    matrices = {}
+    for position, name in enumerate(MEASURES):
+        matrix = np.array([row[position] for row in rows]).reshape(m, m)
+        if name != 'correlation_ratio':
+            # Rows hold the pairs after the diagonal; the lower triangle mirrors them
+            lower = np.tril_indices(m, -1)
+            matrix[lower] = matrix.T[lower]
+        matrices[name] = pd.DataFrame(matrix, index=kept, columns=kept)
+    return {'columns': kept, 'kinds': dict(zip(kept, kinds)), 'skipped': skipped,
+            'seconds': time.perf_counter() - start, **matrices}
+
+
+def dataset_version(data):
+    # Fingerprint of the contents, for callers that do not track a version of their own
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('|'.join(map(str, data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def cached_associations(data, columns=None, version=None, workers=None):
+    # compute_associations kept per (dataset version, columns): the GUI passes its edit
+    # counter, otherwise the contents are fingerprinted
+    columns = list(data.columns) if columns is None else list(columns)
+    key = (dataset_version(data[columns]) if version is None else version, tuple(columns))
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    result = compute_associations(data, columns, workers)
+    _cache[key] = result
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
+
+
+def leakage(result, sensitive_attr, top=None):
+    # Columns ranked by how strongly they are associated with a sensitive attribute; eta is
+    # taken in whichever direction has a continuous column
+    others = [column for column in result['columns'] if column != sensitive_attr]
+    eta = result['correlation_ratio']
+    ranking = pd.DataFrame({
+        'cramers_v': result['cramers_v'].loc[others, sensitive_attr],
+        'mutual_information': result['mutual_information'].loc[others, sensitive_attr],
+        'correlation_ratio': eta.loc[others, sensitive_attr].fillna(eta.loc[sensitive_attr, others]),
+        'kind': [result['kinds'][column] for column in others],
+    }).sort_values('cramers_v', ascending=False)
+    return ranking.head(top) if top else ranking
+
+
+def draw_heatmap(result, measure='cramers_v', figure=None):
+    # One measure as a heatmap; mutual information is scaled by the smaller entropy of the
+    # pair so its colours span 0-1 like the others
+    figure = figure or Figure(figsize=(12, 10))
+    figure.clear()
+    ax = figure.add_subplot(111)
+    matrix = result[measure].to_numpy()
+    if measure == 'mutual_information':
+        entropy = np.diag(matrix)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = matrix / np.minimum.outer(entropy, entropy)
+    image = ax.imshow(np.clip(matrix, 0, 1), cmap='viridis', vmin=0, vmax=1, interpolation='nearest')
+    figure.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+    columns = result['columns']
+    if len(columns) <= TICK_LABEL_LIMIT:
+        fontsize = 8 if len(columns) <= 40 else 5
+        ax.set_xticks(range(len(columns)), columns, rotation=90, fontsize=fontsize)
+        ax.set_yticks(range(len(columns)), columns, fontsize=fontsize)
+    else:
+        ax.set_xticks([])
+        ax.set_yticks([])
+    ax.set_title(measure.replace('_', ' ').capitalize() + (' (normalized)' if measure == 'mutual_information' else ''))
+    figure.tight_layout()
+    return figure
+
+
+if __name__ == "__main__":
+    from loader import read_table
+
+    parser = argparse.ArgumentParser(description="Association of every pair of columns of a CSV/TSV.")
+    parser.add_argument('table', help="CSV/TSV file")
+    parser.add_argument('--columns', default=None, help="Comma-separated columns (default: all)")
+    parser.add_argument('--sensitive', default=None, help="Rank the columns by their association with this one")
+    parser.add_argument('--measure', choices=MEASURES, default='cramers_v', help="Matrix to write without --sensitive")
+    parser.add_argument('--top', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument('-o', '--output', default=None, help="CSV file (default: standard output)")
+    args = parser.parse_args()
+
+    data, _, _ = read_table(args.table)
+    columns = [column.strip() for column in args.columns.split(',')] if args.columns else None
+    if columns is not None and args.sensitive and args.sensitive not in columns:
+        columns.append(args.sensitive)
+    result = compute_associations(data, columns, args.workers)
+    table = leakage(result, args.sensitive, args.top) if args.sensitive else result[args.measure]
+    table.to_csv(args.output or sys.stdout)
@@ -0,0 +1,334 @@
+import json
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # The out-of-core backend is unavailable without pyarrow
+    pa = feather = None
+
+from cache import FrameCache, cached_read_table
+from disclosure import ContingencyTable
+from equivalence import ColumnEncoder, EquivalenceClasses, leave_one_out, privacy_summary, rank_column_removals
+from loader import CHUNK_SIZE, NA_SENTINELS, as_text, peak_memory_mb
+from sketches import column_hashes, row_hashes
+
+BACKENDS = ('pandas', 'arrow')
+# Bump when the converted dataset layout changes
+DATASET_VERSION = 2
+# Memory one partition of the out-of-core group-by may use
+MEMORY_LIMIT_MB = 1024
+# Rough in-memory cost of one value of a partition, object strings included
+BYTES_PER_VALUE = 64
+# Distinct values tracked exactly per column while converting; above this a column is counted by partition
+DISTINCT_LIMIT = 100_000
+
+
+class PandasBackend:
+    # The whole file as one in-memory DataFrame (the default, and what the preview page needs)
+    name = 'pandas'
+    in_memory = True
+
+    def load(self, file_path, progress=None):
+        return cached_read_table(file_path, progress=progress)
+
+    def privacy_summary(self, data, columns, sensitive_attrs=None, progress=None, l=2):
+        return privacy_summary(data, columns, sensitive_attrs, progress, l)
+
+    def rank_column_removals(self, data, columns, progress=None):
+        return rank_column_removals(data, columns, progress=progress)
+
+
+class ArrowBackend:
+    # Files larger than memory: converted once into Feather chunks, then grouped a
+    # hash partition at a time, with the same results as the pandas backend
+    name = 'arrow'
+    in_memory = False
+
+    def __init__(self, memory_limit_mb=MEMORY_LIMIT_MB):
+        if feather is None:
+            raise ImportError("The arrow backend needs pyarrow")
+        self.memory_limit_mb = memory_limit_mb
+
+    def load(self, file_path, progress=None):
+        return ArrowDataset.convert(file_path, progress=progress, memory_limit_mb=self.memory_limit_mb)
+
+    def privacy_summary(self, data, columns, sensitive_attrs=None, progress=None, l=2):
+        return data.privacy_summary(columns, sensitive_attrs, progress, l)
+
+    def rank_column_removals(self, data, columns, progress=None):
+        return data.rank_column_removals(columns, progress)
+
+
+def available_backends():
+    return [name for name in BACKENDS if name == 'pandas' or feather is not None]
+
+
+def get_backend(name='pandas', **options):
+    if name == 'pandas':
+        return PandasBackend()
+    if name == 'arrow':
+        return ArrowBackend(**options)
+    raise ValueError(f"Unknown backend {name!r}; expected one of {BACKENDS}")
+
+
+def _canonical(series, kind):
+    # One representation per value whatever the chunk it was parsed in: numbers as float64
+    # (an integer chunk and a chunk with missing values then agree), everything else as text
+    if kind == 'numeric':
+        return pd.to_numeric(series, errors='coerce').astype(np.float64)
+    return as_text(series)
+
+
+def _kind(series):
+    dtype = series.dtype
+    return 'numeric' if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) else 'text'
+
+
+class ArrowDataset:
+    # A CSV/TSV converted into uncompressed Feather chunks in its cache directory, keyed
+    # by the file's content hash. Only the columns a metric needs are read back,
+    # memory-mapped, one chunk at a time. Grouping spills rows into hash partitions sized
+    # to the memory limit, and every class lies wholly in one partition.
+    def __init__(self, directory, metadata, memory_limit_mb=MEMORY_LIMIT_MB):
+        self.directory = directory
+        self.metadata = metadata
+        self.columns = metadata['columns']
+        self.kinds = metadata['kinds']
+        self.rows = metadata['rows']
+        self.column_unique_counts = metadata['column_unique_counts']
+        self.memory_limit_mb = memory_limit_mb
+
+    def __len__(self):
+        return self.rows
+
+    @classmethod
+    def convert(cls, file_path, chunksize=CHUNK_SIZE, progress=None, memory_limit_mb=MEMORY_LIMIT_MB):
+        # (dataset, column unique counts, load report), like read_table
+        start = time.perf_counter()
+        cache = FrameCache.for_file(file_path)
+        key = cache.key(os.path.basename(file_path) + '.dataset', [file_path], DATASET_VERSION)
+        directory = os.path.join(cache.directory, f"{os.path.basename(file_path)}-{key}.dataset")
+        metadata_path = os.path.join(directory, 'metadata.json')
+        cached = os.path.exists(metadata_path)
+        if cached:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            dataset = cls(directory, metadata, memory_limit_mb)
+        else:
+            dataset = cls._write(file_path, directory, chunksize, progress, memory_limit_mb)
+        seconds = time.perf_counter() - start
+        megabytes = os.path.getsize(file_path) / 1e6
+        report = {
+            'rows': dataset.rows,
+            'columns': len(dataset.columns),
+            'seconds': seconds,
+            'megabytes': megabytes,
+            'throughput_mb_s': megabytes / seconds if seconds else None,
+            'memory_mb': 0.0,
+            'peak_memory_mb': peak_memory_mb(),
+            'cached': cached,
+        }
+        return dataset, dataset.column_unique_counts, report
+
+    @classmethod
+    def _write(cls, file_path, directory, chunksize, progress, memory_limit_mb):
+        sep = '\t' if file_path.lower().endswith('.tsv') else ','
+        total_bytes = os.path.getsize(file_path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        columns, kinds, distinct, rows, n_chunks = None, {}, {}, 0, 0
+        with open(file_path, 'rb') as handle:
+            for chunk in pd.read_csv(handle, sep=sep, chunksize=chunksize, na_values=NA_SENTINELS):
+                chunk.columns = chunk.columns.str.strip()
+                columns = columns or list(chunk.columns)
+                for column in columns:
+                    # A column is numeric only if every chunk parsed it as numbers. Its distinct
+                    # raw values are only comparable while every chunk parsed it the same way
+                    # (1 and '1' are one value as text); otherwise it is recounted canonically.
+                    kind = _kind(chunk[column])
+                    if column in kinds and kind != kinds[column]:
+                        distinct[column] = None
+                    kinds[column] = 'text' if kinds.get(column) == 'text' else kind
+                    values = distinct.setdefault(column, set())
+                    if values is not None:
+                        values.update(pd.unique(chunk[column].dropna()))
+                        if len(values) > DISTINCT_LIMIT:
+                            distinct[column] = None
+                feather.write_feather(chunk, os.path.join(directory, f'chunk-{n_chunks:06d}.feather'), compression='uncompressed')
+                rows += len(chunk)
+                n_chunks += 1
+                if progress is not None and total_bytes:
+                    progress(min(handle.tell() / total_bytes, 1.0))
+        metadata = {'columns': columns or [], 'kinds': kinds, 'rows': rows, 'chunks': n_chunks,
+                    'column_unique_counts': {column: len(values) for column, values in distinct.items() if values is not None}}
+        dataset = cls(directory, metadata, memory_limit_mb)
+        for column in metadata['columns']:
+            if column not in dataset.column_unique_counts:
+                dataset.column_unique_counts[column] = dataset.distinct_count(column)
+        metadata['column_unique_counts'] = {column: dataset.column_unique_counts[column] for column in metadata['columns']}
+        dataset.column_unique_counts = metadata['column_unique_counts']
+        # Written last: a conversion that stopped half-way is redone next time
+        with open(os.path.join(directory, 'metadata.json'), 'w') as f:
+            json.dump(metadata, f)
+        return dataset
+
+    def chunks(self, columns):
+        # The columns of every chunk, each column in its canonical representation
+        for index in range(self.metadata['chunks']):
+            table = feather.read_table(os.path.join(self.directory, f'chunk-{index:06d}.feather'), columns=list(columns),
+                                       memory_map=True)
+            chunk = table.to_pandas()
+            yield pd.DataFrame({column: _canonical(chunk[column], self.kinds[column]) for column in columns})
+
+    def n_partitions(self, columns):
+        needed = self.rows * len(columns) * BYTES_PER_VALUE
+        return max(1, math.ceil(needed / (self.memory_limit_mb * 1e6)))
+
+    def partitions(self, key_columns, columns, on_chunk=None):
+        # Every row of `columns`, routed by a hash of key_columns into partitions that fit the
+        # memory limit; rows agreeing on key_columns always share a partition. on_chunk(chunk)
+        # sees every chunk on the way, for statistics that need the whole column.
+        columns = list(dict.fromkeys(list(key_columns) + list(columns)))
+        n_partitions = self.n_partitions(columns)
+        if n_partitions == 1:
+            parts = []
+            for chunk in self.chunks(columns):
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                parts.append(chunk)
+            yield pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+            return
+        schema = pa.schema([(column, pa.float64() if self.kinds[column] == 'numeric' else pa.string()) for column in columns])
+        with tempfile.TemporaryDirectory(dir=self.directory) as spill:
+            paths = [os.path.join(spill, f'partition-{index}.arrow') for index in range(n_partitions)]
+            writers = [pa.ipc.new_file(path, schema) for path in paths]
+            try:
+                for chunk in self.chunks(columns):
+                    if on_chunk is not None:
+                        on_chunk(chunk)
+                    hashes = row_hashes([column_hashes(chunk[column]) for column in key_columns])
+                    partition = (hashes % np.uint64(n_partitions)).astype(np.intp)
+                    order = np.argsort(partition, kind='stable')
+                    bounds = np.searchsorted(partition[order], np.arange(n_partitions + 1))
+                    for index, writer in enumerate(writers):
+                        rows = order[bounds[index]:bounds[index + 1]]
+                        if len(rows):
+                            writer.write_table(pa.Table.from_pandas(chunk.iloc[rows], schema=schema, preserve_index=False))
+            finally:
+                for writer in writers:
+                    writer.close()
+            for path in paths:
+                with pa.memory_map(path) as source:
+                    table = pa.ipc.open_file(source).read_all()
+                yield pd.DataFrame({column: _canonical(table.column(column).to_pandas(), self.kinds[column])
+                                    for column in columns})
+
+    def distinct_count(self, column):
+        return sum(int(part[column].nunique()) for part in self.partitions([column], [column]))
+
+    def privacy_summary(self, columns, sensitive_attrs=None, progress=None, l=2):
+        # privacy_summary of the whole file, one partition at a time. The sensitive values are
+        # counted over the whole file while partitioning, so every partition's t-closeness and
+        # delta-disclosure compare with the overall distribution, as in memory.
+        if isinstance(sensitive_attrs, str):
+            sensitive_attrs = [sensitive_attrs]
+        sensitive_attrs = list(sensitive_attrs or [])
+        value_counts = {attr: pd.Series(dtype=np.int64) for attr in sensitive_attrs}
+
+        def count_values(chunk):
+            complete = chunk[columns].notna().all(axis=1)
+            for attr in sensitive_attrs:
+                counts = chunk.loc[complete, attr].value_counts()
+                value_counts[attr] = value_counts[attr].add(counts, fill_value=0)
+
+        unique_rows, k_anonymity, histograms, tables = 0, None, [], {attr: [] for attr in sensitive_attrs}
+        encodings = None
+        n_partitions = self.n_partitions(list(columns) + sensitive_attrs)
+        for index, part in enumerate(self.partitions(columns, sensitive_attrs, on_chunk=count_values)):
+            if encodings is None:
+                # All chunks have been seen once the first partition comes back
+                encodings = {attr: self._sensitive_encoding(attr, value_counts[attr]) for attr in sensitive_attrs}
+            classes = EquivalenceClasses.from_frame(part, columns)
+            unique_rows += classes.unique_rows()
+            if classes.n_groups:
+                k_anonymity = classes.k_anonymity() if k_anonymity is None else min(k_anonymity, classes.k_anonymity())
+            histograms.append(classes.class_size_histogram())
+            for attr, (values, ordinal, overall) in encodings.items():
+                codes = values.get_indexer(part[attr])
+                table = ContingencyTable.from_codes(classes.group_codes, classes.n_groups, codes, len(values), ordinal, overall)
+                tables[attr].append(table.summary(l))
+            if progress is not None:
+                progress((index + 1) / n_partitions)
+
+        disclosure = {attr: _combine_summaries(summaries, encodings[attr][1]) for attr, summaries in tables.items()}
+        histogram = pd.concat(histograms).groupby(level=0).sum().sort_index() if histograms else pd.Series(dtype=np.int64)
+        histogram.index.name, histogram.name = 'class_size', 'classes'
+        return {
+            'unique_rows': unique_rows,
+            'k_anonymity': k_anonymity,
+            'l_diversity': min((metrics['distinct_l'] for metrics in disclosure.values()), default=None),
+            'disclosure': disclosure,
+            'class_size_histogram': histogram.astype(np.int64),
+        }
+
+    def _sensitive_encoding(self, attr, counts):
+        # (values, ordinal, overall distribution); ordinal codes follow value order as in sensitive_codes
+        ordinal = self.kinds[attr] == 'numeric'
+        if ordinal:
+            counts = counts.sort_index()
+        values = pd.Index(counts.index)
+        return values, ordinal, counts.to_numpy(dtype=np.float64) / max(counts.sum(), 1)
+
+    def rank_column_removals(self, columns, progress=None):
+        # Classes of every subset that keeps the highest-cardinality column lie within one
+        # partition by that column, so one pass covers the full set and all removals but that
+        # column's; its removal is counted in a second pass partitioned by the next column.
+        columns = list(columns)
+        if len(columns) < 2:
+            return []
+        by_cardinality = sorted(columns, key=lambda column: self.column_unique_counts[column], reverse=True)
+        first, second = by_cardinality[:2]
+        all_unique_count, removal_counts = 0, dict.fromkeys(columns, 0)
+        for part in self.partitions([first], columns):
+            encoder = ColumnEncoder(part)
+            all_unique_count += encoder.classes(columns).unique_rows()
+            counts = leave_one_out(encoder, columns, EquivalenceClasses.unique_rows)
+            for column in columns:
+                if column != first:
+                    removal_counts[column] += counts[column]
+        if progress is not None:
+            progress(0.5)
+        rest = [column for column in columns if column != first]
+        for part in self.partitions([second], rest):
+            removal_counts[first] += EquivalenceClasses.from_frame(part, rest).unique_rows()
+        if progress is not None:
+            progress(1.0)
+
+        results = []
+        for column in columns:
+            difference = all_unique_count - removal_counts[column]
+            normalized_difference = round(difference / self.column_unique_counts[column], 1)
+            results.append((column, removal_counts[column], difference, normalized_difference))
+        results.sort(key=lambda x: x[3], reverse=True)
+        return results
+
+
+def _combine_summaries(summaries, ordinal):
+    # Partition summaries into one: the lowest l, the highest c, t and delta
+    def pick(key, reduce):
+        values = [summary[key] for summary in summaries if summary[key] is not None]
+        return reduce(values) if values else None
+    return {
+        'distinct_l': pick('distinct_l', min),
+        'entropy_l': pick('entropy_l', min),
+        'recursive_c': pick('recursive_c', max),
+        't_closeness': pick('t_closeness', max),
+        'delta_disclosure': pick('delta_disclosure', max),
+        'ordinal': ordinal,
+    }
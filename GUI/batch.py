@@ -0,0 +1,137 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from backends import BACKENDS, get_backend
+from cache import CACHE_DIR_ENV, cached_read_table
+from hierarchies import Hierarchy
+from loader import read_table
+
+RANKING_FIELDS = ['removed_column', 'unique_rows_after_removal', 'difference', 'normalized']
+SUMMARY_FIELDS = ['file', 'rows', 'quasi_identifiers', 'missing_columns', 'sensitive_attribute',
+                  'unique_rows', 'k_anonymity', 'l_diversity', 'error']
+
+
+def generalize_frame(data, hierarchies):
+    # Columns of `data` that have a hierarchy replaced by their generalized values
+    generalized = data.copy(deep=False)
+    for column, hierarchy in hierarchies.items():
+        if column in generalized.columns:
+            generalized[column] = hierarchy.apply(generalized[column])
+    return generalized
+
+
+def analyze_file(file_path, quasi_identifiers, sensitive_attr=None, use_cache=False, hierarchies=None, output_dir=None,
+                 backend='pandas'):
+    # Same metrics as the Privacy Calculation and Variable Optimization buttons, for one file.
+    # With hierarchies (e.g. merges exported from the preview) the file is generalized first,
+    # and written to output_dir when given.
+    report = {'file': file_path, 'quasi_identifiers': [], 'missing_columns': [], 'sensitive_attribute': None}
+    try:
+        engine = get_backend(backend)
+        if engine.in_memory:
+            reader = cached_read_table if use_cache else read_table
+            data, _, load_report = reader(file_path)
+        else:
+            data, _, load_report = engine.load(file_path)
+        report['rows'] = load_report['rows']
+        if hierarchies and not engine.in_memory:
+            raise ValueError("Generalizing with --hierarchy needs the pandas backend")
+        if hierarchies:
+            data = generalize_frame(data, hierarchies)
+            if output_dir:
+                output_path = os.path.join(output_dir, os.path.basename(file_path))
+                data.to_csv(output_path, sep='\t' if output_path.lower().endswith('.tsv') else ',', index=False)
+                report['output'] = output_path
+        columns = [column for column in quasi_identifiers if column in data.columns]
+        report['quasi_identifiers'] = columns
+        report['missing_columns'] = [column for column in quasi_identifiers if column not in data.columns]
+        if sensitive_attr in data.columns:
+            report['sensitive_attribute'] = sensitive_attr
+        elif sensitive_attr:
+            report['missing_columns'].append(sensitive_attr)
+        if not columns:
+            report['error'] = "None of the quasi-identifiers are in this file"
+            return report
+
+        summary = engine.privacy_summary(data, columns, report['sensitive_attribute'])
+        report['unique_rows'] = summary['unique_rows']
+        report['k_anonymity'] = summary['k_anonymity']
+        report['l_diversity'] = summary['l_diversity']
+        report['class_size_histogram'] = {int(size): int(count) for size, count in summary['class_size_histogram'].items()}
+        report['ranking'] = [dict(zip(RANKING_FIELDS, row)) for row in engine.rank_column_removals(data, columns)]
+    except Exception as e:
+        report['error'] = str(e)
+    return report
+
+
+def analyze_directory(directory, quasi_identifiers, sensitive_attr=None, pattern='*.tsv', workers=None, use_cache=False,
+                      hierarchies=None, output_dir=None, backend='pandas'):
+    files = sorted(glob.glob(os.path.join(directory, pattern)))
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if workers == 1:
+        return [analyze_file(path, quasi_identifiers, sensitive_attr, use_cache, hierarchies, output_dir, backend) for path in files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze_file, files, [quasi_identifiers] * len(files), [sensitive_attr] * len(files),
+                                 [use_cache] * len(files), [hierarchies] * len(files), [output_dir] * len(files),
+                                 [backend] * len(files)))
+
+
+def write_json(reports, handle):
+    json.dump(reports, handle, indent=2)
+    handle.write('\n')
+
+
+def write_csv(reports, handle):
+    # One row per (file, removed column); file-level metrics are repeated on each row
+    writer = csv.DictWriter(handle, fieldnames=SUMMARY_FIELDS + RANKING_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for report in reports:
+        row = dict(report)
+        row['quasi_identifiers'] = ';'.join(report['quasi_identifiers'])
+        row['missing_columns'] = ';'.join(report['missing_columns'])
+        for ranking in report.get('ranking') or [{}]:
+            writer.writerow({**row, **ranking})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute privacy metrics for every table in a directory.")
+    parser.add_argument('directory', help="Directory to scan, e.g. a BIDS phenotype/ folder")
+    parser.add_argument('--qi', required=True, help="Comma-separated quasi-identifier columns")
+    parser.add_argument('--sensitive', default=None, help="Sensitive attribute for l-diversity")
+    parser.add_argument('--pattern', default='*.tsv', help="File name pattern (default: *.tsv)")
+    parser.add_argument('--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('-o', '--output', default=None, help="Report file (default: standard output)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument('--cache', action='store_true', help="Read through the columnar cache")
+    parser.add_argument('--cache-dir', default=None,
+                        help=f"Cache directory (default: ${CACHE_DIR_ENV}, else ~/.cache/privacy_analyzer)")
+    parser.add_argument('--hierarchy', action='append', default=[],
+                        help="Hierarchy CSV (e.g. exported from the preview) to generalize the files with; "
+                             "the file name is the column, or pass COLUMN=PATH. Repeatable.")
+    parser.add_argument('--output-dir', default=None, help="Write the generalized files here")
+    parser.add_argument('--backend', choices=BACKENDS, default='pandas',
+                        help="pandas loads each file into memory; arrow works out of core on files larger than memory")
+    args = parser.parse_args()
+    if args.cache_dir:
+        os.environ[CACHE_DIR_ENV] = args.cache_dir  # Inherited by the worker processes
+
+    quasi_identifiers = [column.strip() for column in args.qi.split(',') if column.strip()]
+    hierarchies = {}
+    for spec in args.hierarchy:
+        column, _, path = spec.rpartition('=')
+        hierarchy = Hierarchy.read_csv(path, column or None)
+        hierarchies[hierarchy.column] = hierarchy
+    reports = analyze_directory(args.directory, quasi_identifiers, args.sensitive, args.pattern, args.workers, args.cache,
+                                hierarchies, args.output_dir, args.backend)
+    writer = write_json if args.format == 'json' else write_csv
+    if args.output:
+        with open(args.output, 'w', newline='') as handle:
+            writer(reports, handle)
+    else:
+        writer(reports, sys.stdout)
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from dp_noise import add_noise
+from equivalence import EquivalenceClasses, privacy_summary, rank_column_removals
+from loader import read_table
+from pipeline import INSTRUMENTS, instrument_paths, join_instruments
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+# A case is a regression when it is this much slower than its baseline...
+DEFAULT_TOLERANCE = 0.25
+# ...and slower by more than this many seconds, so timer noise on tiny cases is ignored
+MIN_REGRESSION_SECONDS = 0.01
+BASELINE_VERSION = 1
+
+
+def _is_continuous(values):
+    return pd.api.types.is_numeric_dtype(values.dtype) and values.nunique() > 25
+
+
+def synthesize(data, n_rows, quasi_identifiers=None, id_column='participant_id', seed=0):
+    # n_rows drawn from `data`. The quasi-identifiers are resampled as whole tuples, which
+    # keeps their joint distribution, their marginals and their dtypes; every other column is
+    # drawn from its own marginal. None resamples all columns together. Ids are made unique.
+    # The classes are those of `data`, so k grows with the rows; the many-classes case of
+    # analysis_cases times a workload whose classes grow with them instead.
+    rng = np.random.default_rng(seed)
+    joint_columns = set(data.columns if quasi_identifiers is None else quasi_identifiers)
+    joint_rows = rng.integers(0, len(data), n_rows)
+    columns = {}
+    for column in data.columns:
+        if column == id_column:
+            columns[column] = 'sub-' + pd.Series(np.arange(n_rows)).astype(str).str.zfill(len(str(n_rows)))
+            continue
+        rows = joint_rows if column in joint_columns else rng.integers(0, len(data), n_rows)
+        columns[column] = data[column].take(rows).reset_index(drop=True)
+    return pd.DataFrame(columns)
+
+
+def time_call(fn, repeat=3):
+    # Best of `repeat` runs, the usual way to keep scheduler noise out of a baseline
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def analysis_cases(data, quasi_identifiers, sensitive_attr, table_path):
+    # The work behind each FileAnalyzer button, without the GUI
+    cases = {
+        'load_data': lambda: read_table(table_path),
+        'calculate_unique_rows': lambda: privacy_summary(data, quasi_identifiers, sensitive_attr),
+        'calculate_k_anonymity': lambda: EquivalenceClasses.from_frame(data, quasi_identifiers).k_anonymity(),
+        'find_lowest_unique_columns': lambda: rank_column_removals(data, quasi_identifiers),
+    }
+    if sensitive_attr:
+        cases['calculate_l_diversity'] = lambda: EquivalenceClasses.from_frame(data, quasi_identifiers).l_diversity(data[sensitive_attr])
+    # Synthetic workload: the resampled quasi-identifiers keep the classes of the source, so
+    # an artificial extra one of buckets of about 4 rows makes classes that grow with the
+    # rows, and k-anonymity is also timed on many small classes
+    buckets = pd.Series(np.random.default_rng(0).permutation(len(data)) // 4, index=data.index, name='_bucket')
+    wide = pd.concat([data[quasi_identifiers], buckets], axis=1)
+    cases['k_anonymity_many_classes'] = lambda: EquivalenceClasses.from_frame(wide, quasi_identifiers + ['_bucket']).k_anonymity()
+    continuous = [column for column in data.columns if _is_continuous(data[column])]
+    if continuous:
+        values = data[continuous[0]]
+        cases['round_values'] = lambda: (values / 10).round() * 10
+        cases['add_noise'] = lambda: add_noise(data, continuous, 'laplace', epsilon=1.0, seed=0)
+    return cases
+
+
+def pipeline_cases(directory, n_rows, files=None, seed=0, workdir=None):
+    # Read and clean of every instrument found in `directory`, each scaled to n_rows, plus the join
+    cases, cleaned = {}, []
+    for name, path in instrument_paths(directory, files).items():
+        if not os.path.exists(path):
+            continue
+        _, _, read_kwargs, stage = next(instrument for instrument in INSTRUMENTS if instrument[0] == name)
+        raw = synthesize(pd.read_csv(path, sep='\t', **read_kwargs), n_rows, seed=seed)
+        scaled_path = os.path.join(workdir, os.path.basename(path))
+        raw.to_csv(scaled_path, sep='\t', index=False)
+        cases[f'read_{name}'] = lambda path=scaled_path, kwargs=read_kwargs: pd.read_csv(path, sep='\t', **kwargs)
+        # Stages modify their input, so every run cleans a fresh copy
+        cases[f'clean_{name}'] = lambda raw=raw, stage=stage: stage(raw.copy())
+        cleaned.append(stage(raw.copy()).set_index('participant_id'))
+    if cleaned:
+        cases['join_instruments'] = lambda: join_instruments(cleaned)
+    return cases
+
+
+def run_benchmarks(data, quasi_identifiers, sensitive_attr=None, sizes=DEFAULT_SIZES, pipeline_dir=None,
+                   files=None, repeat=3, seed=0, log=None):
+    # {case: {rows: seconds}} for every size
+    results = {}
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            scaled = synthesize(data, n_rows, quasi_identifiers, seed=seed)
+            table_path = os.path.join(workdir, 'synthetic.tsv')
+            scaled.to_csv(table_path, sep='\t', index=False)
+            cases = analysis_cases(scaled, quasi_identifiers, sensitive_attr, table_path)
+            if pipeline_dir:
+                cases.update(pipeline_cases(pipeline_dir, n_rows, files, seed, workdir))
+            for name, fn in cases.items():
+                seconds = time_call(fn, repeat)
+                results.setdefault(name, {})[str(n_rows)] = seconds
+                if log is not None:
+                    log(f"{name:<28} {n_rows:>10} rows  {seconds:.4f} s")
+    return results
+
+
+def baseline_document(results):
+    return {
+        'version': BASELINE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': results,
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    # (case, rows, baseline seconds, seconds) for every case slower than its baseline allows
+    regressions = []
+    for name, by_size in results.items():
+        for n_rows, seconds in by_size.items():
+            reference = baseline.get('results', {}).get(name, {}).get(n_rows)
+            if reference is None:
+                continue
+            if seconds > reference * (1 + tolerance) and seconds - reference > MIN_REGRESSION_SECONDS:
+                regressions.append((name, n_rows, reference, seconds))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the privacy analysis on synthetic data scaled from a real table.")
+    parser.add_argument('table', help="CSV/TSV whose distributions the synthetic data follows")
+    parser.add_argument('--qi', required=True, help="Comma-separated quasi-identifier columns")
+    parser.add_argument('--sensitive', default=None, help="Sensitive attribute for l-diversity")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SIZES, help="Synthetic sizes to time")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per case; the best is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pipeline-dir', default=None, help="ds004215 phenotype directory to time the pipeline stages on")
+    parser.add_argument('--participants', default='participants.tsv', help="Participants file name in --pipeline-dir")
+    parser.add_argument('-o', '--output', default=None, help="Write the results as a baseline JSON file")
+    parser.add_argument('--baseline', default=None, help="Baseline JSON file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, e.g. 0.25 for 25%%")
+    args = parser.parse_args()
+
+    data, _, _ = read_table(args.table)
+    quasi_identifiers = [column.strip() for column in args.qi.split(',') if column.strip()]
+    results = run_benchmarks(data, quasi_identifiers, args.sensitive, args.rows, args.pipeline_dir,
+                             {'participants': args.participants}, args.repeat, args.seed, log=print)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(baseline_document(results), f, indent=2)
+            f.write('\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, n_rows, reference, seconds in regressions:
+            print(f"REGRESSION {name} at {n_rows} rows: {reference:.4f} s -> {seconds:.4f} s")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # The cache is skipped without pyarrow
+    pa = feather = None
+
+from loader import peak_memory_mb, read_table
+
+# Overrides the per-user cache directory
+CACHE_DIR_ENV = 'PRIVACY_CACHE_DIR'
+# Bump when read_table changes what it produces for the same file
+LOADER_VERSION = 2
+
+
+def default_cache_root():
+    # Per user and outside the data directories, which may be shared or read-only: the
+    # entries are plain copies of the participant data
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'privacy_analyzer')
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FrameCache:
+    # Uncompressed Feather files keyed by the content hash of their sources plus a code
+    # version, read back memory-mapped. File hashes are remembered per (size, mtime) so
+    # an unchanged source is not re-hashed on every open.
+    def __init__(self, directory):
+        self.directory = directory
+        self._index_path = os.path.join(directory, 'index.json')
+
+    @classmethod
+    def for_file(cls, file_path, root=None):
+        # One directory per source folder, so files of the same name in two folders keep their own entries
+        folder = os.path.dirname(os.path.abspath(file_path))
+        tag = hashlib.blake2b(folder.encode(), digest_size=8).hexdigest()
+        return cls(os.path.join(root or default_cache_root(), tag))
+
+    def available(self):
+        return feather is not None
+
+    def source_hash(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        index = self._load_index()
+        entry = index.get('files', {}).get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['hash']
+        digest = file_hash(path)
+        index.setdefault('files', {})[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+        self._save_index(index)
+        return digest
+
+    def key(self, name, source_paths, version, params=None):
+        # '<params>-<contents>': entries of one name with other params are not stale
+        params = json.dumps(params or {}, sort_keys=True, default=str)
+        parts = [name, str(version), params] + [self.source_hash(path) for path in source_paths]
+        params_tag = hashlib.blake2b(params.encode(), digest_size=4).hexdigest()
+        return f"{params_tag}-{hashlib.blake2b('|'.join(parts).encode(), digest_size=16).hexdigest()}"
+
+    def get(self, name, key):
+        path = self._entry_path(name, key)
+        if not self.available() or not os.path.exists(path):
+            return None, None
+        try:
+            table = feather.read_table(path, memory_map=True)
+            metadata = json.loads((table.schema.metadata or {}).get(b'privacy_cache', b'{}'))
+            return table.to_pandas(split_blocks=True), metadata
+        except (OSError, ValueError, pa.ArrowException):
+            # Truncated or corrupt entry: a miss, rebuilt and replaced by put
+            return None, None
+
+    def put(self, name, key, data, metadata=None):
+        if not self.available():
+            return False
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            table = pa.Table.from_pandas(data, preserve_index=True)
+            schema_metadata = dict(table.schema.metadata or {})
+            schema_metadata[b'privacy_cache'] = json.dumps(metadata or {}, default=str).encode()
+            table = table.replace_schema_metadata(schema_metadata)
+            path = self._entry_path(name, key)
+            temporary = f'{path}.{os.getpid()}.tmp'
+            feather.write_feather(table, temporary, compression='uncompressed')
+            os.replace(temporary, path)
+        except (OSError, pa.ArrowException):
+            # Unwritable directory or columns Arrow cannot hold (e.g. mixed-type objects)
+            return False
+        self._drop_stale(name, key)
+        return True
+
+    def cached(self, name, source_paths, version, build, params=None):
+        # build() -> DataFrame, run only when no entry matches the sources and version
+        if not self.available():
+            return build()
+        key = self.key(name, source_paths, version, params)
+        data, _ = self.get(name, key)
+        if data is None:
+            data = build()
+            self.put(name, key, data)
+        return data
+
+    def _entry_path(self, name, key):
+        return os.path.join(self.directory, f'{_safe_name(name)}-{key}.feather')
+
+    def _drop_stale(self, name, key):
+        # Older entries of the same name and params
+        params_tag = key.split('-')[0]
+        prefix, keep = f'{_safe_name(name)}-{params_tag}-', os.path.basename(self._entry_path(name, key))
+        for entry in os.listdir(self.directory):
+            if entry.startswith(prefix) and entry.endswith('.feather') and entry != keep:
+                try:
+                    os.remove(os.path.join(self.directory, entry))
+                except OSError:  # Already removed by another process, or not ours to remove
+                    pass
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            # Written aside and renamed, so concurrent workers never read a partial index
+            temporary = f'{self._index_path}.{os.getpid()}.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(index, f)
+            os.replace(temporary, self._index_path)
+        except OSError:
+            pass
+
+
+def _safe_name(name):
+    return ''.join(c if c.isalnum() or c in '._' else '_' for c in name)
+
+
+def cached_read_table(file_path, progress=None, cache=None):
+    # read_table through the columnar cache; same return value plus report['cached']
+    cache = cache or FrameCache.for_file(file_path)
+    if not cache.available():
+        data, column_unique_counts, report = read_table(file_path, progress=progress)
+        report['cached'] = False
+        return data, column_unique_counts, report
+
+    start = time.perf_counter()
+    name = os.path.basename(file_path) + '.loaded'
+    key = cache.key(name, [file_path], LOADER_VERSION)
+    data, metadata = cache.get(name, key)
+    if data is None:
+        data, column_unique_counts, report = read_table(file_path, progress=progress)
+        cache.put(name, key, data, {'column_unique_counts': column_unique_counts})
+        report['cached'] = False
+        return data, column_unique_counts, report
+
+    seconds = time.perf_counter() - start
+    megabytes = os.path.getsize(file_path) / 1e6
+    report = {
+        'rows': len(data),
+        'columns': data.shape[1],
+        'seconds': seconds,
+        'megabytes': megabytes,
+        'throughput_mb_s': megabytes / seconds if seconds else None,
+        'memory_mb': float(data.memory_usage(deep=True).sum()) / 1e6,
+        'peak_memory_mb': peak_memory_mb(),
+        'cached': True,
+    }
+    return data, metadata['column_unique_counts'], report
+
+
+def read_csv_cached(file_path, **read_kwargs):
+    # pd.read_csv with the same arguments, served from the cache when the file is unchanged
+    cache = FrameCache.for_file(file_path)
+    return cache.cached(os.path.basename(file_path) + '.raw', [file_path], LOADER_VERSION,
+                        lambda: pd.read_csv(file_path, **read_kwargs), params=read_kwargs)
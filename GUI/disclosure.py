@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+# Above this many class x value cells the table is built by sorting instead of a dense bincount
+DENSE_CELL_LIMIT = 1 << 24
+# Classes per block when ordinal EMD needs dense distributions
+EMD_BLOCK_CELLS = 1 << 22
+
+
+def is_ordinal(values):
+    # Numeric and ordered categorical attributes are compared with the ordinal EMD
+    dtype = getattr(values, 'dtype', None)
+    if isinstance(dtype, pd.CategoricalDtype):
+        return bool(dtype.ordered)
+    return dtype is not None and pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def sensitive_codes(values, ordinal=False):
+    # Integer codes of a sensitive attribute (-1 for missing); ordinal codes follow value order
+    codes, uniques = pd.factorize(values, sort=ordinal)
+    return codes.astype(np.int64, copy=False), len(uniques)
+
+
+class ContingencyTable:
+    # Class x sensitive value counts, kept as the nonzero cells only (sorted by class), so a
+    # high-cardinality attribute costs no more than the rows themselves. Every disclosure
+    # metric below is a vectorized reduction over these cells.
+    def __init__(self, groups, values, counts, n_groups, n_values, ordinal=False, overall=None):
+        self.n_groups, self.n_values, self.ordinal = n_groups, n_values, ordinal
+        self.groups, self.values = groups, values
+        self.counts = counts.astype(np.int64, copy=False)
+        # Sensitive values counted per class (missing values excluded) and overall. `overall`
+        # replaces the table's own distribution when the table covers only part of the data.
+        self.totals = np.bincount(self.groups, weights=self.counts, minlength=n_groups)
+        if overall is None:
+            overall = np.bincount(self.values, weights=self.counts, minlength=n_values) / max(self.counts.sum(), 1)
+        self.overall = overall
+        self.present = self.totals > 0
+
+    @classmethod
+    def from_codes(cls, group_codes, n_groups, value_codes, n_values, ordinal=False, overall=None):
+        valid = (group_codes >= 0) & (value_codes >= 0)
+        return cls._from_cells(group_codes[valid] * max(n_values, 1) + value_codes[valid], None, n_groups, n_values,
+                               ordinal, overall)
+
+    @classmethod
+    def from_values(cls, group_codes, n_groups, values, ordinal=None):
+        ordinal = is_ordinal(values) if ordinal is None else ordinal
+        return cls.from_codes(group_codes, n_groups, *sensitive_codes(values, ordinal), ordinal=ordinal)
+
+    @classmethod
+    def _from_cells(cls, cells, weights, n_groups, n_values, ordinal, overall=None):
+        # Sum (weighted) cell keys group * n_values + value into the nonzero cells
+        if n_groups * n_values <= DENSE_CELL_LIMIT:
+            counts = np.bincount(cells, weights=weights, minlength=n_groups * n_values)
+            cells = np.flatnonzero(counts)
+            counts = counts[cells]
+        else:
+            cells, inverse = np.unique(cells, return_inverse=True)
+            counts = np.bincount(inverse, weights=weights)
+        groups, values = np.divmod(cells, max(n_values, 1))
+        return cls(groups, values, counts, n_groups, n_values, ordinal, overall)
+
+    def regroup(self, class_map, n_groups):
+        # Table after classes are merged: class_map[old class] -> new class
+        cells = class_map[self.groups] * max(self.n_values, 1) + self.values
+        return self._from_cells(cells, self.counts, n_groups, self.n_values, self.ordinal)
+
+    def subset(self, keep):
+        # Table restricted to the classes where `keep` is True, renumbered densely
+        new_ids = np.cumsum(keep) - 1
+        cells = keep[self.groups]
+        return ContingencyTable(new_ids[self.groups[cells]], self.values[cells], self.counts[cells],
+                                int(keep.sum()), self.n_values, self.ordinal)
+
+    def _shares(self):
+        return self.counts / self.totals[self.groups]
+
+    def distinct_l(self):
+        # Fewest distinct sensitive values in any class
+        if self.n_groups == 0:
+            return None
+        return int(np.bincount(self.groups, minlength=self.n_groups).min())
+
+    def entropy_l(self):
+        # exp of the lowest class entropy: every class has entropy >= log(l)
+        if not self.present.any():
+            return None
+        shares = self._shares()
+        entropy = -np.bincount(self.groups, weights=shares * np.log(shares), minlength=self.n_groups)
+        return float(np.exp(entropy[self.present].min()))
+
+    def recursive_c(self, l=2):
+        # Smallest c for recursive (c,l)-diversity: each class needs r1 < c * (r_l + ... + r_m)
+        # with r_i its i-th largest count. Infinite when a class has fewer than l values.
+        if not self.present.any():
+            return None
+        order = np.lexsort((-self.counts, self.groups))
+        groups, counts = self.groups[order], self.counts[order]
+        starts = np.searchsorted(groups, groups, side='left')
+        rank = np.arange(len(groups)) - starts
+        largest = np.bincount(groups[rank == 0], weights=counts[rank == 0], minlength=self.n_groups)
+        tail = np.bincount(groups[rank >= l - 1], weights=counts[rank >= l - 1], minlength=self.n_groups)
+        largest, tail = largest[self.present], tail[self.present]
+        if (tail == 0).any():
+            return float('inf')
+        return float((largest / tail).max())
+
+    def t_closeness(self):
+        # Largest EMD between a class distribution and the overall one: ordered distance
+        # for ordinal attributes, equal distance (half the L1 distance) otherwise
+        if not self.present.any():
+            return None
+        if self.ordinal and self.n_values > 1:
+            return self._ordinal_emd()
+        difference = np.abs(self._shares() - self.overall[self.values]) - self.overall[self.values]
+        distance = 0.5 * (np.bincount(self.groups, weights=difference, minlength=self.n_groups) + 1.0)
+        return float(distance[self.present].max())
+
+    def _ordinal_emd(self):
+        shares = self._shares()
+        block = max(1, EMD_BLOCK_CELLS // self.n_values)
+        worst = 0.0
+        for start in range(0, self.n_groups, block):
+            stop = min(start + block, self.n_groups)
+            lo, hi = np.searchsorted(self.groups, [start, stop])
+            dense = np.zeros((stop - start, self.n_values))
+            dense[self.groups[lo:hi] - start, self.values[lo:hi]] = shares[lo:hi]
+            emd = np.abs(np.cumsum(dense - self.overall, axis=1)[:, :-1]).sum(axis=1) / (self.n_values - 1)
+            present = self.present[start:stop]
+            if present.any():
+                worst = max(worst, float(emd[present].max()))
+        return worst
+
+    def delta_disclosure(self):
+        # Largest |log(p / q)| over the values present in a class
+        if not self.present.any():
+            return None
+        return float(np.abs(np.log(self._shares() / self.overall[self.values])).max())
+
+    def summary(self, l=2):
+        return {
+            'distinct_l': self.distinct_l(),
+            'entropy_l': self.entropy_l(),
+            'recursive_c': self.recursive_c(l),
+            't_closeness': self.t_closeness(),
+            'delta_disclosure': self.delta_disclosure(),
+            'ordinal': self.ordinal,
+        }
+
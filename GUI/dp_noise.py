@@ -0,0 +1,118 @@
+import zlib
+
+import numpy as np
+
+MECHANISMS = ('laplace', 'gaussian', 'geometric')
+
+
+class BudgetExceeded(ValueError):
+    pass
+
+
+def column_generator(seed, column):
+    # An independent, reproducible stream per (seed, column): noising a column gives the same
+    # values whichever other columns are noised in the same call
+    return np.random.default_rng([seed, zlib.crc32(str(column).encode())])
+
+
+def new_seed():
+    return int(np.random.SeedSequence().entropy % (2 ** 63))
+
+
+def noise_scale(mechanism, epsilon, sensitivity, delta=None):
+    # Laplace b, Gaussian sigma, or the geometric success probability
+    if epsilon <= 0:
+        raise ValueError("epsilon must be positive")
+    if mechanism == 'laplace':
+        return sensitivity / epsilon
+    if mechanism == 'gaussian':
+        if not delta or not 0 < delta < 1:
+            raise ValueError("The Gaussian mechanism needs 0 < delta < 1")
+        return sensitivity * np.sqrt(2 * np.log(1.25 / delta)) / epsilon
+    if mechanism == 'geometric':
+        return 1 - np.exp(-epsilon / max(sensitivity, 1))
+    raise ValueError(f"Unknown mechanism {mechanism!r}; expected one of {MECHANISMS}")
+
+
+def sample_noise(generator, mechanism, scale, size):
+    if mechanism == 'laplace':
+        return generator.laplace(0.0, scale, size)
+    if mechanism == 'gaussian':
+        return generator.normal(0.0, scale, size)
+    # Two-sided geometric: the difference of two geometric draws
+    return (generator.geometric(scale, size) - generator.geometric(scale, size)).astype(np.float64)
+
+
+class PrivacyAccountant:
+    # Privacy budget spent on one dataset under sequential composition: every noised column
+    # is a separate release, so the epsilons (and deltas) of all of them add up
+    def __init__(self, epsilon_budget=None, delta_budget=None):
+        self.epsilon_budget = epsilon_budget
+        self.delta_budget = delta_budget
+        self.releases = []
+
+    def spent(self):
+        return (sum(release['epsilon'] for release in self.releases),
+                sum(release['delta'] or 0.0 for release in self.releases))
+
+    def remaining(self):
+        epsilon, delta = self.spent()
+        return (None if self.epsilon_budget is None else self.epsilon_budget - epsilon,
+                None if self.delta_budget is None else self.delta_budget - delta)
+
+    def check(self, releases):
+        epsilon, delta = self.spent()
+        epsilon += sum(release['epsilon'] for release in releases)
+        delta += sum(release['delta'] or 0.0 for release in releases)
+        if self.epsilon_budget is not None and epsilon > self.epsilon_budget + 1e-12:
+            raise BudgetExceeded(f"Privacy budget exceeded: epsilon {epsilon:g} of {self.epsilon_budget:g}")
+        if self.delta_budget is not None and delta > self.delta_budget + 1e-15:
+            raise BudgetExceeded(f"Privacy budget exceeded: delta {delta:g} of {self.delta_budget:g}")
+
+    def charge(self, releases):
+        self.check(releases)
+        self.releases.extend(releases)
+
+    def reserve(self, columns, mechanism, epsilon, delta=None):
+        # Charged when a run is submitted, so runs in flight cannot all pass check against the
+        # same remaining budget; settled with the run's releases, or refunded if it never ends
+        reserved = [{'column': column, 'mechanism': mechanism, 'epsilon': epsilon,
+                     'delta': delta if mechanism == 'gaussian' else None} for column in columns]
+        self.charge(reserved)
+        return reserved
+
+    def settle(self, reserved, releases):
+        # The reserved entries replaced by the releases (same budget, plus bounds and seed to replay)
+        self.refund(reserved)
+        self.releases.extend(releases)
+
+    def refund(self, reserved):
+        self.releases = [release for release in self.releases if not any(release is entry for entry in reserved)]
+
+
+def add_noise(data, columns, mechanism='laplace', epsilon=1.0, delta=None, bounds=None, seed=None, accountant=None):
+    # Noise every column in one call. Values are clipped to their bounds ({column: (lower, upper)},
+    # by default the observed range, which itself leaks a little: pass public bounds when known)
+    # and the noise scale follows from epsilon, delta and the bound width. Returns
+    # ({column: noisy values}, releases); the releases record what to charge and how to replay it.
+    seed = new_seed() if seed is None else seed
+    bounds = bounds or {}
+    values = data[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    lower = np.array([bounds[column][0] if column in bounds else np.nanmin(values[:, i]) for i, column in enumerate(columns)])
+    upper = np.array([bounds[column][1] if column in bounds else np.nanmax(values[:, i]) for i, column in enumerate(columns)])
+    clipped = np.clip(values, lower, upper)
+    if mechanism == 'geometric':
+        clipped = np.round(clipped)
+
+    releases, noisy = [], {}
+    for i, column in enumerate(columns):
+        sensitivity = float(upper[i] - lower[i]) if np.isfinite(upper[i] - lower[i]) else 0.0
+        scale = noise_scale(mechanism, epsilon, sensitivity, delta)
+        noise = sample_noise(column_generator(seed, column), mechanism, scale, len(clipped))
+        noisy[column] = clipped[:, i] + noise
+        releases.append({'column': column, 'mechanism': mechanism, 'epsilon': epsilon,
+                         'delta': delta if mechanism == 'gaussian' else None,
+                         'bounds': (float(lower[i]), float(upper[i])), 'seed': seed})
+    if accountant is not None:
+        accountant.check(releases)
+    return noisy, releases
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+from disclosure import ContingencyTable
+
+# Mixed-radix keys are re-densified before they can overflow int64
+_MAX_KEY = 2 ** 62
+
+
+def factorize_column(values, dropna=True):
+    # Integer codes for one column; missing values get -1 unless dropna is False,
+    # in which case NaN is treated as a value of its own (like drop_duplicates)
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=dropna)
+    return codes.astype(np.int64, copy=False), len(uniques)
+
+
+def combine_codes(codes_list, cardinalities):
+    # Combine per-column codes into one dense group code per row.
+    # Rows with a missing code (-1) in any column get group -1. A single column is densified
+    # too: its codes may leave gaps (e.g. generalized codes of values absent from the data).
+    n_rows = len(codes_list[0]) if codes_list else 0
+
+    key = np.zeros(n_rows, dtype=np.int64)
+    missing = np.zeros(n_rows, dtype=bool)
+    key_card = 1
+    for codes, card in zip(codes_list, cardinalities):
+        card = max(card, 1)
+        if key_card * card > _MAX_KEY:
+            key, key_card = _densify(key)
+        key = key * card + codes
+        key_card *= card
+        missing |= codes < 0
+
+    group_codes = np.full(n_rows, -1, dtype=np.int64)
+    valid = ~missing
+    dense, uniques = pd.factorize(key[valid])
+    group_codes[valid] = dense
+    return group_codes, len(uniques)
+
+
+def _densify(key):
+    dense, uniques = pd.factorize(key)
+    return dense.astype(np.int64, copy=False), len(uniques)
+
+
+class EquivalenceClasses:
+    # Equivalence classes of a quasi-identifier subset, built from a single
+    # factorization pass. Every metric below reuses the same group codes.
+    def __init__(self, group_codes, n_groups):
+        self.group_codes = group_codes
+        self.n_groups = n_groups
+        self.sizes = np.bincount(group_codes[group_codes >= 0], minlength=n_groups)
+
+    @classmethod
+    def from_frame(cls, data, columns, dropna=True):
+        encoded = [factorize_column(data[column], dropna=dropna) for column in columns]
+        codes_list = [codes for codes, _ in encoded]
+        cardinalities = [card for _, card in encoded]
+        return cls(*combine_codes(codes_list, cardinalities))
+
+    def unique_rows(self):
+        return int((self.sizes == 1).sum())
+
+    def k_anonymity(self):
+        if self.n_groups == 0:
+            return None
+        return int(self.sizes.min())
+
+    def l_diversity(self, sensitive_values):
+        # Distinct l-diversity: fewest distinct non-missing sensitive values in any class
+        return self.contingency(sensitive_values).distinct_l()
+
+    def contingency(self, sensitive_values, ordinal=None):
+        return ContingencyTable.from_values(self.group_codes, self.n_groups, sensitive_values, ordinal)
+
+    def class_size_histogram(self):
+        # Number of equivalence classes for every class size that occurs
+        counts = np.bincount(self.sizes)
+        class_sizes = np.flatnonzero(counts)
+        class_sizes = class_sizes[class_sizes > 0]
+        return pd.Series(counts[class_sizes], index=pd.Index(class_sizes, name='class_size'), name='classes')
+
+
+class ColumnEncoder:
+    # Caches the integer codes of each column of one DataFrame, so that repeated
+    # metric calls (leave-one-out ranking, subset search) factorize a column once
+    def __init__(self, data, dropna=True):
+        self.data = data
+        self.dropna = dropna
+        self._codes = {}
+
+    def encode(self, column):
+        if column not in self._codes:
+            self._codes[column] = factorize_column(self.data[column], dropna=self.dropna)
+        return self._codes[column]
+
+    def cardinality(self, column):
+        return self.encode(column)[1]
+
+    def group_codes(self, columns):
+        if not columns:
+            return np.zeros(len(self.data), dtype=np.int64), 1
+        encoded = [self.encode(column) for column in columns]
+        return combine_codes([codes for codes, _ in encoded], [card for _, card in encoded])
+
+    def classes(self, columns):
+        return EquivalenceClasses(*self.group_codes(columns))
+
+    def invalidate(self, column=None):
+        if column is None:
+            self._codes.clear()
+        else:
+            self._codes.pop(column, None)
+
+
+def leave_one_out(encoder, columns, metric, progress=None):
+    # metric(classes) for every "all columns but one" subset, keyed by the removed column.
+    # Divide and conquer: each half is solved with the other half already folded into
+    # a shared group key, so the frame is combined O(n log n) times instead of O(n^2).
+    results = {}
+    _leave_one_out(encoder, list(columns), encoder.group_codes([]), metric, results, progress, len(columns))
+    return {column: results[column] for column in columns}
+
+
+def _leave_one_out(encoder, columns, outside, metric, results, progress, total):
+    if len(columns) == 1:
+        results[columns[0]] = metric(EquivalenceClasses(*outside))
+        if progress is not None:
+            progress(len(results) / total)
+        return
+    middle = len(columns) // 2
+    left, right = columns[:middle], columns[middle:]
+    for part, other in ((left, right), (right, left)):
+        encoded = [outside] + [encoder.encode(column) for column in other]
+        folded = combine_codes([codes for codes, _ in encoded], [card for _, card in encoded])
+        _leave_one_out(encoder, part, folded, metric, results, progress, total)
+
+
+def rank_column_removals(data, columns, encoder=None, progress=None):
+    # Rows of the "Variable Optimization" table:
+    # (column, unique rows after removal, difference, normalized difference)
+    if len(columns) < 2:
+        return []
+    encoder = encoder or ColumnEncoder(data)
+    all_unique_count = encoder.classes(columns).unique_rows()
+    removal_counts = leave_one_out(encoder, columns, EquivalenceClasses.unique_rows, progress)
+
+    results = []
+    for column in columns:
+        unique_count_after_removal = removal_counts[column]
+        difference = all_unique_count - unique_count_after_removal
+        unique_values_count = encoder.cardinality(column)
+        normalized_difference = round(difference / unique_values_count, 1)
+        results.append((column, unique_count_after_removal, difference, normalized_difference))
+
+    results.sort(key=lambda x: x[3], reverse=True)
+    return results
+
+
+def privacy_summary(data, columns, sensitive_attrs=None, progress=None, l=2):
+    # sensitive_attrs: one column name or a list; l-diversity is the lowest over all of them
+    if isinstance(sensitive_attrs, str):
+        sensitive_attrs = [sensitive_attrs]
+    classes = EquivalenceClasses.from_frame(data, columns)
+    if progress is not None:
+        progress(0.5)
+    disclosure = {attr: classes.contingency(data[attr]).summary(l) for attr in sensitive_attrs or []}
+    return {
+        'unique_rows': classes.unique_rows(),
+        'k_anonymity': classes.k_anonymity(),
+        'l_diversity': min((metrics['distinct_l'] for metrics in disclosure.values()), default=None),
+        'disclosure': disclosure,
+        'class_size_histogram': classes.class_size_histogram(),
+    }
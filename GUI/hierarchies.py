@@ -0,0 +1,226 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from equivalence import combine_codes, factorize_column
+
+SUPPRESSED = '*'
+# Age bands produced by the preprocessing pipeline, and how they widen
+AGE_LABELS = ['< 20', '20-40', '40-60', '60-80', '> 80']
+AGE_MERGES = {'< 20': '< 40', '20-40': '< 40', '40-60': '40-80', '60-80': '40-80', '> 80': '> 80'}
+
+
+def relabel_categories(values, relabel):
+    # New values of a column from relabel(categories) -> one label per category. Only the
+    # categories are relabelled; the rows just have their codes remapped, and categories
+    # given the same label merge. The result is categorical (missing values stay missing).
+    values = pd.Series(values)
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    labels = np.asarray(relabel(values.cat.categories), dtype=object)
+    remap, categories = pd.factorize(labels)
+    codes = values.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+    relabelled = pd.Categorical.from_codes(codes, categories=pd.Index(categories), ordered=values.cat.ordered)
+    return pd.Series(relabelled, index=values.index, name=values.name)
+
+
+class Hierarchy:
+    # Generalization levels of one column. Level 0 holds the original values and the top
+    # level suppresses everything to '*'. Each level is an integer lookup array mapping a
+    # level-0 code to the code of its generalized label, so generalizing a column is one gather.
+    def __init__(self, column, values, levels=()):
+        self.column = column
+        self.values = list(values)
+        self.lookups, self.labels = [], []
+        for level_labels in [self.values] + [list(labels) for labels in levels] + [[SUPPRESSED] * len(self.values)]:
+            codes, uniques = pd.factorize(pd.Series(level_labels, dtype=object), use_na_sentinel=False)
+            self.lookups.append(codes.astype(np.int64))
+            self.labels.append(np.asarray(uniques, dtype=object))
+        self.cardinalities = [len(labels) for labels in self.labels]
+
+    @property
+    def height(self):
+        return len(self.lookups) - 1
+
+    @classmethod
+    def from_mappings(cls, column, values, mappings):
+        # One {value: generalized value} dict per intermediate level; unmapped values are kept
+        levels, current = [], list(values)
+        for mapping in mappings:
+            current = [mapping.get(value, value) for value in current]
+            levels.append(current)
+        return cls(column, values, levels)
+
+    @classmethod
+    def from_merges(cls, column, values, merges):
+        # One level per merge recorded in the preview, [(merged values, replacement)] oldest first
+        return cls.from_mappings(column, values, [dict.fromkeys(merged, replacement) for merged, replacement in merges])
+
+    @classmethod
+    def read_csv(cls, path, column=None):
+        # Headerless rows of a value and its label at each level, the format the anjana
+        # example hierarchies use. The column name defaults to the file name.
+        table = pd.read_csv(path, header=None, dtype=str, keep_default_na=False)
+        if table.shape[1] > 1 and (table.iloc[:, -1] == SUPPRESSED).all():
+            table = table.iloc[:, :-1]
+        column = column or os.path.splitext(os.path.basename(path))[0]
+        return cls(column, table[0], [table[level] for level in table.columns[1:]])
+
+    def to_frame(self):
+        # One row per value with its label at every level up to '*'
+        return pd.DataFrame({level: self.labels[level][self.lookups[level]] for level in range(len(self.lookups))})
+
+    def to_csv(self, path):
+        self.to_frame().to_csv(path, header=False, index=False)
+
+    @classmethod
+    def intervals(cls, column, values, widths):
+        # Numeric values binned into intervals of each width in turn, e.g. (10, 20)
+        levels = []
+        numeric = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+        for width in widths:
+            lower = np.floor(numeric / width) * width
+            levels.append([f"{int(start)}-{int(start + width - 1)}" if pd.notna(start) else value
+                           for start, value in zip(lower, values)])
+        return cls(column, values, levels)
+
+    @classmethod
+    def rare_merge(cls, column, data, min_share=0.05, other='other'):
+        # Values rarer than min_share of the rows are merged into `other`
+        shares = data[column].value_counts(normalize=True, dropna=False)
+        values = list(shares.index)
+        rare = {value for value, share in shares.items() if share < min_share}
+        if len(rare) < 2:
+            return cls(column, values)
+        return cls(column, values, [[other if value in rare else value for value in values]])
+
+    def level_map(self, source, target):
+        # Codes at `source` -> codes at `target`, or None when the levels are not nested
+        # (some source label would split across several target labels)
+        mapping = np.empty(self.cardinalities[source], dtype=np.int64)
+        mapping[self.lookups[source]] = self.lookups[target]
+        if not np.array_equal(mapping[self.lookups[source]], self.lookups[target]):
+            return None
+        return mapping
+
+    def encode(self, series):
+        # Level-0 codes of a column; values outside the hierarchy get -1
+        return pd.Index(self.values, dtype=object).get_indexer(pd.Series(series, dtype=object))
+
+    def generalize(self, base_codes, level):
+        lookup = self.lookups[level]
+        return np.where(base_codes >= 0, lookup[np.maximum(base_codes, 0)], -1)
+
+    def label(self, base_codes, level):
+        codes = self.generalize(base_codes, level)
+        labels = self.labels[level][np.maximum(codes, 0)]
+        labels[codes < 0] = np.nan
+        return labels
+
+    def apply(self, values, level=None):
+        # Generalize a column of any file, by default to the last level below '*'. Only the
+        # column's categories are looked up, matched on their text so a hierarchy read from
+        # CSV also fits numeric columns; values outside the hierarchy are kept.
+        level = max(self.height - 1, 0) if level is None else level
+        text = pd.Series(self.values, dtype=object).astype(str)
+        known = pd.Index(text[~text.duplicated()])
+        positions = np.flatnonzero(~text.duplicated())
+
+        def relabel(categories):
+            found = known.get_indexer(pd.Series(categories, dtype=object).astype(str))
+            labels = self.label(np.where(found >= 0, positions[np.maximum(found, 0)], -1), level)
+            return np.where(found >= 0, labels, np.asarray(categories, dtype=object))
+        return relabel_categories(values, relabel)
+
+
+def default_hierarchy(data, column):
+    values = pd.unique(data[column])
+    present = {value for value in values if isinstance(value, str)}
+    if present and present <= set(AGE_LABELS) | {'nan'}:
+        return Hierarchy.from_mappings(column, values, [AGE_MERGES])
+    numeric = pd.to_numeric(data[column], errors='coerce')
+    if numeric.notna().all() and numeric.nunique() > 25:
+        return Hierarchy.intervals(column, values, (10, 20))
+    return Hierarchy.rare_merge(column, data)
+
+
+def default_hierarchies(data, columns):
+    return {column: default_hierarchy(data, column) for column in columns}
+
+
+class NodeEvaluator:
+    # Encodes the quasi-identifiers and the sensitive attribute once; every lattice node is
+    # then scored from integer gathers and bincounts over those codes
+    def __init__(self, data, hierarchies, sensitive_attr=None):
+        self.columns = list(hierarchies)
+        self.hierarchies = [hierarchies[column] for column in self.columns]
+        self.base_codes = [hierarchy.encode(data[column]) for column, hierarchy in zip(self.columns, self.hierarchies)]
+        self.n_rows = len(data)
+        self.sensitive_codes, self.n_sensitive = (factorize_column(data[sensitive_attr])
+                                                  if sensitive_attr else (None, 0))
+
+    def heights(self):
+        return tuple(hierarchy.height for hierarchy in self.hierarchies)
+
+    def group_codes(self, node):
+        codes = [hierarchy.generalize(base, level) for hierarchy, base, level in zip(self.hierarchies, self.base_codes, node)]
+        cards = [hierarchy.cardinalities[level] for hierarchy, level in zip(self.hierarchies, node)]
+        return combine_codes(codes, cards)
+
+    def evaluate(self, node, k=None, max_suppression=0.0, l=None, t=None):
+        group_codes, n_groups = self.group_codes(node)
+        sizes = np.bincount(group_codes[group_codes >= 0], minlength=n_groups)
+        contingency = self.contingency(group_codes, n_groups) if self.sensitive_codes is not None else None
+        return evaluate_classes(node, sizes, contingency, self.n_rows, k, max_suppression, l, t)
+
+    def contingency(self, group_codes, n_groups):
+        valid = (group_codes >= 0) & (self.sensitive_codes >= 0)
+        cells = group_codes[valid] * self.n_sensitive + self.sensitive_codes[valid]
+        return np.bincount(cells, minlength=n_groups * self.n_sensitive).reshape(n_groups, self.n_sensitive)
+
+
+def evaluate_classes(node, sizes, contingency, n_rows, k=None, max_suppression=0.0, l=None, t=None):
+    # Classes smaller than k are suppressed; the node passes when the suppressed share stays
+    # within max_suppression and the remaining classes meet l and t
+    kept = sizes >= (k or 1)
+    suppressed = int(sizes[~kept].sum())
+    result = {'node': node, 'suppressed': suppressed, 'k_anonymity': int(sizes[kept].min()) if kept.any() else 0}
+    satisfied = suppressed <= max_suppression * n_rows and kept.any()
+    if contingency is not None and (l is not None or t is not None) and kept.any():
+        counts = contingency[kept]
+        result['l_diversity'] = int((counts > 0).sum(axis=1).min())
+        result['t_closeness'] = float(_t_closeness(counts))
+        if l is not None:
+            satisfied &= result['l_diversity'] >= l
+        if t is not None:
+            satisfied &= result['t_closeness'] <= t
+    result['satisfied'] = bool(satisfied)
+    return result
+
+
+def _t_closeness(counts):
+    # Equal-distance EMD (half the L1 distance) between each class and the overall distribution
+    totals = counts.sum(axis=1, keepdims=True)
+    overall = counts.sum(axis=0) / max(counts.sum(), 1)
+    distributions = counts / np.maximum(totals, 1)
+    return 0.5 * np.abs(distributions - overall).sum(axis=1).max()
+
+
+def information_loss(node, heights):
+    # Mean fraction of each hierarchy climbed
+    return float(np.mean([level / height if height else 0.0 for level, height in zip(node, heights)]))
+
+
+def apply_generalization(data, hierarchies, node, k=None):
+    # Generalized copy of data at `node`; with k, rows of classes smaller than k are suppressed
+    generalized = data.copy()
+    evaluator = NodeEvaluator(data, hierarchies)
+    for column, hierarchy, base, level in zip(evaluator.columns, evaluator.hierarchies, evaluator.base_codes, node):
+        generalized[column] = hierarchy.label(base, level)
+    if k:
+        group_codes, n_groups = evaluator.group_codes(node)
+        sizes = np.bincount(group_codes[group_codes >= 0], minlength=n_groups)
+        generalized = generalized[(group_codes >= 0) & (sizes[np.maximum(group_codes, 0)] >= k)]
+    return generalized
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import networkx as nx
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+# Layouts kept per graph, one per merge history seen (so undo/redo redraws without a new layout)
+LAYOUT_CACHE_SIZE = 16
+# Nodes in view above which only merged labels are written, and below which labels are boxed
+LABEL_LIMIT = 300
+LABEL_BOX_LIMIT = 100
+ROOT = 0
+
+
+class HierarchyGraph:
+    # Merge tree of one column: the column name at the root, the column's current labels
+    # below it and, under each merged label, the values it replaced. Nodes are integer ids
+    # with a 'label' attribute, so a replacement may reuse the name of a value it merges.
+    # The tree is extended as merges are recorded and only rebuilt when merges are undone.
+    def __init__(self, column, values):
+        self.column = column
+        self.values = list(values)
+        self._layouts = OrderedDict()
+        self._reset()
+
+    def _reset(self):
+        self.graph = nx.DiGraph()
+        self.graph.add_node(ROOT, label=str(self.column))
+        self.current = {}  # Current label -> its node under the root
+        self.merges = []
+        for value in self.values:
+            self.current[value] = self._add_node(value, ROOT)
+
+    def _add_node(self, label, parent):
+        node = self.graph.number_of_nodes()
+        self.graph.add_node(node, label=str(label))
+        self.graph.add_edge(parent, node)
+        return node
+
+    def version(self):
+        return tuple((tuple(merged), replacement) for merged, replacement in self.merges)
+
+    def merge(self, merged_values, replacement):
+        # The merged labels (and an existing label equal to the replacement) move under a new node
+        children = [self.current.pop(value) for value in list(merged_values) + [replacement] if value in self.current]
+        node = self._add_node(replacement, ROOT)
+        for child in children:
+            self.graph.remove_edge(ROOT, child)
+            self.graph.add_edge(node, child)
+        self.current[replacement] = node
+        self.merges.append((list(merged_values), replacement))
+
+    def sync(self, merges):
+        # Bring the tree to `merges` ([(merged values, replacement)], oldest first): new merges
+        # are added to the tree, anything else (an undo, a revert) rebuilds it from the values
+        merges = [(list(merged), replacement) for merged, replacement in merges]
+        if merges[:len(self.merges)] != self.merges:
+            self._reset()
+        for merged, replacement in merges[len(self.merges):]:
+            self.merge(merged, replacement)
+
+    def layout(self):
+        # Tidy tree: leaves side by side in depth-first order, parents centred over their
+        # children, one row per depth. Linear in the number of nodes, cached per version.
+        key = self.version()
+        if key in self._layouts:
+            self._layouts.move_to_end(key)
+            return self._layouts[key]
+        positions, next_leaf = {}, 0
+        stack = [(ROOT, 0, False)]
+        while stack:
+            node, depth, visited = stack.pop()
+            children = list(self.graph.successors(node))
+            if not children:
+                positions[node] = (float(next_leaf), -float(depth))
+                next_leaf += 1
+            elif visited:
+                positions[node] = (float(np.mean([positions[child][0] for child in children])), -float(depth))
+            else:
+                stack.append((node, depth, True))
+                stack.extend((child, depth + 1, False) for child in reversed(children))
+        self._layouts[key] = positions
+        if len(self._layouts) > LAYOUT_CACHE_SIZE:
+            self._layouts.popitem(last=False)
+        return positions
+
+    def draw(self, figure=None):
+        # Edges as one LineCollection and nodes as one scatter; text labels are the slow part,
+        # so only the nodes in view are labelled, and redrawn when the view is zoomed or panned
+        figure = figure or Figure(figsize=(12, 8))
+        figure.clear()
+        ax = figure.add_subplot(111)
+        positions = self.layout()
+        segments = [(positions[source], positions[target]) for source, target in self.graph.edges]
+        ax.add_collection(LineCollection(segments, colors='black', linewidths=0.6))
+        xs, ys = np.array(list(positions.values())).T
+        ax.scatter(xs, ys, s=30, c='white', edgecolors='black', linewidths=0.5, zorder=2)
+        ax.set_xlim(xs.min() - 1, xs.max() + 1)
+        ax.set_ylim(ys.min() - 0.5, ys.max() + 0.5)
+        ax.axis('off')
+        ax.set_title(f'Tree Graph of Values in Column "{self.column}"', fontsize=12)
+        self._draw_labels(ax, positions)
+        ax.callbacks.connect('xlim_changed', lambda ax: self._draw_labels(ax, positions))
+        return figure
+
+    def _draw_labels(self, ax, positions):
+        # Every node in view when there are at most LABEL_LIMIT of them, otherwise only the
+        # merged labels; boxed below LABEL_BOX_LIMIT
+        for text in list(ax.texts):
+            text.remove()
+        lower, upper = ax.get_xlim()
+        visible = [node for node, (x, _) in positions.items() if lower <= x <= upper]
+        if len(visible) > LABEL_LIMIT:
+            visible = [node for node in visible if self.graph.out_degree(node)]
+        boxed = len(visible) <= LABEL_BOX_LIMIT
+        for node in visible:
+            x, y = positions[node]
+            ax.text(x, y, self.graph.nodes[node]['label'], ha='center', va='center', fontsize=6 if boxed else 5, zorder=3,
+                    bbox={'boxstyle': 'round', 'facecolor': 'white', 'edgecolor': 'black', 'linewidth': 0.4} if boxed else None)
@@ -0,0 +1,119 @@
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobSignals(QObject):
+    progress = Signal(object, int)
+    finished = Signal(object, object)
+    error = Signal(object, str)
+    done = Signal(object)
+
+
+class Job(QRunnable):
+    # Runs fn(progress=...) on a pool thread. The computation reports progress through
+    # the callback it is handed, which is also where a cancelled job stops.
+    def __init__(self, name, fn, on_result, on_error=None, on_cancel=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.name = name
+        self.fn = fn
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.signals = JobSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def report_progress(self, fraction):
+        if self.is_cancelled():
+            raise JobCancelled()
+        self.signals.progress.emit(self, int(round(100 * min(max(fraction, 0.0), 1.0))))
+
+    def run(self):
+        try:
+            result = self.fn(progress=self.report_progress)
+            if not self.is_cancelled():
+                self.signals.finished.emit(self, result)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            if not self.is_cancelled():
+                self.signals.error.emit(self, str(e))
+        finally:
+            self.signals.done.emit(self)
+
+
+class JobRunner(QObject):
+    # Keeps at most one live job per name: submitting again under the same name
+    # cancels the stale job, and anything it still emits is ignored.
+    progress = Signal(str, int)
+    busy_changed = Signal(bool)
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._current = {}
+        self._running = set()
+
+    def submit(self, name, fn, on_result, on_error=None, on_cancel=None):
+        # on_cancel runs on the GUI thread when the job is cancelled before its result is taken
+        self.cancel(name)
+        job = Job(name, fn, on_result, on_error, on_cancel)
+        job.signals.progress.connect(self._on_progress)
+        job.signals.finished.connect(self._on_finished)
+        job.signals.error.connect(self._on_error)
+        job.signals.done.connect(self._on_done)
+        self._current[name] = job
+        self._running.add(job)
+        self.busy_changed.emit(True)
+        self.pool.start(job)
+        return job
+
+    def cancel(self, name=None):
+        names = list(self._current) if name is None else [name]
+        for job_name in names:
+            job = self._current.pop(job_name, None)
+            if job is not None:
+                job.cancel()
+                if job.on_cancel is not None:
+                    job.on_cancel()
+
+    def is_busy(self):
+        return bool(self._current)
+
+    def _is_current(self, job):
+        return self._current.get(job.name) is job and not job.is_cancelled()
+
+    @Slot(object, int)
+    def _on_progress(self, job, percent):
+        if self._is_current(job):
+            self.progress.emit(job.name, percent)
+
+    @Slot(object, object)
+    def _on_finished(self, job, result):
+        if self._is_current(job):
+            del self._current[job.name]
+            job.on_result(result)
+
+    @Slot(object, str)
+    def _on_error(self, job, message):
+        if self._is_current(job):
+            del self._current[job.name]
+            if job.on_error is not None:
+                job.on_error(message)
+
+    @Slot(object)
+    def _on_done(self, job):
+        self._running.discard(job)
+        if not self._current:
+            self.busy_changed.emit(False)
@@ -0,0 +1,158 @@
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+
+from equivalence import combine_codes
+from hierarchies import NodeEvaluator, evaluate_classes, information_loss
+
+
+class ClassTable:
+    # Equivalence classes of one lattice node: the generalized code of every quasi-identifier
+    # per class (n_classes x n_columns), the class sizes and, with a sensitive attribute,
+    # the class x sensitive value counts
+    def __init__(self, codes, sizes, contingency=None):
+        self.codes = codes
+        self.sizes = sizes
+        self.contingency = contingency
+
+    def __len__(self):
+        return len(self.sizes)
+
+
+class LatticeSearch:
+    # Flash-style search over the full-domain generalization lattice. Every node is scored
+    # from a class table rolled up from the closest cached less-general node instead of from
+    # the rows; only the bottom node scans the data. Results are tagged so that a passing
+    # node marks every more general node as passing and a failing node marks every less
+    # general one as failing. That assumes monotone criteria: k-anonymity with suppression
+    # is, while l and t combined with suppression are only close to it, as in ARX.
+    def __init__(self, data, hierarchies, sensitive_attr=None, cache_size=64):
+        self.evaluator = NodeEvaluator(data, hierarchies, sensitive_attr)
+        self.heights = self.evaluator.heights()
+        self.bottom = (0,) * len(self.heights)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._level_maps = {}
+        self._root = self._scan(self.bottom)
+        self.evaluated = 0
+        self._passed, self._failed = {}, []
+
+    def class_table(self, node):
+        if node == self.bottom:
+            return self._root
+        if node in self._cache:
+            self._cache.move_to_end(node)
+            return self._cache[node]
+        source, table = self.bottom, self._root
+        for cached, cached_table in self._cache.items():
+            if len(cached_table) < len(table) and self._rolls_up(cached, node):
+                source, table = cached, cached_table
+        table = self._roll_up(table, source, node)
+        self._cache[node] = table
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return table
+
+    def tag(self, node):
+        # True / False when implied by an earlier evaluation, None when unknown
+        if any(_precedes(passed, node) for passed in self._passed):
+            return True
+        if any(_precedes(node, failed) for failed in self._failed):
+            return False
+        return None
+
+    def check(self, node, k=None, max_suppression=0.0, l=None, t=None):
+        table = self.class_table(node)
+        result = evaluate_classes(node, table.sizes, table.contingency, self.evaluator.n_rows,
+                                  k, max_suppression, l, t)
+        self.evaluated += 1
+        if result['satisfied']:
+            kept = table.sizes[table.sizes >= (k or 1)]
+            result['information_loss'] = information_loss(node, self.heights)
+            result['discernibility'] = int((kept.astype(np.int64) ** 2).sum()) + result['suppressed'] * self.evaluator.n_rows
+            self._passed[node] = result
+        else:
+            self._failed.append(node)
+        return result
+
+    def search(self, k=2, max_suppression=0.0, l=None, t=None):
+        # Minimal nodes meeting the criteria, ranked by information loss then discernibility
+        self._passed, self._failed = {}, []
+        nodes = sorted(itertools.product(*[range(height + 1) for height in self.heights]),
+                       key=lambda node: (sum(node), information_loss(node, self.heights)))
+        for node in nodes:
+            if self.tag(node) is not None:
+                continue
+            # Binary search for the lowest passing node on a path up from this one
+            path = self._path(node)
+            low, high = 0, len(path)
+            while low < high:
+                middle = (low + high) // 2
+                passed = self.tag(path[middle])
+                if passed is None:
+                    passed = self.check(path[middle], k, max_suppression, l, t)['satisfied']
+                if passed:
+                    high = middle
+                else:
+                    low = middle + 1
+
+        minimal = [result for node, result in self._passed.items()
+                   if not any(other != node and _precedes(other, node) for other in self._passed)]
+        minimal.sort(key=lambda result: (result['information_loss'], result['discernibility']))
+        return minimal
+
+    def _path(self, node):
+        # Greedy walk towards the top through untagged successors, cheapest first
+        path = [node]
+        while True:
+            successors = [path[-1][:i] + (level + 1,) + path[-1][i + 1:]
+                          for i, level in enumerate(path[-1]) if level < self.heights[i]]
+            successors = [successor for successor in successors if self.tag(successor) is None]
+            if not successors:
+                return path
+            path.append(min(successors, key=lambda successor: information_loss(successor, self.heights)))
+
+    def _level_map(self, column, source, target):
+        key = (column, source, target)
+        if key not in self._level_maps:
+            self._level_maps[key] = self.evaluator.hierarchies[column].level_map(source, target)
+        return self._level_maps[key]
+
+    def _rolls_up(self, source, target):
+        return _precedes(source, target) and all(
+            self._level_map(i, a, b) is not None for i, (a, b) in enumerate(zip(source, target)))
+
+    def _scan(self, node):
+        group_codes, n_groups = self.evaluator.group_codes(node)
+        valid = group_codes >= 0
+        _, first = np.unique(group_codes[valid], return_index=True)
+        rows = np.flatnonzero(valid)[first]
+        codes = np.column_stack([hierarchy.generalize(base[rows], level) for hierarchy, base, level
+                                 in zip(self.evaluator.hierarchies, self.evaluator.base_codes, node)])
+        sizes = np.bincount(group_codes[valid], minlength=n_groups)
+        contingency = (self.evaluator.contingency(group_codes, n_groups)
+                       if self.evaluator.sensitive_codes is not None else None)
+        return ClassTable(codes, sizes, contingency)
+
+    def _roll_up(self, table, source, target):
+        columns = [table.codes[:, i] if a == b else self._level_map(i, a, b)[table.codes[:, i]]
+                   for i, (a, b) in enumerate(zip(source, target))]
+        cards = [hierarchy.cardinalities[level] for hierarchy, level in zip(self.evaluator.hierarchies, target)]
+        group_codes, n_groups = combine_codes(columns, cards)
+        order = np.argsort(group_codes, kind='stable')
+        starts = np.searchsorted(group_codes[order], np.arange(n_groups))
+        codes = np.column_stack(columns)[order][starts]
+        sizes = np.add.reduceat(table.sizes[order], starts)
+        contingency = (np.add.reduceat(table.contingency[order], starts, axis=0)
+                       if table.contingency is not None else None)
+        return ClassTable(codes, sizes, contingency)
+
+
+def _precedes(lower, upper):
+    return all(a <= b for a, b in zip(lower, upper))
+
+
+def full_domain_search(data, hierarchies, k=2, max_suppression=0.0, sensitive_attr=None, l=None, t=None, cache_size=64):
+    # Minimal full-domain generalizations meeting k (and l / t when given)
+    return LatticeSearch(data, hierarchies, sensitive_attr, cache_size).search(k, max_suppression, l, t)
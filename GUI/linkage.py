@@ -0,0 +1,132 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from equivalence import combine_codes
+
+
+def _is_numeric(values):
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _labels(uniques, numeric):
+    # Values the two tables are matched on: numbers when both columns are numeric (so 30 and
+    # 30.0 match), otherwise their text, as Hierarchy.apply matches
+    if numeric:
+        return pd.Index(np.asarray(uniques, dtype=np.float64))
+    return pd.Index(pd.Series(np.asarray(uniques, dtype=object), dtype=object).astype(str))
+
+
+def encode_keys(release, population, columns):
+    # One shared code per QI tuple for both tables. Each column is factorized once per table
+    # and the population's distinct values are looked up in a hash index of the release's,
+    # so the rows are never compared as text. Population rows whose tuple is not in the
+    # release, and rows of either table with a missing QI, get -1.
+    release_codes, population_codes, cardinalities = [], [], []
+    for column in columns:
+        codes, uniques = pd.factorize(release[column])
+        other_codes, other_uniques = pd.factorize(population[column])
+        numeric = _is_numeric(release[column]) and _is_numeric(population[column])
+        lookup = _labels(uniques, numeric).get_indexer(_labels(other_uniques, numeric))
+        release_codes.append(codes.astype(np.int64, copy=False))
+        population_codes.append(np.where(other_codes >= 0, lookup[np.maximum(other_codes, 0)], -1))
+        cardinalities.append(len(uniques))
+    n_release = len(release)
+    keys, n_keys = combine_codes([np.concatenate([r, p]) for r, p in zip(release_codes, population_codes)], cardinalities)
+    return keys[:n_release], keys[n_release:], n_keys
+
+
+def linkage_attack(release, population, columns, id_column=None):
+    # Match every released record to the population rows sharing its QI tuple. An attacker
+    # who picks one of the F matching rows at random re-identifies the record with
+    # probability 1/F, so the expected re-identifications are the sum of 1/F; a record
+    # with a single match is re-identified outright. With an identifier in both tables the
+    # unique matches are also checked against it.
+    release_keys, population_keys, n_keys = encode_keys(release, population, columns)
+    counts = np.bincount(population_keys[population_keys >= 0], minlength=n_keys)
+    matches = np.where(release_keys >= 0, counts[np.maximum(release_keys, 0)], 0)
+    matched = matches > 0
+    expected = float((1.0 / matches[matched]).sum())
+    records = len(release)
+    report = {
+        'records': records,
+        'population_rows': len(population),
+        'matched_records': int(matched.sum()),
+        'unique_matches': int((matches == 1).sum()),
+        'expected_reidentifications': expected,
+        'reidentification_rate': expected / records if records else 0.0,
+        'unique_match_rate': float((matches == 1).sum() / records) if records else 0.0,
+        'median_matches': float(np.median(matches[matched])) if matched.any() else None,
+    }
+    if id_column is not None and id_column in release.columns and id_column in population.columns:
+        # The population row behind each key matched once (any row of the key otherwise)
+        owner = np.full(n_keys, -1, dtype=np.int64)
+        valid = np.flatnonzero(population_keys >= 0)
+        owner[population_keys[valid]] = valid
+        unique = matches == 1
+        found = population[id_column].to_numpy()[owner[release_keys[unique]]]
+        correct = pd.Series(found).astype(str).to_numpy() == release.loc[unique, id_column].astype(str).to_numpy()
+        report['correct_reidentifications'] = int(correct.sum())
+        report['correct_rate'] = float(correct.sum() / records) if records else 0.0
+    return report, pd.Series(matches, index=release.index, name='matches')
+
+
+def simulate_linkage(release, population, columns, generalizers=None, id_column=None, generalize_release=True):
+    # Exact matches on the released values, and generalized matches after putting the
+    # population through the same generalization as the release: generalizers maps a column
+    # to a function of its values (e.g. Hierarchy.apply, or the preview's replayed edits).
+    # Without generalize_release the release is taken as already generalized.
+    columns = [column for column in columns if column in release.columns and column in population.columns]
+    if not columns:
+        raise ValueError("The release and the population table share none of the quasi-identifiers")
+    exact, matches = linkage_attack(release, population, columns, id_column)
+    results = {'columns': columns, 'exact': exact}
+    per_record = {'exact_matches': matches}
+    generalizers = {column: generalize for column, generalize in (generalizers or {}).items() if column in columns}
+    if generalizers:
+        generalized_population = population[columns + ([id_column] if id_column in population.columns else [])].copy(deep=False)
+        generalized_release = release.copy(deep=False)
+        for column, generalize in generalizers.items():
+            generalized_population[column] = generalize(population[column])
+            if generalize_release:
+                generalized_release[column] = generalize(release[column])
+        results['generalized'], per_record['generalized_matches'] = linkage_attack(generalized_release, generalized_population,
+                                                                                   columns, id_column)
+        results['generalized_columns'] = list(generalizers)
+    return results, pd.DataFrame(per_record)
+
+
+if __name__ == "__main__":
+    from hierarchies import Hierarchy
+    from loader import read_table
+
+    parser = argparse.ArgumentParser(description="Simulate a linkage attack of a released table against a population table.")
+    parser.add_argument('release', help="Released CSV/TSV")
+    parser.add_argument('population', help="CSV/TSV the attacker holds, with the same quasi-identifier columns")
+    parser.add_argument('--qi', required=True, help="Comma-separated quasi-identifier columns")
+    parser.add_argument('--id', default=None, help="Identifier column in both tables, to count correct re-identifications")
+    parser.add_argument('--hierarchy', action='append', default=[],
+                        help="Hierarchy CSV to generalize both tables with for the generalized matches; "
+                             "the file name is the column, or pass COLUMN=PATH. Repeatable.")
+    parser.add_argument('--matches', default=None, help="Write the match counts of every released record to this CSV")
+    args = parser.parse_args()
+
+    quasi_identifiers = [column.strip() for column in args.qi.split(',') if column.strip()]
+    generalizers = {}
+    for spec in args.hierarchy:
+        column, _, path = spec.rpartition('=')
+        hierarchy = Hierarchy.read_csv(path, column or None)
+        generalizers[hierarchy.column] = hierarchy.apply
+    release, _, _ = read_table(args.release)
+    population, _, _ = read_table(args.population)
+    results, matches = simulate_linkage(release, population, quasi_identifiers, generalizers, args.id)
+    if args.matches:
+        matches.to_csv(args.matches, index=False)
+    json.dump(results, sys.stdout, indent=2)
+    print()
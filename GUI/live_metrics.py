@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from disclosure import ContingencyTable, is_ordinal, sensitive_codes
+from equivalence import combine_codes
+
+
+def _factorize(values):
+    # Missing values get a code of their own, so a row always belongs to a class
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    uniques = np.asarray(uniques, dtype=object)
+    missing = np.flatnonzero(pd.isna(uniques))
+    return codes.astype(np.int64, copy=False), uniques, int(missing[0]) if len(missing) else -1
+
+
+class LiveMetrics:
+    # Equivalence-class table of the selected quasi-identifiers, kept up to date edit by edit.
+    # Missing values are a code like any other; classes holding one are left out of the
+    # metrics, which matches EquivalenceClasses dropping those rows. A value merge only
+    # relabels the class table (O(classes)); any other change of a column regroups the rows
+    # from the class codes of the other columns plus the new codes of that column.
+    def __init__(self, data, columns, sensitive_attr=None):
+        self.columns = list(columns)
+        self.sensitive_attr = sensitive_attr
+        encoded = [_factorize(data[column]) for column in self.columns]
+        self.uniques = [uniques for _, uniques, _ in encoded]
+        self.missing_codes = [missing for _, _, missing in encoded]
+        row_codes = [codes for codes, _, _ in encoded]
+        self.group_codes, self.n_groups = combine_codes(row_codes, self._cardinalities())
+        rows = self._first_rows(self.group_codes, self.n_groups)
+        self.class_codes = np.column_stack([codes[rows] for codes in row_codes])
+        self.sizes = np.bincount(self.group_codes, minlength=self.n_groups)
+        if sensitive_attr:
+            self.replace_sensitive(data[sensitive_attr])
+
+    def _cardinalities(self):
+        return [len(uniques) for uniques in self.uniques]
+
+    @staticmethod
+    def _first_rows(group_codes, n_groups):
+        _, first = np.unique(group_codes, return_index=True)
+        return first
+
+    def metrics(self):
+        valid = np.ones(self.n_groups, dtype=bool)
+        for position, missing in enumerate(self.missing_codes):
+            if missing >= 0:
+                valid &= self.class_codes[:, position] != missing
+        sizes = self.sizes[valid]
+        result = {
+            'classes': int(valid.sum()),
+            'unique_rows': int((sizes == 1).sum()),
+            'k_anonymity': int(sizes.min()) if len(sizes) else None,
+        }
+        if self.sensitive_attr:
+            table = self.sensitive.subset(valid)
+            result['l_diversity'] = table.distinct_l()
+            result['t_closeness'] = table.t_closeness()
+        return result
+
+    def merge_values(self, column, selected_values, replacement):
+        # The column's labels are relabelled, then classes that became equal are merged
+        position = self.columns.index(column)
+        old = self.uniques[position]
+        merged = pd.Index(old, dtype=object).isin(selected_values)
+        relabelled = old.copy()
+        relabelled[merged] = replacement
+        remap, uniques, missing = _factorize(pd.Series(relabelled, dtype=object))
+        self.uniques[position], self.missing_codes[position] = uniques, missing
+        class_columns = self.class_codes.copy()
+        class_columns[:, position] = remap[class_columns[:, position]]
+
+        class_map, n_groups = combine_codes([class_columns[:, j] for j in range(len(self.columns))], self._cardinalities())
+        first = self._first_rows(class_map, n_groups)
+        self.class_codes = class_columns[first]
+        self.sizes = np.bincount(class_map, weights=self.sizes, minlength=n_groups).astype(np.int64)
+        self.group_codes = class_map[self.group_codes]
+        self.n_groups = n_groups
+        if self.sensitive_attr:
+            self.sensitive = self.sensitive.regroup(class_map, n_groups)
+
+    def replace_column(self, column, values):
+        position = self.columns.index(column)
+        codes, uniques, missing = _factorize(values)
+        others = [j for j in range(len(self.columns)) if j != position]
+        if others:
+            cards = [len(self.uniques[j]) for j in others]
+            rest, n_rest = combine_codes([self.class_codes[:, j] for j in others], cards)
+            rest = rest[self.group_codes]
+        else:
+            rest, n_rest = np.zeros(len(codes), dtype=np.int64), 1
+        self.uniques[position], self.missing_codes[position] = uniques, missing
+        group_codes, n_groups = combine_codes([rest, codes], [n_rest, len(uniques)])
+
+        rows = self._first_rows(group_codes, n_groups)
+        class_codes = self.class_codes[self.group_codes[rows]]
+        class_codes[:, position] = codes[rows]
+        self.class_codes, self.group_codes, self.n_groups = class_codes, group_codes, n_groups
+        self.sizes = np.bincount(group_codes, minlength=n_groups)
+        if self.sensitive_attr:
+            self.sensitive = ContingencyTable.from_codes(group_codes, n_groups, self._value_codes, self._n_values, self._ordinal)
+
+    def replace_sensitive(self, values):
+        self._ordinal = is_ordinal(values)
+        self._value_codes, self._n_values = sensitive_codes(values, self._ordinal)
+        self.sensitive = ContingencyTable.from_codes(self.group_codes, self.n_groups, self._value_codes, self._n_values, self._ordinal)
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# The ds004215 tables use -999 for "no answer"
+NA_SENTINELS = ['-999', '-999.0']
+CHUNK_SIZE = 100_000
+# Text columns with at most this many distinct values are stored as categories
+CATEGORY_LIMIT = 1000
+# Integral floats up to this magnitude are exact in float32
+FLOAT32_EXACT = 2 ** 24
+
+
+class CardinalitySketch:
+    # Exact distinct values until `limit` is passed; after that the column is only
+    # known to be high-cardinality and its exact count is taken once at the end
+    def __init__(self, limit=CATEGORY_LIMIT):
+        self.limit = limit
+        self.values = set()
+        self.saturated = False
+
+    def update(self, series):
+        if self.saturated:
+            return
+        self.values.update(pd.unique(series.dropna()))
+        if len(self.values) > self.limit:
+            self.saturated = True
+            self.values = set()
+
+    def count(self):
+        return None if self.saturated else len(self.values)
+
+
+def read_table(file_path, chunksize=CHUNK_SIZE, progress=None):
+    # Stream a CSV/TSV in chunks, sketching column cardinality while reading, and return
+    # (data, column unique counts, load report) with low-cardinality columns downcast
+    sep = '\t' if file_path.lower().endswith('.tsv') else ','
+    total_bytes = os.path.getsize(file_path)
+    start = time.perf_counter()
+
+    chunks, sketches, parsed_as_text = [], {}, {}
+    with open(file_path, 'rb') as handle:
+        reader = pd.read_csv(handle, sep=sep, chunksize=chunksize, na_values=NA_SENTINELS)
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.strip()
+            for col in chunk.columns:
+                parsed_as_text.setdefault(col, set()).add(_is_text(chunk[col]))
+                sketch = sketches.setdefault(col, CardinalitySketch())
+                sketch.update(chunk[col])
+                if _is_text(chunk[col]) and not sketch.saturated:
+                    chunk[col] = chunk[col].astype('category')
+            chunks.append(chunk)
+            if progress is not None and total_bytes:
+                progress(min(handle.tell() / total_bytes, 1.0))
+
+    # Columns read as numbers in some chunks and as text in others become text throughout,
+    # so 1 and '1' are one value; their sketches counted both and they are recounted
+    mixed = {col for col, kinds in parsed_as_text.items() if len(kinds) > 1}
+    for chunk in chunks:
+        for col in mixed:
+            chunk[col] = as_text(chunk[col].astype(object) if isinstance(chunk[col].dtype, pd.CategoricalDtype) else chunk[col])
+    data = _concat_chunks(chunks, sketches)
+    column_unique_counts = {}
+    for col in data.columns:
+        count = None if col in mixed else sketches[col].count()
+        column_unique_counts[col] = data[col].nunique() if count is None else count
+        data[col] = downcast_column(data[col], column_unique_counts[col])
+
+    seconds = time.perf_counter() - start
+    megabytes = total_bytes / 1e6
+    report = {
+        'rows': len(data),
+        'columns': data.shape[1],
+        'seconds': seconds,
+        'megabytes': megabytes,
+        'throughput_mb_s': megabytes / seconds if seconds else None,
+        'memory_mb': float(data.memory_usage(deep=True).sum()) / 1e6,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+    return data, column_unique_counts, report
+
+
+def _is_text(series):
+    return series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+
+
+def as_text(series):
+    # Values as the text they were read from, whatever type their chunk was parsed as:
+    # integral floats (integers in a chunk with missing values) lose their '.0', so 1, 1.0
+    # and '1' agree. Missing values stay missing.
+    if _is_text(series):
+        return series.astype(object)
+    text = series.astype(str).to_numpy(dtype=object)
+    if pd.api.types.is_float_dtype(series.dtype):
+        numbers = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        integral = np.isfinite(numbers) & (numbers == np.round(numbers)) & (np.abs(numbers) < 2 ** 53)
+        text[integral] = numbers[integral].astype(np.int64).astype(str)
+    text[series.isna().to_numpy()] = np.nan
+    return pd.Series(text, index=series.index, name=series.name, dtype=object)
+
+
+def _concat_chunks(chunks, sketches):
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        data = chunks[0]
+    else:
+        columns = {}
+        for col in chunks[0].columns:
+            parts = [chunk[col] for chunk in chunks]
+            if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+                columns[col] = pd.Series(union_categoricals([part.array for part in parts]), name=col)
+            else:
+                # A text column that saturated part-way through goes back to plain values
+                parts = [part.astype(object) if isinstance(part.dtype, pd.CategoricalDtype) else part for part in parts]
+                columns[col] = pd.concat(parts, ignore_index=True)
+        data = pd.DataFrame(columns)
+    data = data.reset_index(drop=True)
+    for col in data.columns:
+        if isinstance(data[col].dtype, pd.CategoricalDtype) and sketches[col].saturated:
+            data[col] = data[col].astype(object)
+    return data
+
+
+def downcast_column(series, unique_count):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    if _is_text(series):
+        if unique_count <= CATEGORY_LIMIT and unique_count < len(series) / 2:
+            return series.astype('category')
+        return series
+    if pd.api.types.is_bool_dtype(series.dtype) or not pd.api.types.is_numeric_dtype(series.dtype):
+        return series
+    values = series.to_numpy()
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    finite = values[~np.isnan(values)]
+    if len(finite) and np.all(finite == np.round(finite)) and np.abs(finite).max() < FLOAT32_EXACT:
+        if len(finite) == len(values):
+            return pd.to_numeric(series.astype(np.int64), downcast='integer')
+        return series.astype(np.float32)
+    return series
+
+
+def peak_memory_mb():
+    # High-water mark of the process resident memory
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
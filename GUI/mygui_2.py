@@ -1,16 +1,32 @@
 import sys
 import json
-import numpy as np
+import time
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QPushButton, QFileDialog, QMessageBox, QTreeView, QHeaderView, QLabel,
                                QFrame, QTableView, QStackedWidget, QComboBox, QInputDialog, QSizePolicy,
-                               QStyledItemDelegate, QMenu, QListWidget, QDialog)  # Added QDialog
+                               QStyledItemDelegate, QMenu, QListWidget, QDialog, QProgressBar,
+                               QFormLayout, QDoubleSpinBox, QLineEdit, QDialogButtonBox, QCheckBox, QSpinBox)  # Added QDialog
 
 from PySide6.QtGui import QStandardItemModel, QStandardItem, QFont, QAction
 from PySide6.QtCore import Qt, QDir
 import pandas as pd
-import matplotlib.pyplot as plt
-import networkx as nx
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg, NavigationToolbar2QT
+from matplotlib.figure import Figure
+from equivalence import EquivalenceClasses
+from qi_optimizer import optimize_subsets
+from jobs import JobRunner
+from table_model import DataFrameModel
+from backends import available_backends, get_backend
+from risk import DEFAULT_THRESHOLD, record_risks
+from dp_noise import BudgetExceeded, PrivacyAccountant, add_noise
+from microaggregation import microaggregate
+from transform_journal import TransformJournal, distinct_values
+from cache import cached_read_table
+from linkage import simulate_linkage
+from association import MEASURES, cached_associations, draw_heatmap, leakage
+from live_metrics import LiveMetrics
+from hierarchy_graph import HierarchyGraph
+from sketches import DEFAULT_K, format_estimate, sketch_file, sketch_frame
 
 class NumericStandardItem(QStandardItem):
     def __init__(self, text):
@@ -45,10 +61,14 @@ class FileAnalyzer(QMainWindow):
     def __init__(self):
         super().__init__()
         self.file_path, self.data, self.column_unique_counts, self.metadata, self.sensitive_attr = None, None, {}, {}, None
-        self.original_data = pd.DataFrame()  # To store the original data for reverting changes
-        self.original_columns = {}  # To store the original data of individual columns
+        self.journal = None  # Edits of the loaded data, replayable for undo/redo and revert
+        self.backend, self.dataset = get_backend(), None  # Backend of the loaded file; dataset when it is out of core
         self.combined_values = {} 
-        self.combined_values_history = {}  
+        self.risk_columns = {}  # Per-record risk arrays shown as extra preview columns
+        self.privacy_accountant = PrivacyAccountant()  # Epsilon/delta spent on noise for the loaded file
+        self.live_metrics, self.live_seconds, self.data_version = None, None, 0  # Metrics updated edit by edit
+        self.hierarchy_graphs, self.graph_views = {}, {}  # Merge trees per column and their open windows
+        self.jobs = JobRunner(self)  # Runs the analysis off the GUI thread
         
         # Initialize main UI elements
         self.initUI()
@@ -86,6 +106,9 @@ class FileAnalyzer(QMainWindow):
 
         self.preview_table = QTableView()
         self.preview_table.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # Ensures the table expands to fit the available space
+        self.preview_model = DataFrameModel()  # Reads cells lazily, so the whole dataset can be scrolled
+        self.preview_table.setModel(self.preview_model)
+        self.preview_table.setSortingEnabled(True)
         preview_and_buttons_layout.addWidget(self.preview_table)
 
         # Add the preview table and buttons layout to the main preview layout
@@ -135,8 +158,7 @@ class FileAnalyzer(QMainWindow):
             column_name, ok = QInputDialog.getItem(self, "Select Column", "Select column to combine values:", categorical_columns, 0, False)
 
             if ok and column_name:
-                unique_values = self.data[column_name].unique()
-                unique_values = [val for val in unique_values if pd.notna(val)]  # Remove NaN values
+                unique_values = [str(val) for val in distinct_values(self.data[column_name])]
 
                 if len(unique_values) < 2:
                     QMessageBox.warning(self, "Not Enough Values", "The selected column does not have enough unique values to combine.")
@@ -166,25 +188,20 @@ class FileAnalyzer(QMainWindow):
 
 
     def combine_selected_values(self, column_name, selected_items):
-        selected_values = [item.text() for item in selected_items]
+        # The list shows values as text; merge the values themselves so numeric columns match
+        values_by_text = {str(value): value for value in distinct_values(self.data[column_name])}
+        selected_values = [values_by_text.get(item.text(), item.text()) for item in selected_items]
 
         if len(selected_values) < 2:
             QMessageBox.warning(self, "Insufficient Selection", "Please select at least two values to combine.")
             return
 
-        # Store original data for the column if not already stored
-        if column_name not in self.original_columns:
-            self.original_columns[column_name] = self.data[column_name].copy()
-
         # Combine the selected values
         replacement_value = QInputDialog.getText(self, "Combine Values", "Enter the new value for the selected items:")
         
         if replacement_value[1]:  # Check if the user clicked OK and provided a value
-            if column_name not in self.combined_values_history:
-                self.combined_values_history[column_name] = []
-            self.combined_values_history[column_name].append((selected_values, replacement_value[0]))
-            self.data[column_name] = self.data[column_name].replace(selected_values, replacement_value[0])
-            self.show_preview()  # Refresh the preview to show updated data
+            operation = self.journal.record('merge', [column_name], {'values': selected_values, 'replacement': replacement_value[0]})
+            self.refresh_columns(operation.columns, operation)  # Refresh the preview to show updated data
             QMessageBox.information(self, "Success", "Values have been successfully combined.")
 
 
@@ -197,6 +214,10 @@ class FileAnalyzer(QMainWindow):
             ("Load CSV/TSV File", self.load_file, "#4CAF50"),
             ("Privacy Calculation", self.calculate_unique_rows, "#2196F3"),
             ("Variable Optimization", self.find_lowest_unique_columns, "#FFC107"),
+            ("Subset Optimization", self.optimize_qi_subsets, "#FF9800"),
+            ("Re-identification Risk", self.calculate_risk, "#E91E63"),
+            ("Linkage Attack", self.simulate_linkage_attack, "#9C27B0"),
+            ("Attribute Association", self.calculate_associations, "#00BCD4"),
             ("Preview Data", self.show_preview, "#009688")
         ]
         for text, slot, color in buttons:
@@ -204,6 +225,17 @@ class FileAnalyzer(QMainWindow):
             btn.setStyleSheet(f"background-color: {color}; color: #FFFFFF;")
             btn.clicked.connect(slot)
             button_layout.addWidget(btn)
+        # Sketch-based estimates for quick triage of very large files; unchecked is exact
+        self.approximate_checkbox = QCheckBox("Approximate")
+        self.approximate_checkbox.setToolTip("Estimate unique rows and classes below k with streaming sketches "
+                                             "(HyperLogLog and a distinct sample), with 95% error bounds")
+        button_layout.addWidget(self.approximate_checkbox)
+        # Where files are loaded and grouped; arrow works out of core on files larger than memory
+        self.backend_combobox = QComboBox()
+        self.backend_combobox.addItems(available_backends())
+        self.backend_combobox.setToolTip("pandas: load into memory (needed for the preview, transforms and risk); "
+                                         "arrow: out of core, for privacy calculation and variable optimization")
+        button_layout.addWidget(self.backend_combobox)
 
     def add_frames(self, layout):
         self.load_results_frame, self.variable_optimization_frame = QFrame(), QFrame()
@@ -216,6 +248,34 @@ class FileAnalyzer(QMainWindow):
         self.result_label.setStyleSheet("color: #FFFFFF;")
         layout.addWidget(self.result_label)
 
+        # Progress of the running background job, with a button to cancel it
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        progress_layout.addWidget(self.progress_bar)
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.setStyleSheet("background-color: #F44336; color: #FFFFFF;")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_jobs)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
+        self.jobs.progress.connect(lambda name, percent: self.progress_bar.setValue(percent))
+        self.jobs.busy_changed.connect(self.on_jobs_busy_changed)
+
+    def on_jobs_busy_changed(self, busy):
+        self.cancel_button.setEnabled(busy)
+        if not busy:
+            self.progress_bar.setValue(0)
+
+    def cancel_jobs(self):
+        self.jobs.cancel()
+        self.progress_bar.setValue(0)
+        self.cancel_button.setEnabled(False)
+        self.result_label.setText("Calculation cancelled.")
+
+    def show_job_error(self, message):
+        self.result_label.setText(f"An error occurred: {message}")
+
     def add_load_results_layout(self):
         load_results_layout = QVBoxLayout(self.load_results_frame)
         self.columns_view = QTreeView()
@@ -231,7 +291,7 @@ class FileAnalyzer(QMainWindow):
         load_results_layout.addWidget(self.columns_view)
 
     def add_variable_optimization_layout(self):
-        variable_optimization_layout = QVBoxLayout(self.variable_optimization_frame)
+        variable_optimization_layout = QHBoxLayout(self.variable_optimization_frame)
         self.results_view = QTreeView()
         self.results_model = QStandardItemModel()
         self.results_model.setHorizontalHeaderLabels(["Quasi Identifiers", "Unique Rows After Removal", "Difference", "Normalized"])
@@ -239,6 +299,14 @@ class FileAnalyzer(QMainWindow):
         self.setup_treeview(self.results_view)
         variable_optimization_layout.addWidget(self.results_view)
 
+        # Subset optimizer results, next to the single-column ranking
+        self.optimizer_view = QTreeView()
+        self.optimizer_model = QStandardItemModel()
+        self.optimizer_model.setHorizontalHeaderLabels(["Strategy", "Columns Removed", "K-Anonymity", "Unique Rows", "Subsets Evaluated"])
+        self.optimizer_view.setModel(self.optimizer_model)
+        self.setup_treeview(self.optimizer_view)
+        variable_optimization_layout.addWidget(self.optimizer_view)
+
     def add_preview_page_widgets(self, layout):
         # Create a horizontal layout for buttons
         button_layout = QHBoxLayout()
@@ -246,10 +314,15 @@ class FileAnalyzer(QMainWindow):
         # Existing buttons
         button_data = [
             ('Round Continuous Values', '673AB7', self.round_values),
-            ('Add Laplacian Noise', '009688', lambda: self.add_noise('laplacian')),
+            ('Add Laplacian Noise', '009688', lambda: self.add_noise('laplace')),
             ('Add Gaussian Noise', '4CAF50', lambda: self.add_noise('gaussian')),
+            ('Add Geometric Noise', '795548', lambda: self.add_noise('geometric')),
+            ('Microaggregate (MDAV)', '00796B', self.microaggregate_values),
             ('Revert to Original', 'FF5722', self.revert_to_original),
-            ('Combine Values', 'FF9800', self.show_combine_values_dialog)  # Add Combine Values button
+            ('Undo', '607D8B', self.undo_transform),
+            ('Redo', '607D8B', self.redo_transform),
+            ('Combine Values', 'FF9800', self.show_combine_values_dialog),  # Add Combine Values button
+            ('Export Hierarchy', 'FF9800', self.export_hierarchy)
         ]
 
         for text, color, func in button_data:
@@ -257,6 +330,9 @@ class FileAnalyzer(QMainWindow):
             button.setStyleSheet(f"background-color: #{color}; color: #FFFFFF;")
             button.clicked.connect(func)
             button_layout.addWidget(button)
+            if text in ('Undo', 'Redo'):
+                button.setEnabled(False)
+                setattr(self, f'{text.lower()}_button', button)
         
         # Add the new "Graph Categorical" button
         self.graph_button = QPushButton('Graph Categorical')
@@ -266,6 +342,21 @@ class FileAnalyzer(QMainWindow):
         
         layout.addLayout(button_layout)
 
+        # Privacy budget spent by the noise buttons
+        self.budget_label = QLabel('Privacy budget spent: epsilon 0, delta 0')
+        self.budget_label.setStyleSheet("color: #FFFFFF;")
+        layout.addWidget(self.budget_label)
+
+        # Information loss of the last microaggregation
+        self.transform_label = QLabel('')
+        self.transform_label.setStyleSheet("color: #FFFFFF;")
+        layout.addWidget(self.transform_label)
+
+        # Privacy metrics of the selected columns, updated after every edit
+        self.live_metrics_label = QLabel('')
+        self.live_metrics_label.setStyleSheet("color: #FFFFFF;")
+        layout.addWidget(self.live_metrics_label)
+
         # Metadata display
         self.metadata_display = QLabel('')
         self.metadata_display.setStyleSheet("color: #FFFFFF;")
@@ -297,6 +388,22 @@ class FileAnalyzer(QMainWindow):
         layout.addLayout(metadata_layout)
 
 
+    def export_hierarchy(self):
+        # Save the merges of a column as a hierarchy CSV that batch.py --hierarchy applies to other files
+        merged_columns = [column for column in self.journal.modified_columns() if self.journal.merges(column)] if self.journal else []
+        if not merged_columns:
+            QMessageBox.warning(self, "No Merges", "Combine values of a column first.")
+            return
+        column_name, ok = QInputDialog.getItem(self, "Select Column", "Select column to export:", merged_columns, 0, False)
+        if ok and column_name:
+            file_path, _ = QFileDialog.getSaveFileName(self, "Save Hierarchy", f"{column_name}.csv", "CSV files (*.csv)")
+            if file_path:
+                try:
+                    self.journal.hierarchy(column_name).to_csv(file_path)
+                    self.metadata_display.setText(f"Hierarchy of {column_name} saved to {file_path}")
+                except Exception as e:
+                    QMessageBox.critical(self, "Error", f"An error occurred while exporting: {e}")
+
     def show_graph_categorical_dialog(self):
         if self.data is not None:
             # Get categorical columns
@@ -316,68 +423,56 @@ class FileAnalyzer(QMainWindow):
 
 
     def plot_tree_graph(self, column_name):
-        # Create a NetworkX graph
-        G = nx.DiGraph()  # Directed graph to show hierarchy
-
-        # Add the column name as the root node
-        G.add_node(column_name)
-
-        # Track nodes and edges to add
-        nodes_to_add = set()
-        edges_to_add = set()
-
-        # Process all combined values from history for the column
-        if column_name in self.combined_values_history:
-            for combined_values, replacement_value in self.combined_values_history[column_name]:
-                nodes_to_add.add(replacement_value)
-                edges_to_add.add((column_name, replacement_value))
-                for value in combined_values:
-                    if pd.notna(value):
-                        nodes_to_add.add(value)
-                        edges_to_add.add((replacement_value, value))
-
-        # Ensure that all unique values are added, even if they are not part of the combined values
-        unique_values = self.data[column_name].unique()
-        for value in unique_values:
-            if pd.notna(value) and value not in G.nodes:
-                G.add_node(value)
-                G.add_edge(column_name, value)
-
-        # Add nodes and edges to the graph
-        G.add_nodes_from(nodes_to_add)
-        G.add_edges_from(edges_to_add)
-
-        # Get positions for the nodes in the graph using graphviz_layout
-        pos = nx.drawing.nx_agraph.graphviz_layout(G, prog='dot')  # 'dot' is used for hierarchical layout
-
-        # Create a plot
-        plt.figure(figsize=(12, 8))
-        nx.draw(G, pos, with_labels=True, node_size=1000, node_color='white', font_size=6, font_weight='normal', edge_color='black', arrows=True)
-
-        # Add title
-        plt.title(f'Tree Graph of Values in Column "{column_name}"', fontsize=12)
-
-        # Show the plot
-        plt.show()
-
-
-
-
-
+        # The column's merge tree, kept between clicks and extended as merges are recorded,
+        # drawn in a non-modal window that redraws when the column changes
+        graph = self.hierarchy_graphs.get(column_name)
+        if graph is None:
+            graph = HierarchyGraph(column_name, distinct_values(self.journal.base[column_name]))
+            self.hierarchy_graphs[column_name] = graph
+        graph.sync(self.journal.merges(column_name))
+
+        view = self.graph_views.get(column_name)
+        if view is None:
+            dialog = QDialog(self)
+            dialog.setWindowTitle(f"Hierarchy of {column_name}")
+            dialog.setAttribute(Qt.WA_DeleteOnClose)
+            canvas = FigureCanvasQTAgg(Figure(figsize=(12, 8)))
+            dialog_layout = QVBoxLayout(dialog)
+            dialog_layout.addWidget(NavigationToolbar2QT(canvas, dialog))
+            dialog_layout.addWidget(canvas)
+            dialog.resize(1000, 700)
+            dialog.destroyed.connect(lambda: self.forget_graph_view(column_name, dialog))
+            view = self.graph_views[column_name] = (dialog, canvas)
+        dialog, canvas = view
+        graph.draw(canvas.figure)
+        canvas.draw_idle()
+        dialog.show()
+        dialog.raise_()
+
+    def forget_graph_view(self, column_name, dialog):
+        # Only this window's entry: after a reload the column may already have a new one
+        if self.graph_views.get(column_name, (None,))[0] is dialog:
+            del self.graph_views[column_name]
+
+    def update_graph_views(self, columns):
+        for column_name in columns:
+            if column_name in self.graph_views:
+                self.plot_tree_graph(column_name)
 
     def create_noise_menu(self):
         noise_menu = QMenu()
         laplacian_action = QAction('Add Laplacian Noise', self)
-        laplacian_action.triggered.connect(lambda: self.add_noise('laplacian'))
+        laplacian_action.triggered.connect(lambda: self.add_noise('laplace'))
         noise_menu.addAction(laplacian_action)
         gaussian_action = QAction('Add Gaussian Noise', self)
         gaussian_action.triggered.connect(lambda: self.add_noise('gaussian'))
         noise_menu.addAction(gaussian_action)
+        geometric_action = QAction('Add Geometric Noise', self)
+        geometric_action.triggered.connect(lambda: self.add_noise('geometric'))
+        noise_menu.addAction(geometric_action)
         return noise_menu
 
-    def add_noise(self, noise_type):
-
-        print(f"Add noise triggered with type: {noise_type}") 
+    def add_noise(self, mechanism):
         # Get columns of type "Continuous"
         continuous_columns = [self.columns_model.item(row, 0).text() for row in range(self.columns_model.rowCount())
                               if self.columns_model.item(row, 2).text() == "Continuous"]
@@ -386,20 +481,213 @@ class FileAnalyzer(QMainWindow):
             QMessageBox.warning(self, "No Continuous Columns", "No continuous columns available for adding noise.")
             return
 
-        column_name, ok = QInputDialog.getItem(self, "Select Column", "Select column to add noise:", continuous_columns, 0, False)
-        if ok and column_name:
-            try:
-                if column_name in self.data.columns:
-                    if column_name not in self.original_columns:
-                        self.original_columns[column_name] = self.data[column_name].copy()  # Store original column data
-                    if noise_type == 'laplacian':
-                        noise = np.random.laplace(loc=0.0, scale=1.0, size=len(self.data[column_name]))
-                    elif noise_type == 'gaussian':
-                        noise = np.random.normal(loc=0.0, scale=1.0, size=len(self.data[column_name]))
-                    self.data[column_name] += noise
-                    self.show_preview()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"An error occurred while adding noise: {e}")
+        numeric_columns = [column for column in continuous_columns
+                           if column in self.data.columns and pd.api.types.is_numeric_dtype(self.data[column].dtype)]
+        settings = self.ask_noise_settings(mechanism, numeric_columns)
+        if settings is None:
+            return
+        columns, epsilon, delta, seed = settings
+        data, history = self.data[columns], self.journal.history(columns)
+        journal, accountant = self.journal, self.privacy_accountant
+        try:
+            reserved = accountant.reserve(columns, mechanism, epsilon, delta)
+        except BudgetExceeded as e:
+            QMessageBox.warning(self, "Privacy Budget", str(e))
+            return
+
+        def failed(message):
+            accountant.refund(reserved)
+            QMessageBox.critical(self, "Error", f"An error occurred while adding noise: {message}")
+        self.jobs.submit('transform',
+                         lambda progress: add_noise(data, columns, mechanism, epsilon, delta, seed=seed),
+                         lambda result: self.apply_noise(*result, history, journal, reserved),
+                         failed, lambda: accountant.refund(reserved))
+
+    def ask_noise_settings(self, mechanism, columns):
+        # Columns (all selected by default), epsilon, delta for the Gaussian mechanism and an optional seed
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Add {mechanism.capitalize()} Noise")
+        dialog.setStyleSheet("background-color: #121212; color: #FFFFFF;")
+        layout = QFormLayout(dialog)
+
+        list_widget = QListWidget(dialog)
+        list_widget.setSelectionMode(QListWidget.MultiSelection)
+        list_widget.addItems(columns)
+        list_widget.selectAll()
+        layout.addRow("Columns:", list_widget)
+        epsilon_input = QDoubleSpinBox(dialog)
+        epsilon_input.setRange(0.01, 100.0)
+        epsilon_input.setValue(1.0)
+        layout.addRow("Epsilon per column:", epsilon_input)
+        delta_input = QLineEdit("1e-5", dialog)
+        delta_input.setEnabled(mechanism == 'gaussian')
+        layout.addRow("Delta:", delta_input)
+        seed_input = QLineEdit(dialog)
+        seed_input.setPlaceholderText("random")
+        layout.addRow("Seed:", seed_input)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, dialog)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addRow(buttons)
+
+        if dialog.exec() != QDialog.Accepted:
+            return None
+        selected = [item.text() for item in list_widget.selectedItems()]
+        try:
+            delta = float(delta_input.text()) if mechanism == 'gaussian' else None
+            seed = int(seed_input.text()) if seed_input.text().strip() else None
+        except ValueError:
+            QMessageBox.warning(self, "Invalid Input", "Delta must be a number and the seed an integer.")
+            return None
+        if seed is not None and seed < 0:
+            # numpy rejects negative seeds; caught here rather than as a failed job
+            QMessageBox.warning(self, "Invalid Input", "The seed must be zero or a positive integer.")
+            return None
+        return (selected, epsilon_input.value(), delta, seed) if selected else None
+
+    def microaggregate_values(self):
+        # Continuous columns replaced by the centroids of clusters of at least k similar rows
+        if not self.require_in_memory():
+            return
+        continuous_columns = [self.columns_model.item(row, 0).text() for row in range(self.columns_model.rowCount())
+                              if self.columns_model.item(row, 2).text() == "Continuous"]
+        numeric_columns = [column for column in continuous_columns
+                           if column in self.data.columns and pd.api.types.is_numeric_dtype(self.data[column].dtype)]
+        if not numeric_columns:
+            QMessageBox.warning(self, "No Continuous Columns", "No continuous columns available for microaggregation.")
+            return
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Microaggregate (MDAV)")
+        dialog.setStyleSheet("background-color: #121212; color: #FFFFFF;")
+        layout = QFormLayout(dialog)
+        list_widget = QListWidget(dialog)
+        list_widget.setSelectionMode(QListWidget.MultiSelection)
+        list_widget.addItems(numeric_columns)
+        list_widget.selectAll()
+        layout.addRow("Columns:", list_widget)
+        k_input = QSpinBox(dialog)
+        k_input.setRange(2, 1000)
+        k_input.setValue(DEFAULT_K)
+        layout.addRow("Minimum cluster size k:", k_input)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, dialog)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addRow(buttons)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        columns = [item.text() for item in list_widget.selectedItems()]
+        if not columns:
+            return
+        k = k_input.value()
+        data, history, journal = self.data[columns], self.journal.history(columns), self.journal
+        self.jobs.submit('transform',
+                         lambda progress: microaggregate(data, columns, k, progress=progress),
+                         lambda result: self.apply_microaggregation(k, *result, history, journal),
+                         lambda message: QMessageBox.critical(self, "Error", f"An error occurred while microaggregating: {message}"))
+
+    def apply_microaggregation(self, k, aggregated, labels, loss, history=None, journal=None):
+        if journal is not None and journal is not self.journal:
+            return  # Computed on a file that has since been replaced
+        operation = self.journal.record('microaggregate', list(aggregated), {'k': k, 'labels': labels}, results=aggregated,
+                                        based_on=history)
+        self.transform_label.setText(f"Microaggregated {', '.join(operation.columns)} into clusters of at least {k} "
+                                  f"(information loss {loss:.2%})")
+        self.refresh_columns(operation.columns, operation)
+
+    def apply_noise(self, noisy, releases, history=None, journal=None, reserved=None):
+        if journal is not None and journal is not self.journal:
+            return  # Computed on a file that has since been replaced
+        # Undoing noise later does not refund the budget: the noisy values have been seen
+        if reserved is None:
+            self.privacy_accountant.charge(releases)
+        else:
+            self.privacy_accountant.settle(reserved, releases)
+        operation = self.journal.record('noise', list(noisy), {'releases': {release['column']: release for release in releases}},
+                                        results=noisy, based_on=history)
+        epsilon, delta = self.privacy_accountant.spent()
+        self.budget_label.setText(f"Privacy budget spent: epsilon {epsilon:g}, delta {delta:g} "
+                                  f"(last seed {releases[0]['seed']})")
+        self.refresh_columns(operation.columns, operation)
+
+    def refresh_columns(self, columns, operation=None):
+        # Bring edited columns of self.data in line with the journal and redraw the preview
+        for column_name in columns:
+            self.data[column_name] = self.journal.column(column_name)
+        self.data_version += 1
+        self.risk_columns = {}  # Risks and matches of the old values would sit next to the new ones
+        self.update_live_columns(columns, operation)
+        self.update_graph_views(columns)
+        self.undo_button.setEnabled(self.journal.can_undo())
+        self.redo_button.setEnabled(self.journal.can_redo())
+        self.show_preview()
+
+    def update_live_columns(self, columns, operation=None):
+        # A just-recorded merge relabels the class table; any other change regroups from the new column
+        live = self.live_metrics
+        if live is None:
+            return
+        start = time.perf_counter()
+        for column_name in columns:
+            if column_name in live.columns and operation is not None and operation.kind == 'merge':
+                live.merge_values(column_name, operation.params['values'], operation.params['replacement'])
+            elif column_name in live.columns:
+                live.replace_column(column_name, self.data[column_name])
+            elif column_name == live.sensitive_attr:
+                live.replace_sensitive(self.data[column_name])
+        self.live_seconds = time.perf_counter() - start
+
+    def update_live_metrics(self):
+        # Rebuild the live metrics when the selected columns changed, otherwise just show them
+        columns = self.get_selected_columns(warn=False)
+        sensitive_attrs = self.get_sensitive_attributes()
+        sensitive_attr = sensitive_attrs[0] if sensitive_attrs else None
+        if not columns:
+            self.live_metrics = None
+            self.live_metrics_label.setText('')
+            return
+        live = self.live_metrics
+        if live is not None and live.columns == columns and live.sensitive_attr == sensitive_attr:
+            self.show_live_metrics()
+            return
+        self.live_metrics, self.live_seconds = None, None
+        self.live_metrics_label.setText('Computing live privacy metrics...')
+        version = self.data_version
+        data = {column_name: self.data[column_name] for column_name in columns + sensitive_attrs[:1]}
+        self.jobs.submit('live_metrics', lambda progress: LiveMetrics(data, columns, sensitive_attr),
+                         lambda result: self.on_live_metrics_built(result, version), self.show_job_error)
+
+    def on_live_metrics_built(self, live, version):
+        if version != self.data_version:
+            # The data was edited while the metrics were built
+            self.update_live_metrics()
+            return
+        self.live_metrics = live
+        self.show_live_metrics()
+
+    def show_live_metrics(self):
+        live = self.live_metrics
+        metrics = live.metrics()
+        text = (f"Live metrics ({', '.join(live.columns)}): {metrics['classes']} classes, "
+                f"{metrics['unique_rows']} unique rows, k = {metrics['k_anonymity']}")
+        if live.sensitive_attr:
+            t_closeness = metrics['t_closeness']
+            text += (f", l = {metrics['l_diversity']}, t = {t_closeness:.3f}" if t_closeness is not None
+                     else f", l = {metrics['l_diversity']}") + f" for {live.sensitive_attr}"
+        if self.live_seconds is not None:
+            text += f" (updated in {self.live_seconds * 1000:.1f} ms)"
+        self.live_metrics_label.setText(text)
+
+    def undo_transform(self):
+        if self.journal is not None and self.journal.can_undo():
+            operation = self.journal.applied()[-1]
+            self.refresh_columns(self.journal.undo())
+            self.metadata_display.setText(f"Undone: {operation.describe()}")
+
+    def redo_transform(self):
+        if self.journal is not None and self.journal.can_redo():
+            self.refresh_columns(self.journal.redo())
+            self.metadata_display.setText(f"Redone: {self.journal.applied()[-1].describe()}")
 
     def setup_treeview(self, view):
         # Configure tree view
@@ -418,17 +706,53 @@ class FileAnalyzer(QMainWindow):
             self.load_data(file_path)
 
     def load_data(self, file_path):
-        try:
-            sep = '\t' if file_path.lower().endswith('.tsv') else ','
-            self.data = pd.read_csv(file_path, sep=sep)
-            self.data.columns = self.data.columns.str.strip()
-            self.column_unique_counts = {col: self.data[col].nunique() for col in self.data.columns}
-            sorted_columns = sorted(self.column_unique_counts.items(), key=lambda x: x[1], reverse=True)
-            column_types = [(col, count, "Continuous" if count > 25 else "Categorical") for col, count in sorted_columns]
-            self.original_data = self.data.copy()  # Store the original data
-            self.update_treeview(self.columns_model, column_types, add_checkbox=True)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"An error occurred: {e}")
+        backend = get_backend(self.backend_combobox.currentText())
+        self.jobs.submit('load', lambda progress: backend.load(file_path, progress=progress),
+                         lambda result: self.on_data_loaded(file_path, *result, backend=backend),
+                         lambda message: QMessageBox.critical(self, "Error", f"An error occurred: {message}"))
+
+    def on_data_loaded(self, file_path, data, column_unique_counts, report, backend=None):
+        self.jobs.cancel('transform')  # Noise or microaggregation of the old file
+        self.file_path, self.data, self.column_unique_counts = file_path, data, column_unique_counts
+        self.backend = backend or get_backend()
+        self.dataset = None if self.backend.in_memory else data
+        self.risk_columns = {}
+        self.data_version += 1
+        self.privacy_accountant = PrivacyAccountant()
+        self.transform_label.setText('')
+        self.live_metrics, self.live_seconds = None, None
+        for dialog, _ in list(self.graph_views.values()):
+            dialog.close()
+        self.hierarchy_graphs, self.graph_views = {}, {}
+        sorted_columns = sorted(self.column_unique_counts.items(), key=lambda x: x[1], reverse=True)
+        column_types = [(col, count, "Continuous" if count > 25 else "Categorical") for col, count in sorted_columns]
+        self.journal = TransformJournal(data) if self.backend.in_memory else None
+        self.data = self.journal.frame() if self.journal else None  # Shares the loaded columns; edits replace columns, never modify them
+        self.undo_button.setEnabled(False)
+        self.redo_button.setEnabled(False)
+        self.update_treeview(self.columns_model, column_types, add_checkbox=True)
+        peak = f", peak memory {report['peak_memory_mb']:.0f} MB" if report['peak_memory_mb'] is not None else ""
+        source = " from cache" if report['cached'] else ""
+        if self.dataset is not None:
+            self.result_label.setText(f"Opened {report['rows']} rows out of core{' from cache' if report['cached'] else ''} "
+                                      f"in {report['seconds']:.2f} s{peak}")
+            return
+        self.result_label.setText(f"Loaded {report['rows']} rows{source} in {report['seconds']:.2f} s "
+                                  f"({report['throughput_mb_s'] or 0:.1f} MB/s), {report['memory_mb']:.1f} MB in memory{peak}")
+
+    def require_in_memory(self):
+        # Preview, transforms, subset optimization and risk work on the in-memory frame
+        if self.data is None and self.dataset is not None:
+            self.result_label.setText("This needs the file in memory: reload it with the pandas backend.")
+            return False
+        return True
+
+    def analysis_data(self, columns):
+        # What a worker computes on: a snapshot of the columns, so later edits on the preview
+        # page cannot race it, or the out-of-core dataset
+        if self.dataset is not None:
+            return self.dataset
+        return self.data[list(dict.fromkeys(columns))]
 
     def update_treeview(self, model, data_list, add_checkbox=False):
         model.removeRows(0, model.rowCount())
@@ -443,77 +767,224 @@ class FileAnalyzer(QMainWindow):
     def calculate_unique_rows(self):
         selected_columns = self.get_selected_columns()
         if selected_columns:
-            sensitive_attr = self.get_sensitive_attribute()
-            try:
-                value_counts = self.data[selected_columns].value_counts()
-                num_unique_rows = len(value_counts[value_counts == 1])
-                k_anonymity = self.calculate_k_anonymity(selected_columns)
-                l_diversity = self.calculate_l_diversity(selected_columns, sensitive_attr) if sensitive_attr else None
-                result_text = (f"Unique Rows: {num_unique_rows}\n"
-                               f"K-Anonymity: {k_anonymity}\n"
-                               f"L-Diversity: {l_diversity}\n")
-                self.result_label.setText(result_text)
-            except Exception as e:
-                self.result_label.setText(f"An error occurred: {e}")
-
-    def get_selected_columns(self):
+            sensitive_attrs = self.get_sensitive_attributes()
+            data, backend, file_path = self.analysis_data(selected_columns + sensitive_attrs), self.backend, self.file_path
+            if self.approximate_checkbox.isChecked():
+                # Out of core, the sketches stream the file itself
+                sketch = ((lambda progress: sketch_file(file_path, selected_columns, DEFAULT_K, progress=progress))
+                          if self.dataset is not None else
+                          (lambda progress: sketch_frame(data, selected_columns, DEFAULT_K, progress=progress)))
+                self.jobs.submit('privacy', sketch, self.show_approximate_summary, self.show_job_error)
+                return
+            self.jobs.submit('privacy', lambda progress: backend.privacy_summary(data, selected_columns, sensitive_attrs, progress),
+                             self.show_privacy_summary, self.show_job_error)
+
+    def show_privacy_summary(self, summary):
+        result_text = (f"Unique Rows: {summary['unique_rows']}\n"
+                       f"K-Anonymity: {summary['k_anonymity']}\n"
+                       f"L-Diversity: {summary['l_diversity']}\n")
+        for attr, metrics in summary['disclosure'].items():
+            if metrics['t_closeness'] is None:
+                result_text += f"\n{attr}: no values in the selected classes"
+                continue
+            result_text += (f"\n{attr}: distinct l = {metrics['distinct_l']}, "
+                            f"entropy l = {metrics['entropy_l']:.2f}, "
+                            f"recursive (c,2) c = {metrics['recursive_c']:.2f}, "
+                            f"t-closeness = {metrics['t_closeness']:.3f}"
+                            f"{' (ordinal)' if metrics['ordinal'] else ''}, "
+                            f"delta-disclosure = {metrics['delta_disclosure']:.3f}")
+        self.result_label.setText(result_text)
+
+    def show_approximate_summary(self, summary):
+        mode = "exact: every class fit the sample" if summary['exact'] else "approximate, 95% bounds"
+        below = {True: "yes", False: "no", None: "none found in the sample"}[summary['k_below_threshold']]
+        self.result_label.setText(f"Rows: {summary['rows']} ({mode})\n"
+                                  f"Equivalence classes: {format_estimate(summary['classes'])}\n"
+                                  f"Unique Rows: {format_estimate(summary['unique_rows'])}\n"
+                                  f"K-Anonymity: {'' if summary['exact'] else 'at most '}{summary['k_anonymity_at_most']}\n"
+                                  f"Classes smaller than {summary['k']}: {format_estimate(summary['classes_below_k'])} (k < {summary['k']}: {below})\n"
+                                  f"Records in classes smaller than {summary['k']}: {format_estimate(summary['records_below_k'])}")
+
+    def get_selected_columns(self, warn=True):
+        # warn=False for background refreshes, which must not overwrite the results shown
         selected_indexes = self.columns_view.selectionModel().selectedRows()
         selected_columns = [self.columns_model.itemFromIndex(index).text() for index in selected_indexes]
-        if not selected_columns:
+        if not selected_columns and warn:
             self.result_label.setText("Please select at least one column.")
         return selected_columns
 
-    def get_sensitive_attribute(self):
-        for row in range(self.columns_model.rowCount()):
-            if self.columns_model.item(row, 3).checkState() == Qt.Checked:
-                return self.columns_model.item(row, 0).text()
-        return None
+    def get_sensitive_attributes(self):
+        return [self.columns_model.item(row, 0).text() for row in range(self.columns_model.rowCount())
+                if self.columns_model.item(row, 3).checkState() == Qt.Checked]
 
     def calculate_k_anonymity(self, selected_columns):
-        grouped = self.data.groupby(selected_columns).size().reset_index(name='counts')
-        return grouped['counts'].min()
+        return EquivalenceClasses.from_frame(self.data, selected_columns).k_anonymity()
 
     def calculate_l_diversity(self, selected_columns, sensitive_attr):
-        grouped = self.data.groupby(selected_columns)
-        return grouped[sensitive_attr].nunique().min()
+        return EquivalenceClasses.from_frame(self.data, selected_columns).l_diversity(self.data[sensitive_attr])
 
     def find_lowest_unique_columns(self):
         selected_columns = self.get_selected_columns()
         if selected_columns:
-            try:
-                subset_data = self.data[selected_columns]
-                value_counts = subset_data.value_counts()
-                unique_rows = value_counts[value_counts == 1].index
-                all_unique_count = len(unique_rows)
-
-                results = []
-                for column in selected_columns:
-                    temp_columns = [col for col in selected_columns if col != column]
-                    if temp_columns:
-                        subset_data_after_removal = self.data[temp_columns]
-                        value_counts_after_removal = subset_data_after_removal.value_counts()
-                        unique_rows_after_removal = value_counts_after_removal[value_counts_after_removal == 1].index
-                        unique_count_after_removal = len(unique_rows_after_removal)
-                        difference = all_unique_count - unique_count_after_removal
-                        unique_values_count = subset_data[column].nunique()
-                        normalized_difference = round(difference / unique_values_count, 1)
-                        results.append((column, unique_count_after_removal, difference, normalized_difference))
-
-                results.sort(key=lambda x: x[3], reverse=True)
-                self.update_treeview(self.results_model, results, add_checkbox=False)
-            except Exception as e:
-                self.result_label.setText(f"An error occurred: {e}")
+            data, backend = self.analysis_data(selected_columns), self.backend
+            self.jobs.submit('optimization', lambda progress: backend.rank_column_removals(data, selected_columns, progress=progress),
+                             lambda results: self.update_treeview(self.results_model, results, add_checkbox=False),
+                             self.show_job_error)
+
+    def optimize_qi_subsets(self):
+        selected_columns = self.get_selected_columns()
+        if selected_columns and self.require_in_memory():
+            target_k, ok = QInputDialog.getInt(self, "Target K", "Smallest k to reach:", 5, 2)
+            if not ok:
+                return
+            strategies = {"Branch and Bound": "branch_and_bound", "Beam Search": "beam", "Greedy": "greedy"}
+            strategy, ok = QInputDialog.getItem(self, "Select Strategy", "Select search strategy:", list(strategies), 0, False)
+            if not ok:
+                return
+            data = self.data[selected_columns]
+            self.jobs.submit('subset_optimization',
+                             lambda progress: optimize_subsets(data, selected_columns, target_k, strategies[strategy], progress=progress),
+                             lambda result: self.show_subset_results(strategy, target_k, *result),
+                             self.show_job_error)
+
+    def calculate_risk(self):
+        selected_columns = self.get_selected_columns()
+        if selected_columns and self.require_in_memory():
+            threshold, ok = QInputDialog.getDouble(self, "Risk Threshold", "Flag records with risk above:", DEFAULT_THRESHOLD, 0.0, 1.0, 3)
+            if not ok:
+                return
+            sampling_fraction, ok = QInputDialog.getDouble(self, "Sampling Fraction",
+                                                           "Share of the population in this file (1 = whole population):", 1.0, 0.0001, 1.0, 4)
+            if not ok:
+                return
+            data, version = self.data[selected_columns], self.data_version
+            self.jobs.submit('risk', lambda progress: record_risks(data, selected_columns, sampling_fraction=sampling_fraction,
+                                                                   threshold=threshold),
+                             lambda result: self.show_risk(*result, version), self.show_job_error)
+
+    def show_risk(self, risks, summary, version=None):
+        # The per-record risks become sortable columns of the preview table, unless the data
+        # was edited while they were computed
+        if version is None or version == self.data_version:
+            self.risk_columns = {**self.risk_columns, 'Prosecutor Risk': risks['prosecutor'], 'Journalist Risk': risks['journalist']}
+        lines = [f"Records: {summary['records']} (threshold {summary['threshold']:g})"]
+        for name in ('prosecutor', 'journalist'):
+            metrics = summary[name]
+            lines.append(f"{name.capitalize()} risk: max {metrics['max']:.3f}, mean {metrics['mean']:.3f}, "
+                         f"{metrics['share_above_threshold']:.1%} of records above threshold")
+        lines.append(f"Marketer risk: {summary['marketer']['mean']:.3f}")
+        self.result_label.setText("\n".join(lines))
+
+    def simulate_linkage_attack(self):
+        # Match the release (with its preview edits) against a table an attacker could hold
+        # with the same quasi-identifiers, e.g. a voter file
+        selected_columns = self.get_selected_columns()
+        if not selected_columns or not self.require_in_memory():
+            return
+        population_path, _ = QFileDialog.getOpenFileName(self, "Open Attacker Table", QDir.homePath(),
+                                                         "CSV/TSV files (*.csv *.tsv)")
+        if not population_path:
+            return
+        id_column, ok = QInputDialog.getItem(self, "Identifier", "Identifier in both tables, to check the matches:",
+                                             ["(none)"] + list(self.data.columns), 0, False)
+        if not ok:
+            return
+        id_column = None if id_column == "(none)" else id_column
+        # Rounding and merges are applied to the attacker's table too; noise and
+        # microaggregation depend on the rows and cannot be
+        generalizers, not_generalized = {}, []
+        for column in selected_columns:
+            operations = self.journal.replayable(column)
+            if operations is None:
+                not_generalized.append(column)
+            elif operations:
+                generalizers[column] = lambda values, column=column, operations=operations: self.replay_edits(column, values, operations)
+        release = self.data[selected_columns + ([id_column] if id_column and id_column not in selected_columns else [])]
+        version = self.data_version
+        self.jobs.submit('linkage',
+                         lambda progress: simulate_linkage(release, cached_read_table(population_path)[0], selected_columns,
+                                                           generalizers, id_column, generalize_release=False),
+                         lambda result: self.show_linkage(*result, not_generalized, version), self.show_job_error)
+
+    @staticmethod
+    def replay_edits(column, values, operations):
+        for operation in operations:
+            values = operation.apply(column, values)
+        return values
+
+    def show_linkage(self, results, matches, not_generalized, version=None):
+        if version is None or version == self.data_version:
+            self.risk_columns = {**self.risk_columns, **{name.replace('_', ' ').title(): matches[name].to_numpy()
+                                                         for name in matches.columns}}
+        lines = [f"Linkage on {', '.join(results['columns'])} against {results['exact']['population_rows']} population rows"]
+        for name in ('exact', 'generalized'):
+            if name not in results:
+                continue
+            report = results[name]
+            line = (f"{name.capitalize()} matches: {report['matched_records']} of {report['records']} records matched, "
+                    f"{report['unique_matches']} uniquely, re-identification rate {report['reidentification_rate']:.2%}")
+            if 'correct_reidentifications' in report:
+                line += f", {report['correct_reidentifications']} correct"
+            lines.append(line)
+        if not_generalized:
+            lines.append(f"Edits of {', '.join(not_generalized)} cannot be applied to the attacker's table")
+        self.result_label.setText("\n".join(lines))
+
+    def calculate_associations(self):
+        # Cramer's V, mutual information and correlation ratio of the selected columns and the
+        # sensitive attribute, or of every column when none is selected; cached per data version
+        if not self.require_in_memory():
+            return
+        sensitive_attrs = self.get_sensitive_attributes()
+        columns = list(dict.fromkeys((self.get_selected_columns() or list(self.data.columns)) + sensitive_attrs))
+        if len(columns) < 2:
+            QMessageBox.warning(self, "Warning", "Select at least two columns.")
+            return
+        data, version = self.data[columns], self.data_version
+        self.jobs.submit('association', lambda progress: cached_associations(data, columns, version=version),
+                         lambda result: self.show_associations(result, sensitive_attrs[0] if sensitive_attrs else None),
+                         self.show_job_error)
+
+    def show_associations(self, result, sensitive_attr):
+        lines = [f"Associations of {len(result['columns'])} columns in {result['seconds']:.2f} s"]
+        if result['skipped']:
+            lines.append(f"Skipped as identifiers: {', '.join(result['skipped'])}")
+        if sensitive_attr in result['columns']:
+            ranking = leakage(result, sensitive_attr, top=5)
+            lines.append(f"Strongest associations with {sensitive_attr}: " +
+                         ", ".join(f"{column} (V {row.cramers_v:.2f})" for column, row in ranking.iterrows()))
+        self.result_label.setText("\n".join(lines))
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Attribute Association")
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        canvas = FigureCanvasQTAgg(Figure(figsize=(12, 10)))
+        measure_combobox = QComboBox(dialog)
+        measure_combobox.addItems(MEASURES)
+        measure_combobox.currentTextChanged.connect(lambda measure: (draw_heatmap(result, measure, canvas.figure), canvas.draw_idle()))
+        dialog_layout = QVBoxLayout(dialog)
+        dialog_layout.addWidget(measure_combobox)
+        dialog_layout.addWidget(NavigationToolbar2QT(canvas, dialog))
+        dialog_layout.addWidget(canvas)
+        dialog.resize(1000, 850)
+        draw_heatmap(result, 'cramers_v', canvas.figure)
+        dialog.show()
+
+    def show_subset_results(self, strategy, target_k, results, stats):
+        if not results:
+            self.result_label.setText(f"K-Anonymity of {target_k} cannot be reached by removing columns.")
+            return
+        rows = [(strategy, ", ".join(result['removed']) or "None", result['k_anonymity'],
+                 result['unique_rows'], stats['evaluated']) for result in results]
+        self.update_treeview(self.optimizer_model, rows, add_checkbox=False)
+        self.result_label.setText(f"Evaluated {stats['evaluated']} subsets in {stats['seconds']:.2f} s")
 
     def show_preview(self):
+        if not self.require_in_memory():
+            return
         if self.data is not None:
-            preview_data = self.data.head(10)
-            model = QStandardItemModel()
-            model.setHorizontalHeaderLabels(preview_data.columns)
-            for row in preview_data.itertuples(index=False):
-                items = [NumericStandardItem(str(item)) if isinstance(item, (int, float)) else QStandardItem(str(item)) for item in row]
-                model.appendRow(items)
-            self.preview_table.setModel(model)
-            self.preview_table.setMaximumHeight(200)  # Set a maximum height for the preview table
+            self.preview_model.set_frame(self.data, self.risk_columns)
+            self.update_live_metrics()
             self.update_column_dropdown()
             self.stacked_widget.setCurrentWidget(self.preview_page)
         else:
@@ -560,19 +1031,19 @@ class FileAnalyzer(QMainWindow):
                 try:
                     factor = 10 ** int(precision.split('^')[1])
                     if column_name in self.data.columns:
-                        self.original_columns.setdefault(column_name, self.data[column_name].copy())  # Store original data if not already
-                        self.data[column_name] = (self.data[column_name] / factor).round() * factor
-                        self.show_preview()
+                        operation = self.journal.record('round', [column_name], {'factor': factor})
+                        self.refresh_columns(operation.columns, operation)
                 except Exception as e:
                     QMessageBox.critical(self, "Error", f"An error occurred while rounding: {e}")
 
     def revert_to_original(self):
-        column_name, ok = QInputDialog.getItem(self, "Select Column", "Select column to revert:", list(self.original_columns.keys()), 0, False)
+        modified_columns = self.journal.modified_columns() if self.journal is not None else []
+        column_name, ok = QInputDialog.getItem(self, "Select Column", "Select column to revert:", modified_columns, 0, False)
         if ok and column_name:
             try:
-                if column_name in self.original_columns:
-                    self.data[column_name] = self.original_columns[column_name]
-                    self.show_preview()
+                if column_name in modified_columns:
+                    operation = self.journal.record('revert', [column_name])
+                    self.refresh_columns(operation.columns, operation)
                 else:
                     QMessageBox.warning(self, "Warning", f"No original data available for column {column_name}.")
             except Exception as e:
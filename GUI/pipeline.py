@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cache import FrameCache, read_csv_cached
+
+
+def _source_version():
+    # Hash of this file: editing any stage rebuilds the cached pre_datasets without anyone
+    # having to remember a version number (a comment edit rebuilds them too, harmlessly)
+    with open(__file__, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+
+PIPELINE_VERSION = _source_version()
+
+
+def _drop_sparse_columns(frame, threshold=70):
+    na_percentages = frame.isna().mean() * 100
+    return frame.drop(columns=na_percentages[na_percentages > threshold].index.tolist())
+
+
+def _select_labels(conditions, labels, index):
+    # Like np.select, but object-typed so unmatched rows stay NaN instead of the text 'nan'
+    result = np.full(len(index), np.nan, dtype=object)
+    for condition, label in zip(reversed(conditions), reversed(labels)):
+        result[np.asarray(condition, dtype=bool)] = label
+    return pd.Series(result, index=index)
+
+
+# Alcohol Use Disorders Identification Test: summed score to 0 (1-7), 1 (8-14), 3 (otherwise)
+def clean_audit(audit):
+    audit = audit.rename(columns={col: col.split(',')[0] for col in audit.columns})
+    score = audit[audit.columns.difference(['participant_id'])].sum(axis=1)
+    audit['Audit_Category'] = np.select([(score >= 0) & (score <= 7), (score >= 8) & (score <= 14)], [0, 1], default=3)
+    return audit[['participant_id', 'Audit_Category']]
+
+
+HEALTH_HISTORY_DROPPED = ['nimh_rv_clinhx_02, current_medication', 'PREGNANT', 'nimh_rv_clinhx_01', 'nimh_rv_clinhx_01_2',
+                          'nimh_rv_clinhx_01_3', 'nimh_rv_clinhx_01_4', 'nimh_rv_clinhx_01_5']
+
+
+# Health history: family-occurrence answers 0-5 become 1 (yes), 6 becomes 0 (none)
+def clean_health_history(health_history):
+    health_history = health_history.drop(columns=HEALTH_HISTORY_DROPPED).replace(-999, np.nan)
+    health_history = _drop_sparse_columns(health_history)
+    columns_to_transform = [col for col in health_history.columns if col.startswith('nimh') or col.startswith('CLIN')]
+    values = health_history[columns_to_transform]
+    health_history[columns_to_transform] = values.mask(values.isin([0, 1, 2, 3, 4, 5]), 1).mask(values == 6, 0)
+    return health_history
+
+
+# DSM-5 Level 1 cross-cutting measure: (new column, source columns, threshold reached by any of them)
+MENTAL_HEALTH_INDICATIONS = [
+    ('depressive_indication', ['dsm5_1_bl, dsm5_1_fu', 'dsm5_2_bl, dsm5_2_fu'], 2),
+    ('anger_indication', ['dsm5_3_bl, dsm5_3_fu'], 2),
+    ('mania_indication', ['broad_psychpath4, dsm5_4_bl, dsm5_4_fu', 'broad_psychpath5, dsm5_5_bl, dsm5_5_fu'], 2),
+    ('anxiety_indication', ['dsm5_6_bl, dsm5_6_fu', 'dsm5_7_bl, dsm5_7_fu', 'dsm5_8_bl, dsm5_8_fu'], 2),
+    ('somatic_symptoms', ['broad_psychpath9, dsm5_9_bl, dsm5_9_fu', 'broad_psychpath10, dsm5_10_bl, dsm5_10_fu'], 2),
+    ('psychosis_indication', ['dsm5_12_bl, dsm5_12_fu', 'dsm5_13_bl, dsm5_13_fu'], 1),
+    ('sleep_indication', ['dsm5_14_bl, dsm5_14_fu'], 2),
+    ('memory_indication', ['dsm5_15_bl, dsm5_15_fu'], 2),
+    ('ocd_indication', ['broad_psychpath16, dsm5_16_bl, dsm5_16_fu', 'broad_psychpath17, dsm5_17_bl, dsm5_17_fu'], 2),
+    ('dissociation', ['dsm5_18_bl, dsm5_18_fu'], 2),
+]
+
+
+def clean_mental_health(mental_health):
+    mental_health = _drop_sparse_columns(mental_health.replace(-999, np.nan))
+    for indication, columns, threshold in MENTAL_HEALTH_INDICATIONS:
+        mental_health[indication] = (mental_health[columns] >= threshold).any(axis=1).astype(int)
+        mental_health = mental_health.drop(columns=columns)
+    return mental_health.rename(columns={'broad_psychpath22, dsm5_22_fu': 'smoking'})
+
+
+HEALTH_COLUMNS = ['MEDICAL_HEALTH', 'MENTAL_HEALTH', 'OVERALL_HEALTH']
+
+
+# Health rating 0-100 banded into poor (< 30), fair (30-60) and good (60-100)
+def clean_health_rating(health_rating):
+    health_rating = health_rating.replace(-999, np.nan)
+    for column in HEALTH_COLUMNS:
+        value = health_rating[column]
+        health_rating[column] = _select_labels([value < 30, (value >= 30) & (value < 60), (value >= 60) & (value <= 100)],
+                                               ['poor', 'fair', 'good'], health_rating.index)
+    return health_rating
+
+
+WHODAS_BINS = [0, 0.49, 1.49, 2.49, 3.49, 4.0]
+WHODAS_LABELS = ['none', 'mild', 'moderate', 'severe', 'extreme']
+
+
+# WHODAS 2.0: average of the 12 items, binned; the H1-H3 day counts are not part of the schema
+def clean_whodas(whodas):
+    whodas = whodas.replace(-999, np.nan)
+    whodas['whodas_avg_score'] = whodas.iloc[:, 1:13].sum(axis=1) / 12
+    whodas = whodas.drop(columns=whodas.columns[1:13])
+    whodas = whodas.drop(columns=whodas.columns[1:4])
+    whodas['whodas_avg_score'] = pd.cut(whodas['whodas_avg_score'], bins=WHODAS_BINS, labels=WHODAS_LABELS, right=False)
+    return whodas
+
+
+def clean_participants(participants):
+    return participants
+
+
+DEMOGRAPHIC_COLUMNS = ['participant_id', 'AGE', 'GENDER', 'RACE_1', 'EDUCATION', 'MARITAL_STATUS', 'EMPLOYMENT', 'LANGUAGE', 'OTHER_LANGUAGE']
+AGE_BINS = [0, 20, 40, 60, 80, float('inf')]
+AGE_LABELS = ['< 20', '20-40', '40-60', '60-80', '> 80']
+LANGUAGE_TYPOS = {'englush': 'english', 'enlgish': 'english', 'engliash': 'english', 'englich': 'english'}
+LANGUAGE_SEPARATORS = r'\s+and\s+|,\s*|/\s*'
+NO_OTHER_LANGUAGE = r'\b(?:no|none|na|ga)\b'
+
+
+# Demographics: age bins, race 7 merged into 6, a bilingual flag from LANGUAGE/OTHER_LANGUAGE,
+# and education, marital status and employment generalized to two groups each
+def clean_demographics(demographics):
+    demographics = demographics.replace(-999, np.nan)
+    demographics['AGE'] = pd.cut(demographics['AGE'], bins=AGE_BINS, labels=AGE_LABELS, right=False)
+    demographics['RACE_1'] = demographics['RACE_1'].replace(7, 6)
+
+    language = demographics['LANGUAGE'].str.lower().str.strip().replace(LANGUAGE_TYPOS).replace('-999', np.nan)
+    parts = language.str.split(LANGUAGE_SEPARATORS, n=1, regex=True)
+    first_language = parts.str[0].str.strip().replace('the english as she is spoken', 'english')
+    speaks_only_english = first_language.str.strip().str.lower().eq('english').fillna(False).astype(bool)
+    has_second_language = parts.str.len().gt(1).fillna(False).astype(bool)
+
+    other_language = demographics['OTHER_LANGUAGE'].replace('-999', np.nan).str.lower().str.strip()
+    no_other_language = other_language.isna() | other_language.str.contains(NO_OTHER_LANGUAGE, regex=True).fillna(False).astype(bool)
+
+    demographics['BILINGUAL'] = np.where(speaks_only_english & ~has_second_language & no_other_language, 0, 1)
+    demographics = demographics.drop(columns=['LANGUAGE', 'OTHER_LANGUAGE'])
+
+    education, marital_status, employment = demographics['EDUCATION'], demographics['MARITAL_STATUS'], demographics['EMPLOYMENT']
+    demographics['EDUCATION'] = _select_labels([education.isin([1, 2, 3, 4]), education == 0],
+                                               ['higher education', 'secondary education'], demographics.index)
+    demographics['MARITAL_STATUS'] = _select_labels([marital_status == 2, marital_status.isin([1, 3, 4, 5, 6])],
+                                                    ['in relationship', 'single'], demographics.index)
+    demographics['EMPLOYMENT'] = _select_labels([employment.isin([0, 1]), employment.isin([2, 3, 4])],
+                                                ['working', 'unemployed'], demographics.index)
+    return demographics
+
+
+# (name, file, extra read_csv arguments, stage), in the order they are merged into pre_dataset
+INSTRUMENTS = [
+    ('audit', 'audit.tsv', {}, clean_audit),
+    ('health_history', 'health_history_questions.tsv', {}, clean_health_history),
+    ('mental_health', 'mental_health_questions.tsv', {}, clean_mental_health),
+    ('health_rating', 'health_rating.tsv', {}, clean_health_rating),
+    ('whodas', 'whodas.tsv', {}, clean_whodas),
+    ('demographics', 'demographics.tsv', {'usecols': DEMOGRAPHIC_COLUMNS}, clean_demographics),
+    ('participants', 'participants.tsv', {'usecols': ['participant_id', 'handedness']}, clean_participants),
+]
+
+
+def instrument_paths(directory='.', files=None):
+    files = files or {}
+    return {name: os.path.join(directory, files.get(name, file_name)) for name, file_name, _, _ in INSTRUMENTS}
+
+
+def run_stage(name, path):
+    # Read and clean one instrument; returns the frame indexed by participant_id plus its timings
+    _, _, read_kwargs, stage = next(instrument for instrument in INSTRUMENTS if instrument[0] == name)
+    start = time.perf_counter()
+    raw = read_csv_cached(path, sep='\t', **read_kwargs)
+    read_seconds = time.perf_counter() - start
+    frame = stage(raw).set_index('participant_id')
+    return frame, {'read': read_seconds, 'clean': time.perf_counter() - start - read_seconds}
+
+
+def merge_instruments(frames):
+    pre_dataset = frames[0]
+    for frame in frames[1:]:
+        pre_dataset = pre_dataset.merge(frame, on='participant_id', how='outer')
+    return pre_dataset
+
+
+def join_instruments(frames):
+    # One aligned outer join on the participant_id index instead of a cascade of merges,
+    # each of which copies the growing frame. Sorted like an outer merge would be.
+    if any(not frame.index.is_unique for frame in frames):
+        return merge_instruments([frame.reset_index() for frame in frames])
+    return pd.concat(frames, axis=1, join='outer').sort_index().rename_axis('participant_id').reset_index()
+
+
+def ingest_instruments(paths, workers=None):
+    # Stages run concurrently in a process pool; workers=1 runs them in this process
+    names = [name for name, _, _, _ in INSTRUMENTS]
+    if workers == 1:
+        results = [run_stage(name, paths[name]) for name in names]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_stage, names, [paths[name] for name in names]))
+    return [frame for frame, _ in results], {name: stage_timings for name, (_, stage_timings) in zip(names, results)}
+
+
+def build_pre_dataset(directory='.', files=None, use_cache=True, workers=None, timings=None):
+    # files overrides file names per instrument, e.g. {'participants': 'participants_copy.tsv'};
+    # timings, if given, is filled with per-stage read/clean seconds and the join time
+    paths = instrument_paths(directory, files)
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+
+    def build():
+        frames, stage_timings = ingest_instruments(paths, workers)
+        timings.update(stage_timings)
+        join_start = time.perf_counter()
+        pre_dataset = join_instruments(frames)
+        timings['join'] = time.perf_counter() - join_start
+        return pre_dataset
+
+    if use_cache:
+        pre_dataset = FrameCache.for_file(paths['audit']).cached('pre_dataset', list(paths.values()), PIPELINE_VERSION, build)
+    else:
+        pre_dataset = build()
+    timings['total'] = time.perf_counter() - start
+    return pre_dataset
+
+
+def format_timings(timings):
+    lines = []
+    for name, value in timings.items():
+        if isinstance(value, dict):
+            lines.append(f"{name:<16} read {value['read']:.3f} s  clean {value['clean']:.3f} s")
+        else:
+            lines.append(f"{name:<16} {value:.3f} s")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the merged ds004215 pre_dataset from the phenotype TSVs.")
+    parser.add_argument('directory', nargs='?', default='.', help="Directory holding the instrument TSV files")
+    parser.add_argument('-o', '--output', default='pre_dataset.tsv', help="Where to write the merged dataset")
+    parser.add_argument('--participants', default='participants.tsv', help="Participants file name")
+    parser.add_argument('--no-cache', action='store_true', help="Rebuild without the columnar cache")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+    timings = {}
+    pre_dataset = build_pre_dataset(args.directory, {'participants': args.participants}, use_cache=not args.no_cache,
+                                    workers=args.workers, timings=timings)
+    pre_dataset.to_csv(args.output, sep='\t', index=False)
+    print(format_timings(timings))
+    print(f"Wrote {len(pre_dataset)} rows x {pre_dataset.shape[1]} columns to {args.output}")
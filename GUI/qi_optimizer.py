@@ -0,0 +1,145 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from equivalence import ColumnEncoder, combine_codes
+
+STRATEGIES = ('branch_and_bound', 'beam', 'greedy')
+
+
+class SubsetScorer:
+    # Scores "keep these quasi-identifiers" subsets. Missing values are encoded as a
+    # value of their own so that k can only grow as columns are removed (with rows
+    # dropped on NaN, removing a column can bring back rows and lower k again).
+    def __init__(self, data, columns, encoder=None, cache_size=256, progress=None):
+        self.columns = list(columns)
+        self.encoder = encoder or ColumnEncoder(data, dropna=False)
+        self.n_rows = len(data)
+        self.cache_size = cache_size
+        self._codes = OrderedDict()
+        self._scores = {}
+        self.evaluated = 0
+        self.progress = progress
+
+    def _group_codes(self, kept):
+        # kept is a tuple in column order; it is built from its cached prefix plus one column
+        if not kept:
+            return np.zeros(self.n_rows, dtype=np.int64), 1
+        if kept in self._codes:
+            self._codes.move_to_end(kept)
+            return self._codes[kept]
+        prefix_codes, prefix_card = self._group_codes(kept[:-1])
+        codes, card = self.encoder.encode(kept[-1])
+        result = combine_codes([prefix_codes, codes], [prefix_card, card])
+        self._codes[kept] = result
+        if len(self._codes) > self.cache_size:
+            self._codes.popitem(last=False)
+        return result
+
+    def score(self, removed):
+        # (k, unique rows) once the columns in `removed` are dropped
+        removed = frozenset(removed)
+        if removed not in self._scores:
+            kept = tuple(column for column in self.columns if column not in removed)
+            group_codes, n_groups = self._group_codes(kept)
+            sizes = np.bincount(group_codes, minlength=n_groups)
+            self._scores[removed] = (int(sizes.min()) if n_groups else 0, int((sizes == 1).sum()))
+            self.evaluated += 1
+            if self.progress is not None:
+                self.progress(min(self.evaluated / 2 ** len(self.columns), 1.0))
+        return self._scores[removed]
+
+    def k(self, removed):
+        return self.score(removed)[0]
+
+
+def _rank(scorer, removed):
+    # Higher k first, then fewer unique rows
+    k, unique_rows = scorer.score(removed)
+    return (k, -unique_rows)
+
+
+def greedy_search(scorer, target_k):
+    removed = frozenset()
+    while scorer.k(removed) < target_k:
+        candidates = [removed | {column} for column in scorer.columns if column not in removed]
+        if not candidates:
+            return []
+        removed = max(candidates, key=lambda candidate: _rank(scorer, candidate))
+    return [removed]
+
+
+def beam_search(scorer, target_k, beam_width=4):
+    frontier = [frozenset()]
+    if scorer.k(frontier[0]) >= target_k:
+        return frontier
+    for _ in scorer.columns:
+        candidates = {removed | {column} for removed in frontier for column in scorer.columns if column not in removed}
+        if not candidates:
+            break
+        # Set order follows the string hashes; ordering by column position first makes the
+        # stable sort below break ties the same way in every run
+        candidates = sorted(candidates, key=lambda candidate: [column in candidate for column in scorer.columns], reverse=True)
+        ranked = sorted(candidates, key=lambda candidate: _rank(scorer, candidate), reverse=True)
+        satisfied = [candidate for candidate in ranked if scorer.k(candidate) >= target_k]
+        if satisfied:
+            return satisfied[:1]
+        frontier = ranked[:beam_width]
+    return []
+
+
+def branch_and_bound_search(scorer, target_k):
+    # Every smallest removal set. A branch stops as soon as its removal set reaches k
+    # (its supersets cannot be smaller), and is cut when even removing every column
+    # still open in it fails (monotonicity), or when it cannot beat the best size.
+    columns = scorer.columns
+    greedy = greedy_search(scorer, target_k)
+    if not greedy:
+        return []
+    best_size = len(greedy[0])
+    solutions = []
+
+    def visit(removed, start):
+        nonlocal best_size, solutions
+        if scorer.k(removed) >= target_k:
+            if len(removed) < best_size:
+                best_size, solutions = len(removed), []
+            solutions.append(removed)
+            return
+        if len(removed) + 1 > best_size or start >= len(columns):
+            return
+        if scorer.k(removed | set(columns[start:])) < target_k:
+            return
+        for index in range(start, len(columns)):
+            visit(removed | {columns[index]}, index + 1)
+
+    visit(frozenset(), 0)
+    return solutions
+
+
+def optimize_subsets(data, columns, target_k=5, strategy='branch_and_bound', beam_width=4, encoder=None, progress=None):
+    # Smallest set(s) of quasi-identifiers to drop so that the rest reaches target_k
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    scorer = SubsetScorer(data, columns, encoder=encoder, progress=progress)
+    start = time.perf_counter()
+    if strategy == 'greedy':
+        solutions = greedy_search(scorer, target_k)
+    elif strategy == 'beam':
+        solutions = beam_search(scorer, target_k, beam_width)
+    else:
+        solutions = branch_and_bound_search(scorer, target_k)
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for removed in solutions:
+        k, unique_rows = scorer.score(removed)
+        results.append({
+            'strategy': strategy,
+            'removed': [column for column in columns if column in removed],
+            'kept': [column for column in columns if column not in removed],
+            'k_anonymity': k,
+            'unique_rows': unique_rows,
+        })
+    return results, {'evaluated': scorer.evaluated, 'seconds': elapsed}
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from equivalence import EquivalenceClasses
+
+# Population rows encoded at a time when counting population class sizes
+POPULATION_CHUNK = 1_000_000
+# Usual threshold for an acceptable per-record risk (a class of at least 5)
+DEFAULT_THRESHOLD = 0.2
+
+
+def population_class_sizes(sample, population, columns, chunksize=POPULATION_CHUNK):
+    # Size of every sample class in the population frame. Population rows are matched to
+    # sample classes through hash lookups on the sample's own codes, a chunk at a time, so
+    # memory stays at O(sample + chunk) however large the population is.
+    classes = EquivalenceClasses.from_frame(sample, columns, dropna=False)
+    uniques = [pd.Index(pd.unique(sample[column]), dtype=object) for column in columns]
+    sample_codes = [index.get_indexer(pd.Series(sample[column], dtype=object)) for index, column in zip(uniques, columns)]
+    pair_indexes = []
+    key = np.zeros(len(sample), dtype=np.int64)
+    for codes, index in zip(sample_codes, uniques):
+        pair_index = pd.Index(pd.unique(key * len(index) + codes))
+        pair_indexes.append(pair_index)
+        key = pair_index.get_indexer(key * len(index) + codes)
+    # Prefix keys of the full tuple line up with the sample's class codes
+    class_of_key = np.empty(len(pair_indexes[-1]) if pair_indexes else 1, dtype=np.int64)
+    class_of_key[key] = classes.group_codes
+
+    sizes = np.zeros(classes.n_groups, dtype=np.int64)
+    for start in range(0, len(population), chunksize):
+        chunk = population.iloc[start:start + chunksize]
+        key = np.zeros(len(chunk), dtype=np.int64)
+        for column, index, pair_index in zip(columns, uniques, pair_indexes):
+            codes = index.get_indexer(pd.Series(chunk[column], dtype=object))
+            key = np.where((key >= 0) & (codes >= 0), pair_index.get_indexer(key * len(index) + codes), -1)
+        matched = class_of_key[key[key >= 0]]
+        sizes += np.bincount(matched, minlength=classes.n_groups)
+    return classes, sizes
+
+
+class RiskProfile:
+    # Per-record re-identification risk for one set of quasi-identifiers. Prosecutor risk
+    # is 1 / sample class size; journalist risk is 1 / population class size. Marketer risk
+    # per record is the same 1 / population class size (the chance a bulk linkage matches that
+    # record correctly); it differs from journalist risk only in being reported as an average.
+    def __init__(self, classes, population_sizes=None):
+        self.classes = classes
+        sample_sizes = classes.sizes
+        population_sizes = sample_sizes if population_sizes is None else np.maximum(population_sizes, sample_sizes)
+        codes = classes.group_codes
+        self.prosecutor = (1.0 / np.maximum(sample_sizes, 1)).astype(np.float32)[codes]
+        self.journalist = (1.0 / np.maximum(population_sizes, 1)).astype(np.float32)[codes]
+        self.marketer = self.journalist
+
+    @classmethod
+    def from_frame(cls, data, columns, population=None, sampling_fraction=None):
+        # population: DataFrame holding the same columns; sampling_fraction: share of the
+        # population in `data`, used to estimate class sizes as sample size / fraction
+        if population is not None:
+            return cls(*population_class_sizes(data, population, columns))
+        classes = EquivalenceClasses.from_frame(data, columns, dropna=False)
+        if sampling_fraction:
+            return cls(classes, np.ceil(classes.sizes / sampling_fraction).astype(np.int64))
+        return cls(classes)
+
+    def share_above(self, risks, threshold=DEFAULT_THRESHOLD):
+        return float((risks > threshold).mean()) if len(risks) else 0.0
+
+    def summary(self, threshold=DEFAULT_THRESHOLD):
+        summary = {'records': len(self.prosecutor), 'threshold': threshold}
+        for name in ('prosecutor', 'journalist'):
+            risks = getattr(self, name)
+            summary[name] = {
+                'max': float(risks.max()) if len(risks) else 0.0,
+                'mean': float(risks.mean(dtype=np.float64)) if len(risks) else 0.0,
+                'share_above_threshold': self.share_above(risks, threshold),
+            }
+        summary['marketer'] = {'mean': summary['journalist']['mean']}
+        return summary
+
+
+def record_risks(data, columns, population=None, sampling_fraction=None, threshold=DEFAULT_THRESHOLD):
+    # (per-record risk arrays, summary) for the GUI and notebook
+    profile = RiskProfile.from_frame(data, columns, population, sampling_fraction)
+    risks = {'prosecutor': profile.prosecutor, 'journalist': profile.journalist, 'marketer': profile.marketer}
+    return risks, profile.summary(threshold)
@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from loader import CHUNK_SIZE, NA_SENTINELS
+
+# 2^14 registers (16 KB): relative standard error 1.04 / sqrt(2^14), about 0.8%
+HLL_PRECISION = 14
+# Classes kept by the distinct sample; shares estimated from it have a standard error of at most 0.5 / sqrt(size)
+SAMPLE_SIZE = 1 << 16
+# Class size below which a record counts as at risk (the 0.2 risk threshold of risk.py)
+DEFAULT_K = 5
+# Two-sided 95% intervals
+Z = 1.96
+HASH_PRIME = np.uint64(0x100000001B3)
+
+
+def _mix(hashes):
+    # splitmix64 finalizer, so every bit of the combined row hash is well mixed for the sketches
+    hashes = hashes ^ (hashes >> np.uint64(30))
+    hashes = hashes * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = hashes ^ (hashes >> np.uint64(27))
+    hashes = hashes * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def column_hashes(values):
+    # 64-bit hash of every value; categorical columns hash their categories only
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+
+
+def row_hashes(hashes_by_column):
+    combined = np.zeros(len(hashes_by_column[0]), dtype=np.uint64)
+    for hashes in hashes_by_column:
+        combined = _mix(combined * HASH_PRIME + hashes)
+    return combined
+
+
+class HyperLogLog:
+    # Distinct count of a stream of 64-bit hashes in 2^precision one-byte registers
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        # Rank of the first set bit in the remaining bits; they fit a float64 exactly
+        rest = (hashes & np.uint64((1 << width) - 1)).astype(np.float64)
+        rank = (width + 1 - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self):
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small counts
+            return m * np.log(m / zeros)
+        return float(raw)
+
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+
+class DistinctSample:
+    # Bottom-k sample of classes: the `size` classes with the smallest row hashes, each with
+    # its exact size. A class enters the sample on its first row or never, so the sample is
+    # a uniform random sample of the classes whatever their sizes.
+    def __init__(self, size=SAMPLE_SIZE):
+        self.size = size
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def full(self):
+        return len(self.hashes) >= self.size
+
+    def update(self, hashes):
+        if self.full():
+            hashes = hashes[hashes <= self.hashes[-1]]
+        merged, inverse = np.unique(np.concatenate([self.hashes, hashes]), return_inverse=True)
+        weights = np.concatenate([self.counts, np.ones(len(hashes), dtype=np.int64)])
+        counts = np.bincount(inverse, weights=weights).astype(np.int64)
+        self.hashes, self.counts = merged[:self.size], counts[:self.size]
+
+
+def _interval(estimate, standard_error):
+    return {'estimate': float(estimate), 'low': float(max(estimate - Z * standard_error, 0.0)),
+            'high': float(estimate + Z * standard_error)}
+
+
+class StreamingSummary:
+    # Approximate k-anonymity metrics of a stream of chunks in bounded memory: HyperLogLog
+    # for the number of classes and of distinct values per column, a distinct sample of
+    # classes for the class-size tail. Rows with a missing quasi-identifier are skipped, as
+    # in privacy_summary. While the sample holds every class the results are exact.
+    def __init__(self, columns, k=DEFAULT_K, precision=HLL_PRECISION, sample_size=SAMPLE_SIZE):
+        self.columns = list(columns)
+        self.k = k
+        self.rows = 0
+        self.classes = HyperLogLog(precision)
+        self.column_sketches = {column: HyperLogLog(precision) for column in self.columns}
+        self.sample = DistinctSample(sample_size)
+
+    def update(self, chunk):
+        complete = chunk[self.columns].notna().all(axis=1).to_numpy()
+        hashes_by_column = []
+        for column in self.columns:
+            hashes = column_hashes(chunk[column])
+            self.column_sketches[column].update(hashes[chunk[column].notna().to_numpy()])
+            hashes_by_column.append(hashes[complete])
+        if not complete.any():
+            return
+        hashes = row_hashes(hashes_by_column)
+        self.rows += len(hashes)
+        self.classes.update(hashes)
+        self.sample.update(hashes)
+
+    def summary(self):
+        sizes = self.sample.counts
+        exact = not self.sample.full()
+        n_sampled = len(sizes)
+        if exact:
+            classes = _interval(n_sampled, 0.0)
+        else:
+            estimate = self.classes.estimate()
+            classes = _interval(estimate, estimate * self.classes.relative_error())
+        summary = {
+            'rows': self.rows,
+            'exact': exact,
+            'k': self.k,
+            'classes': classes,
+            'unique_rows': self._class_count(sizes == 1, classes),
+            'classes_below_k': self._class_count(sizes < self.k, classes),
+            'records_below_k': self._records_below_k(sizes, classes),
+            # The smallest sampled class bounds k-anonymity from above; equal to it when exact
+            'k_anonymity_at_most': int(sizes.min()) if n_sampled else None,
+            'column_distinct': {column: round(sketch.estimate()) for column, sketch in self.column_sketches.items()},
+        }
+        # True when a sampled class is smaller than k; None when none was sampled but some
+        # may exist (classes_below_k bounds how many)
+        if n_sampled and sizes.min() < self.k:
+            summary['k_below_threshold'] = True
+        else:
+            summary['k_below_threshold'] = False if exact else None
+        return summary
+
+    def _class_count(self, selected, classes):
+        # Classes with a property: its share in the sample times the number of classes
+        n_sampled = len(selected)
+        if not n_sampled:
+            return _interval(0.0, 0.0)
+        share = selected.mean()
+        if not self.sample.full():
+            return _interval(selected.sum(), 0.0)
+        estimate = share * classes['estimate']
+        if share == 0:
+            # None sampled: the rule of three bounds the share by 3 / sample size
+            return {'estimate': 0.0, 'low': 0.0, 'high': float(3.0 / n_sampled * classes['high'])}
+        share_error = np.sqrt(share * (1 - share) / n_sampled * max(1 - n_sampled / classes['estimate'], 0.0))
+        relative = np.sqrt((share_error / share) ** 2 + self.classes.relative_error() ** 2)
+        return _interval(estimate, estimate * relative)
+
+    def _records_below_k(self, sizes, classes):
+        # Ratio estimator over the sampled classes: records in small classes / records
+        if not len(sizes):
+            return _interval(0.0, 0.0)
+        small = np.where(sizes < self.k, sizes, 0)
+        if not self.sample.full():
+            return _interval(small.sum(), 0.0)
+        ratio = small.sum() / sizes.sum()
+        n_sampled = len(sizes)
+        if ratio == 0:
+            bound = 3.0 / n_sampled * classes['high'] * (self.k - 1)
+            return {'estimate': 0.0, 'low': 0.0, 'high': float(min(bound, self.rows))}
+        residual = small - ratio * sizes
+        variance = (residual ** 2).sum() / (n_sampled - 1) / (n_sampled * sizes.mean() ** 2)
+        variance *= max(1 - n_sampled / classes['estimate'], 0.0)
+        return _interval(ratio * self.rows, np.sqrt(variance) * self.rows)
+
+
+def sketch_frame(data, columns, k=DEFAULT_K, chunksize=CHUNK_SIZE, progress=None):
+    # Approximate summary of an in-memory frame, a slice at a time
+    summary = StreamingSummary(columns, k)
+    for start in range(0, len(data), chunksize):
+        summary.update(data.iloc[start:start + chunksize])
+        if progress is not None:
+            progress(min((start + chunksize) / len(data), 1.0))
+    return summary.summary()
+
+
+def sketch_file(file_path, columns, k=DEFAULT_K, chunksize=CHUNK_SIZE, progress=None):
+    # Approximate summary of a CSV/TSV streamed from disk: only the quasi-identifier columns
+    # are parsed, as text so a value hashes the same in every chunk, and memory stays at
+    # one chunk plus the sketches however large the file is
+    sep = '\t' if file_path.lower().endswith('.tsv') else ','
+    wanted = set(columns)
+    total_bytes = os.path.getsize(file_path)
+    summary = StreamingSummary(columns, k)
+    with open(file_path, 'rb') as handle:
+        reader = pd.read_csv(handle, sep=sep, chunksize=chunksize, na_values=NA_SENTINELS, dtype=str,
+                             usecols=lambda name: name.strip() in wanted)
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.strip()
+            summary.update(chunk)
+            if progress is not None and total_bytes:
+                progress(min(handle.tell() / total_bytes, 1.0))
+    return summary.summary()
+
+
+def format_estimate(interval, digits=0):
+    if interval['low'] == interval['high']:
+        return f"{interval['estimate']:.{digits}f}"
+    return f"{interval['estimate']:.{digits}f} (95% {interval['low']:.{digits}f}-{interval['high']:.{digits}f})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Approximate uniqueness and k of a large CSV/TSV in bounded memory.")
+    parser.add_argument('table', help="CSV/TSV file, streamed in chunks")
+    parser.add_argument('--qi', required=True, help="Comma-separated quasi-identifier columns")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help="Class size below which records are at risk")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--exact', action='store_true', help="Load the file and compute the exact metrics instead")
+    args = parser.parse_args()
+
+    quasi_identifiers = [column.strip() for column in args.qi.split(',') if column.strip()]
+    if args.exact:
+        from equivalence import privacy_summary
+        from loader import read_table
+        data, _, _ = read_table(args.table)
+        summary = privacy_summary(data, quasi_identifiers)
+        summary['class_size_histogram'] = {int(size): int(count) for size, count in summary['class_size_histogram'].items()}
+        json.dump(summary, sys.stdout, indent=2)
+    else:
+        json.dump(sketch_file(args.table, quasi_identifiers, args.k, args.chunksize), sys.stdout, indent=2)
+    print()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class DataFrameModel(QAbstractTableModel):
+    # Read-only view of a DataFrame. Cells are read lazily from the column arrays
+    # when the view asks for them, so only the visible rows are ever formatted.
+    def __init__(self, data=None, parent=None):
+        super().__init__(parent)
+        self._frame = pd.DataFrame()
+        self._headers = []
+        self._arrays = []
+        self._order = None
+        self._sort = None
+        if data is not None:
+            self.set_frame(data)
+
+    def set_frame(self, data, extra_columns=None):
+        # extra_columns: {header: array} shown after the frame's columns, e.g. per-record risk
+        self.beginResetModel()
+        self._frame = data
+        extra_columns = {name: values for name, values in (extra_columns or {}).items() if len(values) == len(data)}
+        self._headers = [str(column) for column in data.columns] + list(extra_columns)
+        # numpy-backed columns are zero-copy views; extension arrays are indexed in place
+        self._arrays = [self._column_array(data.iloc[:, position]) for position in range(data.shape[1])]
+        self._arrays += list(extra_columns.values())
+        self._order = self._sorted_order(*self._sort) if self._sort is not None else None
+        self.endResetModel()
+
+    @staticmethod
+    def _column_array(series):
+        if isinstance(series.dtype, np.dtype):
+            return series.to_numpy(copy=False)
+        return series.array
+
+    def frame(self):
+        return self._frame
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._frame)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._arrays)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row = index.row() if self._order is None else self._order[index.row()]
+        return str(self._arrays[index.column()][row])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._headers[section]
+        row = section if self._order is None else self._order[section]
+        return str(self._frame.index[row])
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order)
+        self._order = self._sorted_order(column, order)
+        self.layoutChanged.emit()
+
+    def _sorted_order(self, column, order):
+        if column < 0 or column >= len(self._arrays):
+            return None
+        values = pd.Series(self._arrays[column])
+        ascending = order == Qt.AscendingOrder
+        try:
+            ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last')
+        except TypeError:
+            # Mixed types inside an object column: fall back to their text
+            ordered = values.astype(str).sort_values(ascending=ascending, kind='stable')
+        return ordered.index.to_numpy()
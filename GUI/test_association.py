@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import association
+from association import cached_associations, compute_associations, leakage
+
+
+def _frame(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    sex = rng.choice(['f', 'm'], rows)
+    data = pd.DataFrame({
+        'sex': sex,
+        # Depends on sex, so the pair has a clear association
+        'job': np.where(rng.random(rows) < 0.7, np.where(sex == 'f', 'nurse', 'pilot'), rng.choice(['nurse', 'pilot', 'clerk'], rows)),
+        'city': rng.choice(['a', 'b', 'c', 'd'], rows),
+        'grade': rng.integers(1, 6, rows),
+        'income': rng.normal(50_000, 10_000, rows) + (sex == 'm') * 5000,
+        'name': [f'person {i}' for i in range(rows)],
+    })
+    data.loc[rng.random(rows) < 0.05, 'city'] = np.nan
+    return data
+
+
+def _cramers_v(x, y):
+    table = pd.crosstab(x, y).to_numpy(dtype=np.float64)
+    n = table.sum()
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    return np.sqrt(chi2 / n / (min(table.shape) - 1))
+
+
+def _mutual_information(x, y):
+    joint = pd.crosstab(x, y, normalize=True).to_numpy()
+    outer = np.outer(joint.sum(axis=1), joint.sum(axis=0))
+    filled = joint > 0
+    return (joint[filled] * np.log2(joint[filled] / outer[filled])).sum()
+
+
+def test_contingency_measures_match_crosstab():
+    data = _frame()
+    result = compute_associations(data, workers=1)
+    assert result['skipped'] == ['name']
+    assert result['kinds']['income'] == 'continuous'
+    categorical = ['sex', 'job', 'city', 'grade']
+    for x in categorical:
+        for y in categorical:
+            if x != y:
+                assert result['cramers_v'].loc[x, y] == pytest.approx(_cramers_v(data[x], data[y]))
+                assert result['mutual_information'].loc[x, y] == pytest.approx(_mutual_information(data[x], data[y]))
+        shares = data[x].value_counts(normalize=True)
+        assert result['mutual_information'].loc[x, x] == pytest.approx(-(shares * np.log2(shares)).sum())
+    assert result['cramers_v'].loc['sex', 'job'] > 0.5 > result['cramers_v'].loc['sex', 'city']
+
+
+def test_correlation_ratio_matches_groupby():
+    data = _frame()
+    result = compute_associations(data, workers=1)
+    for column in ['sex', 'job', 'city']:
+        complete = data[[column, 'income']].dropna()
+        means = complete.groupby(column)['income'].transform('mean')
+        between = ((means - complete['income'].mean()) ** 2).sum()
+        total = ((complete['income'] - complete['income'].mean()) ** 2).sum()
+        assert result['correlation_ratio'].loc[column, 'income'] == pytest.approx(np.sqrt(between / total))
+    assert leakage(result, 'income').index[0] == 'sex'
+
+
+def test_batches_and_workers_give_the_same_matrices(monkeypatch):
+    data = _frame()
+    serial = compute_associations(data, workers=1)
+    # One or two columns per bincount
+    monkeypatch.setattr(association, 'BATCH_KEYS', 2 * len(data))
+    monkeypatch.setattr(association, 'BATCH_CELLS', 8)
+    batched = compute_associations(data, workers=1)
+    for measure in association.MEASURES:
+        pd.testing.assert_frame_equal(batched[measure], serial[measure])
+    monkeypatch.undo()
+    monkeypatch.setattr(association, 'PARALLEL_MIN_WORK', 0)
+    monkeypatch.setattr(association.os, 'cpu_count', lambda: 2)
+    pooled = compute_associations(data, workers=2)
+    for measure in association.MEASURES:
+        pd.testing.assert_frame_equal(pooled[measure], serial[measure])
+
+
+def test_results_are_cached_per_version_and_columns(monkeypatch):
+    monkeypatch.setattr(association, '_cache', association.OrderedDict())
+    data = _frame(300)
+    first = cached_associations(data, ['sex', 'job'], version=1)
+    assert cached_associations(data, ['sex', 'job'], version=1) is first
+    assert cached_associations(data, ['sex', 'city'], version=1) is not first
+    assert cached_associations(data, ['sex', 'job'], version=2) is not first
+    # Without a version the contents are fingerprinted
+    assert cached_associations(data, ['sex', 'job']) is cached_associations(data.copy(), ['sex', 'job'])
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backends import ArrowDataset, get_backend
+from equivalence import privacy_summary, rank_column_removals
+from loader import NA_SENTINELS, read_table
+
+pytest.importorskip('pyarrow')
+
+CHUNK = 100
+COLUMNS = ['a', 'b', 'c']
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('PRIVACY_CACHE_DIR', str(tmp_path / 'cache'))
+
+
+def _write(tmp_path, rows=3 * CHUNK, seed=0):
+    # Column a is read as integers in the first chunk, as text in the second (it holds 'x')
+    # and as floats in the third (it has blanks), with the same values 0-5 in each
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 6, rows).astype(object)
+    a[CHUNK:2 * CHUNK][rng.random(CHUNK) < 0.1] = 'x'
+    a[2 * CHUNK:][rng.random(rows - 2 * CHUNK) < 0.1] = ''
+    data = pd.DataFrame({
+        'a': a,
+        'b': rng.integers(0, 4, rows),
+        'c': rng.choice(['p', 'q', 'r'], rows),
+        's': rng.choice(['u', 'v', 'w'], rows),
+    })
+    path = tmp_path / 'mixed.csv'
+    data.to_csv(path, index=False)
+    return str(path)
+
+
+def _as_text(path):
+    # The plain pandas baseline: every value as its text, so 1 and '1' are one value
+    return pd.read_csv(path, dtype=str, na_values=NA_SENTINELS)
+
+
+def test_unique_counts_agree_across_chunks(tmp_path):
+    path = _write(tmp_path)
+    expected = _as_text(path).nunique().to_dict()
+    _, pandas_counts, _ = read_table(path, chunksize=CHUNK)
+    dataset, arrow_counts, _ = ArrowDataset.convert(path, chunksize=CHUNK, memory_limit_mb=0.01)
+    assert pandas_counts == arrow_counts == expected
+    assert expected['a'] == 7
+    # Read back from the cache
+    assert ArrowDataset.convert(path, chunksize=CHUNK)[1] == expected
+
+
+def test_backends_match_groupby(tmp_path):
+    path = _write(tmp_path)
+    data, _, _ = read_table(path, chunksize=CHUNK)
+    dataset, _, _ = ArrowDataset.convert(path, chunksize=CHUNK, memory_limit_mb=0.01)
+    assert dataset.n_partitions(COLUMNS + ['s']) > 1
+
+    sizes = _as_text(path).groupby(COLUMNS).size()
+    in_memory = privacy_summary(data, COLUMNS, 's')
+    out_of_core = get_backend('arrow').privacy_summary(dataset, COLUMNS, 's')
+    for summary in [in_memory, out_of_core]:
+        assert summary['unique_rows'] == int((sizes == 1).sum())
+        assert summary['k_anonymity'] == int(sizes.min())
+        pd.testing.assert_series_equal(summary['class_size_histogram'], sizes.value_counts().sort_index(),
+                                       check_names=False, check_index_type=False)
+    assert out_of_core['l_diversity'] == in_memory['l_diversity']
+    assert out_of_core['disclosure']['s'] == pytest.approx(in_memory['disclosure']['s'])
+
+
+def test_column_removals_match(tmp_path):
+    path = _write(tmp_path)
+    data, _, _ = read_table(path, chunksize=CHUNK)
+    dataset, _, _ = ArrowDataset.convert(path, chunksize=CHUNK, memory_limit_mb=0.01)
+    assert sorted(dataset.rank_column_removals(COLUMNS)) == sorted(rank_column_removals(data, COLUMNS))
@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import disclosure
+from disclosure import ContingencyTable
+
+# Three classes over x, y, z (or 1, 2, 3), plus a row without a class and one without a value:
+#   A: x x y      B: x y z z      C: y z z
+# Overall x 0.3, y 0.3, z 0.4
+GROUPS = np.array([0, 0, 0, 1, 1, 1, 1, 2, 2, 2, -1, 2])
+NOMINAL = pd.Series(['x', 'x', 'y', 'x', 'y', 'z', 'z', 'y', 'z', 'z', 'x', None])
+ORDINAL = pd.Series([1, 1, 2, 1, 2, 3, 3, 2, 3, 3, 1, np.nan])
+
+
+def _table(values=NOMINAL):
+    return ContingencyTable.from_values(GROUPS, 3, values)
+
+
+def test_metrics_of_a_hand_computed_table():
+    table = _table()
+    assert not table.ordinal
+    assert table.distinct_l() == 2
+    # Lowest entropy is that of a 2/3, 1/3 class (A and C)
+    assert table.entropy_l() == pytest.approx(math.exp(-(2 / 3 * math.log(2 / 3) + 1 / 3 * math.log(1 / 3))))
+    # r1 / (r2 + ...): A 2/1, B 2/2, C 2/1
+    assert table.recursive_c(2) == pytest.approx(2.0)
+    # Half the L1 distance of A: (|2/3 - 0.3| + |1/3 - 0.3| + |0 - 0.4|) / 2
+    assert table.t_closeness() == pytest.approx(0.4)
+    # Largest |log(p / q)|: x in A
+    assert table.delta_disclosure() == pytest.approx(math.log((2 / 3) / 0.3))
+
+
+def test_ordinal_emd_of_a_hand_computed_table():
+    table = _table(ORDINAL)
+    assert table.ordinal
+    # A: cumulative differences 0.3667 and 0.4 over 2 steps
+    assert table.t_closeness() == pytest.approx((11 / 30 + 0.4) / 2)
+
+
+def test_recursive_c_is_infinite_for_a_class_with_one_value():
+    table = ContingencyTable.from_values(np.array([0, 0, 1, 1]), 2, pd.Series(['x', 'y', 'z', 'z']))
+    assert table.distinct_l() == 1
+    assert table.recursive_c(2) == math.inf
+
+
+def test_sparse_cells_give_the_same_table(monkeypatch):
+    dense = _table().summary()
+    monkeypatch.setattr(disclosure, 'DENSE_CELL_LIMIT', 0)
+    assert _table().summary() == pytest.approx(dense)
+
+
+def test_regroup_matches_a_table_built_from_merged_classes():
+    # A and C merged
+    merged = ContingencyTable.from_values(np.where(GROUPS == 2, 0, GROUPS), 2, NOMINAL)
+    regrouped = _table().regroup(np.array([0, 1, 0]), 2)
+    assert regrouped.summary() == pytest.approx(merged.summary())
+
+
+def test_metrics_match_groupby():
+    rng = np.random.default_rng(0)
+    groups = rng.integers(0, 40, 2000)
+    values = pd.Series(rng.choice(list('abcdef'), 2000, p=[0.3, 0.25, 0.2, 0.15, 0.05, 0.05]))
+    table = ContingencyTable.from_values(groups, 40, values)
+    shares = pd.crosstab(groups, values, normalize='index')
+    overall = values.value_counts(normalize=True)[shares.columns]
+    assert table.distinct_l() == int((shares > 0).sum(axis=1).min())
+    assert table.t_closeness() == pytest.approx(float(((shares - overall).abs().sum(axis=1) / 2).max()))
+    entropy = -(shares * np.log(shares.where(shares > 0, 1))).sum(axis=1)
+    assert table.entropy_l() == pytest.approx(float(np.exp(entropy.min())))
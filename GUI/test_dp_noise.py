@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dp_noise import BudgetExceeded, PrivacyAccountant, add_noise, noise_scale
+from transform_journal import Operation
+
+
+def _frame(rows=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'age': rng.integers(18, 90, rows), 'income': rng.normal(50_000, 10_000, rows)})
+
+
+def test_a_release_replays_to_the_same_values():
+    data = _frame()
+    noisy, releases = add_noise(data, ['age', 'income'], 'laplace', epsilon=0.5, seed=42)
+    for release in releases:
+        column = release['column']
+        # Alone, on the release's bounds and seed, as the journal replays it
+        replayed = Operation('noise', [column], {'releases': {column: release}}).apply(column, data[column])
+        np.testing.assert_array_equal(replayed.to_numpy(), noisy[column])
+    again, _ = add_noise(data, ['age', 'income'], 'laplace', epsilon=0.5, seed=42)
+    np.testing.assert_array_equal(again['age'], noisy['age'])
+    other, _ = add_noise(data, ['age'], 'laplace', epsilon=0.5, seed=43)
+    assert not np.array_equal(other['age'], noisy['age'])
+
+
+@pytest.mark.parametrize('mechanism, delta, spread', [
+    ('laplace', None, lambda scale: np.sqrt(2) * scale),
+    ('gaussian', 1e-5, lambda scale: scale),
+])
+def test_noise_has_the_calibrated_spread(mechanism, delta, spread):
+    data = _frame()
+    noisy, [release] = add_noise(data, ['age'], mechanism, epsilon=2.0, delta=delta, seed=0)
+    lower, upper = release['bounds']
+    assert (lower, upper) == (data['age'].min(), data['age'].max())
+    scale = noise_scale(mechanism, 2.0, upper - lower, delta)
+    assert np.std(noisy['age'] - data['age']) == pytest.approx(spread(scale), rel=0.05)
+
+
+def test_geometric_noise_keeps_integers_and_clips_to_the_bounds():
+    data = _frame()
+    noisy, [release] = add_noise(data, ['age'], 'geometric', epsilon=1.0, bounds={'age': (30, 60)}, seed=0)
+    assert release['bounds'] == (30.0, 60.0)
+    assert np.array_equal(noisy['age'], np.round(noisy['age']))
+    noise = noisy['age'] - data['age'].clip(30, 60).to_numpy()
+    # The difference of two geometric draws with success probability p is 0 with probability p / (2 - p)
+    p = noise_scale('geometric', 1.0, 30)
+    assert (noise == 0).mean() == pytest.approx(p / (2 - p), rel=0.1)
+    assert noise.mean() == pytest.approx(0, abs=1.0)
+
+
+def test_invalid_parameters_are_rejected():
+    data = _frame(10)
+    with pytest.raises(ValueError):
+        add_noise(data, ['age'], 'laplace', epsilon=0)
+    with pytest.raises(ValueError):
+        add_noise(data, ['age'], 'gaussian', epsilon=1.0)
+
+
+def test_accountant_adds_up_releases_and_enforces_the_budget():
+    data = _frame(100)
+    accountant = PrivacyAccountant(epsilon_budget=1.0, delta_budget=1e-4)
+    _, releases = add_noise(data, ['age', 'income'], 'gaussian', epsilon=0.25, delta=1e-5, seed=0)
+    accountant.charge(releases)
+    assert accountant.spent() == pytest.approx((0.5, 2e-5))
+    assert accountant.remaining() == pytest.approx((0.5, 8e-5))
+    with pytest.raises(BudgetExceeded):
+        accountant.charge(releases + releases)
+    assert accountant.spent() == pytest.approx((0.5, 2e-5))
+
+
+def test_reservations_count_against_runs_in_flight():
+    accountant = PrivacyAccountant(epsilon_budget=1.5)
+    first = accountant.reserve(['age'], 'laplace', 1.0)
+    # A second run submitted before the first ends sees the reserved budget
+    with pytest.raises(BudgetExceeded):
+        accountant.reserve(['age'], 'laplace', 1.0)
+    _, releases = add_noise(_frame(100), ['age'], 'laplace', epsilon=1.0, seed=0)
+    accountant.settle(first, releases)
+    assert accountant.releases == releases
+    second = accountant.reserve(['income'], 'laplace', 0.5)
+    accountant.refund(second)
+    assert accountant.spent() == (1.0, 0)
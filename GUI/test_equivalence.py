@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from equivalence import EquivalenceClasses, combine_codes, factorize_column, privacy_summary, rank_column_removals
+
+
+def _frame(rows=500, seed=0):
+    # Integer, text, categorical and float quasi-identifiers, each with some missing values
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'age': rng.integers(18, 30, rows).astype(float),
+        'gender': rng.choice(['f', 'm', 'x'], rows),
+        'race': pd.Categorical(rng.choice(['a', 'b', 'c', 'd'], rows)),
+        'score': rng.choice([0.5, 1.5, 2.5], rows),
+        'sensitive': rng.choice(['low', 'mid', 'high'], rows),
+    })
+    for column in ('age', 'gender', 'race', 'score'):
+        data.loc[rng.random(rows) < 0.05, column] = np.nan
+    return data
+
+
+def _sizes(data, columns, dropna=True):
+    return data.groupby(columns, dropna=dropna, observed=True).size()
+
+
+@pytest.mark.parametrize('dropna', [True, False])
+def test_classes_match_groupby(dropna):
+    data = _frame()
+    columns = ['age', 'gender', 'race', 'score']
+    classes = EquivalenceClasses.from_frame(data, columns, dropna=dropna)
+    sizes = _sizes(data, columns, dropna)
+    assert classes.n_groups == len(sizes)
+    assert classes.unique_rows() == int((sizes == 1).sum())
+    assert classes.k_anonymity() == int(sizes.min())
+    expected = sizes.value_counts().sort_index()
+    assert classes.class_size_histogram().to_dict() == expected.to_dict()
+    # Same partition of the rows as groupby; rows groupby drops get -1
+    ngroup = data.groupby(columns, dropna=dropna, observed=True).ngroup().fillna(-1).to_numpy()
+    assert np.array_equal(classes.group_codes < 0, ngroup < 0)
+    kept = ngroup >= 0
+    pairs = pd.DataFrame({'ours': classes.group_codes[kept], 'groupby': ngroup[kept]}).drop_duplicates()
+    assert pairs['ours'].is_unique and pairs['groupby'].is_unique
+
+
+def test_wide_keys_are_densified_before_they_overflow():
+    # Six columns of 2000 values: the mixed-radix key would pass 2**62 without re-densifying
+    rng = np.random.default_rng(1)
+    data = pd.DataFrame({f'c{i}': rng.integers(0, 2000, 3000) for i in range(6)})
+    data.iloc[:10] = data.iloc[10:20].to_numpy()  # Some classes of two
+    classes = EquivalenceClasses.from_frame(data, list(data.columns))
+    sizes = _sizes(data, list(data.columns))
+    assert classes.n_groups == len(sizes)
+    assert classes.unique_rows() == int((sizes == 1).sum())
+
+
+def test_combine_codes_marks_rows_with_a_missing_code():
+    codes, n_groups = combine_codes([np.array([0, 1, -1, 1]), np.array([2, 2, 0, -1])], [2, 3])
+    assert n_groups == 2
+    assert codes[2] == -1 and codes[3] == -1 and codes[0] != codes[1]
+
+
+def test_l_diversity_and_summary_match_groupby():
+    data = _frame()
+    columns = ['age', 'gender']
+    complete = data.dropna(subset=columns)
+    distinct = complete.groupby(columns, observed=True)['sensitive'].nunique()
+    classes = EquivalenceClasses.from_frame(data, columns)
+    assert classes.l_diversity(data['sensitive']) == int(distinct.min())
+    summary = privacy_summary(data, columns, 'sensitive')
+    sizes = _sizes(data, columns)
+    assert summary['unique_rows'] == int((sizes == 1).sum())
+    assert summary['k_anonymity'] == int(sizes.min())
+    assert summary['l_diversity'] == int(distinct.min())
+
+
+def test_factorize_keeps_missing_values_as_a_value_when_asked():
+    values = pd.Series(['a', None, 'b', None])
+    assert factorize_column(values)[1] == 2
+    codes, cardinality = factorize_column(values, dropna=False)
+    assert cardinality == 3 and codes[1] == codes[3] >= 0
+
+
+def test_column_removals_match_groupby_without_each_column():
+    data = _frame()
+    columns = ['age', 'gender', 'race', 'score']
+    all_unique = int((_sizes(data, columns) == 1).sum())
+    expected = {}
+    for column in columns:
+        rest = [other for other in columns if other != column]
+        after = int((_sizes(data, rest) == 1).sum())
+        expected[column] = (after, all_unique - after, round((all_unique - after) / data[column].nunique(), 1))
+    results = rank_column_removals(data, columns)
+    assert {row[0]: tuple(row[1:]) for row in results} == expected
+    assert [row[3] for row in results] == sorted((row[3] for row in results), reverse=True)
@@ -0,0 +1,42 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hierarchies import Hierarchy, NodeEvaluator
+from lattice import LatticeSearch
+
+LETTERS = list('abcdef')
+PAIRS = {'a': 'ab', 'b': 'ab', 'c': 'cd', 'd': 'cd', 'e': 'ef', 'f': 'ef'}
+
+
+def _nodes(search):
+    return itertools.product(*[range(height + 1) for height in search.heights])
+
+
+def _assert_agree(data, hierarchies, sensitive_attr=None, **criteria):
+    # Rolled-up class tables must score every node as a scan of the rows does
+    search = LatticeSearch(data, hierarchies, sensitive_attr)
+    evaluator = NodeEvaluator(data, hierarchies, sensitive_attr)
+    for node in _nodes(search):
+        expected = evaluator.evaluate(node, **criteria)
+        result = search.check(node, **criteria)
+        assert {key: result[key] for key in expected} == expected, node
+
+
+@pytest.mark.parametrize('k', [2, 3, 4])
+def test_single_column_with_values_absent_from_the_data(k):
+    # d and e are in the hierarchy but not in the data
+    data = pd.DataFrame({'X': list('aaabbbccf')})
+    hierarchy = Hierarchy.from_mappings('X', LETTERS, [PAIRS])
+    _assert_agree(data, {'X': hierarchy}, k=k)
+
+
+def test_several_columns_with_sensitive_attribute():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'X': rng.choice(list('abcf'), 300), 'AGE': rng.integers(20, 60, 300),
+                         'S': rng.choice(['p', 'q', 'r'], 300)})
+    hierarchies = {'X': Hierarchy.from_mappings('X', LETTERS, [PAIRS]),
+                   'AGE': Hierarchy.intervals('AGE', list(range(0, 100)), (5, 10, 20))}
+    _assert_agree(data, hierarchies, 'S', k=3, max_suppression=0.1, l=2)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from linkage import linkage_attack, simulate_linkage
+
+COLUMNS = ['age', 'zip', 'sex']
+
+
+def _population(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'id': np.arange(rows),
+        'age': rng.integers(20, 70, rows),
+        'zip': rng.choice(['1000', '1001', '1002', '1003', '1004'], rows),
+        'sex': rng.choice(['f', 'm'], rows).astype(object),
+    })
+    data.loc[rng.random(rows) < 0.02, 'sex'] = np.nan
+    return data
+
+
+def _release(population, rows=500, seed=1):
+    # A sample of the population plus records of people outside it
+    rng = np.random.default_rng(seed)
+    sample = population.sample(rows, random_state=seed)
+    outsiders = _population(50, seed + 1).assign(id=lambda frame: frame['id'] + len(population), age=lambda frame: frame['age'] + 100)
+    return pd.concat([sample, outsiders], ignore_index=True).iloc[rng.permutation(rows + 50)].reset_index(drop=True)
+
+
+def _matches(release, population):
+    # Population rows sharing each released record's tuple; a missing QI matches nothing
+    counts = population.groupby(COLUMNS).size().rename('matches').reset_index()
+    return release[COLUMNS].merge(counts, on=COLUMNS, how='left')['matches'].fillna(0).astype(np.int64).to_numpy()
+
+
+def test_matches_agree_with_a_groupby_merge():
+    population = _population()
+    release = _release(population)
+    report, matches = linkage_attack(release, population, COLUMNS)
+    expected = _matches(release, population)
+    np.testing.assert_array_equal(matches.to_numpy(), expected)
+    assert report['matched_records'] == (expected > 0).sum()
+    assert report['unique_matches'] == (expected == 1).sum()
+    assert report['expected_reidentifications'] == pytest.approx((1 / expected[expected > 0]).sum())
+    assert report['median_matches'] == np.median(expected[expected > 0])
+
+
+def test_numbers_match_whatever_their_dtype():
+    population = _population()
+    release = _release(population)
+    # 30 in the release matches 30.0 in the population, and text matches categories
+    converted = population.assign(age=population['age'].astype(float), zip=population['zip'].astype('category'))
+    _, matches = linkage_attack(release, converted, COLUMNS)
+    np.testing.assert_array_equal(matches.to_numpy(), _matches(release, population))
+
+
+def test_correct_reidentifications_check_the_identifier():
+    population = _population()
+    release = _release(population)
+    report, matches = linkage_attack(release, population, COLUMNS, id_column='id')
+    unique = release[matches.to_numpy() == 1]
+    owners = population.dropna().groupby(COLUMNS)['id'].first().rename('owner').reset_index()
+    found = unique.merge(owners, on=COLUMNS, how='left')
+    assert report['correct_reidentifications'] == int((found['owner'] == found['id']).sum()) == len(unique)
+    # A release that hides who is who is never re-identified correctly
+    shuffled = release.assign(id=release['id'].sample(frac=1, random_state=0).to_numpy())
+    report, _ = linkage_attack(shuffled, population, COLUMNS, id_column='id')
+    assert report['correct_reidentifications'] < len(unique) / 2
+
+
+def test_generalization_lowers_the_re_identifications():
+    population = _population()
+    release = _release(population)
+    results, per_record = simulate_linkage(release, population, COLUMNS, {'age': lambda ages: ages // 10 * 10})
+    generalized = population.assign(age=population['age'] // 10 * 10)
+    np.testing.assert_array_equal(per_record['generalized_matches'].to_numpy(),
+                                  _matches(release.assign(age=release['age'] // 10 * 10), generalized))
+    assert results['generalized']['expected_reidentifications'] < results['exact']['expected_reidentifications']
+    with pytest.raises(ValueError):
+        simulate_linkage(release, population[['id']], COLUMNS)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from live_metrics import LiveMetrics
+
+COLUMNS = ['age', 'zip', 'sex']
+
+
+def _frame(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'age': rng.integers(20, 40, rows).astype(float),
+        'zip': rng.choice(['1000', '1001', '1002', '1003'], rows),
+        'sex': rng.choice(['f', 'm'], rows).astype(object),
+        'disease': rng.choice(['flu', 'cold', 'cancer', 'asthma'], rows),
+    })
+    data.loc[rng.random(rows) < 0.05, 'age'] = np.nan
+    data.loc[rng.random(rows) < 0.05, 'sex'] = np.nan
+    return data
+
+
+def _expected(data):
+    # Rows with a missing quasi-identifier belong to no class
+    sizes = data.groupby(COLUMNS).size()
+    diversity = data.groupby(COLUMNS)['disease'].nunique()
+    return {
+        'classes': len(sizes),
+        'unique_rows': int((sizes == 1).sum()),
+        'k_anonymity': int(sizes.min()),
+        'l_diversity': int(diversity.min()),
+    }
+
+
+def _check(live, data):
+    result = live.metrics()
+    assert {key: result[key] for key in ['classes', 'unique_rows', 'k_anonymity', 'l_diversity']} == _expected(data)
+    assert result['t_closeness'] == pytest.approx(LiveMetrics(data, COLUMNS, 'disease').metrics()['t_closeness'])
+
+
+def test_initial_metrics_match_groupby():
+    data = _frame()
+    _check(LiveMetrics(data, COLUMNS, 'disease'), data)
+
+
+def test_merges_match_a_regrouped_frame():
+    data = _frame()
+    live = LiveMetrics(data, COLUMNS, 'disease')
+    for column, values, replacement in [('zip', ['1000', '1001'], '100*'), ('sex', ['f', 'm'], '*'),
+                                        ('zip', ['100*', '1002'], '10**')]:
+        live.merge_values(column, values, replacement)
+        data[column] = data[column].astype(object).where(~data[column].isin(values), replacement)
+        _check(live, data)
+
+
+def test_merging_the_missing_value_puts_its_rows_back_in_classes():
+    data = _frame()
+    live = LiveMetrics(data, COLUMNS, 'disease')
+    live.merge_values('sex', [np.nan, 'f'], 'f/?')
+    data['sex'] = data['sex'].where(data['sex'].notna() & (data['sex'] != 'f'), 'f/?')
+    _check(live, data)
+
+
+def test_replaced_columns_match_a_regrouped_frame():
+    data = _frame()
+    live = LiveMetrics(data, COLUMNS, 'disease')
+    data['age'] = (data['age'] / 5).round() * 5
+    live.replace_column('age', data['age'])
+    _check(live, data)
+    data['zip'] = data['zip'].str[:3]
+    live.replace_column('zip', data['zip'])
+    _check(live, data)
+    data['disease'] = data['disease'].where(data['disease'] != 'asthma', 'flu')
+    live.replace_sensitive(data['disease'])
+    _check(live, data)
+
+
+def test_a_single_column():
+    data = _frame()
+    live = LiveMetrics(data, ['zip'])
+    data['zip'] = data['zip'].where(data['zip'] != '1003', '1002')
+    live.replace_column('zip', data['zip'])
+    sizes = data['zip'].value_counts()
+    assert live.metrics() == {'classes': len(sizes), 'unique_rows': 0, 'k_anonymity': int(sizes.min())}
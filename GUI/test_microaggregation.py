@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from microaggregation import aggregate, cluster_labels, information_loss, kd_blocks, mdav, microaggregate, standardize
+
+COLUMNS = ['age', 'income']
+
+
+def _frame(rows=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'age': rng.integers(18, 90, rows).astype(float),
+        'income': rng.lognormal(10, 1, rows),
+    })
+    data.loc[rng.random(rows) < 0.03, 'income'] = np.nan
+    return data
+
+
+@pytest.mark.parametrize('k', [2, 3, 5, 10])
+def test_clusters_have_between_k_and_2k_rows(k):
+    data = _frame()
+    # Small blocks, so MDAV runs in many blocks at once
+    labels = cluster_labels(data, COLUMNS, k, block_size=64)
+    sizes = pd.Series(labels[labels >= 0]).value_counts()
+    assert sizes.min() >= k
+    assert sizes.max() < 2 * k
+    assert sorted(sizes.index) == list(range(len(sizes)))
+
+
+def test_clusters_stay_within_their_block():
+    points = standardize(_frame().dropna(), COLUMNS)
+    blocks = kd_blocks(points, 64)
+    assert sorted(np.concatenate(blocks)) == list(range(len(points)))
+    assert min(len(block) for block in blocks) >= 32
+    labels = mdav(points, blocks, 5)
+    for block in blocks:
+        assert not np.isin(labels[block], np.delete(labels, block)).any()
+
+
+def test_the_aggregated_columns_are_cluster_means_and_k_anonymous():
+    data = _frame()
+    aggregated, labels, loss = microaggregate(data, COLUMNS, 5, block_size=64)
+    complete = data[COLUMNS].notna().all(axis=1).to_numpy()
+    means = data[complete].groupby(labels[complete])[COLUMNS].transform('mean')
+    for column in COLUMNS:
+        np.testing.assert_allclose(aggregated[column][complete], means[column])
+    assert pd.DataFrame(aggregated)[complete].groupby(COLUMNS).size().min() >= 5
+    assert 0 < loss < 1
+
+
+def test_rows_with_a_missing_value_are_left_alone():
+    data = _frame()
+    aggregated, labels, _ = microaggregate(data, COLUMNS, 3, block_size=64)
+    missing = data[COLUMNS].isna().any(axis=1).to_numpy()
+    assert (labels[missing] == -1).all() and (labels[~missing] >= 0).all()
+    pd.testing.assert_series_equal(aggregated['age'][missing], data['age'][missing])
+
+
+def test_information_loss_bounds():
+    data = _frame().dropna()
+    # Clusters of one row change nothing; one cluster of every row makes every value the mean
+    assert microaggregate(data, COLUMNS, 1)[2] == pytest.approx(0)
+    labels = np.zeros(len(data), dtype=np.int64)
+    aggregated = {column: aggregate(data[column], labels) for column in COLUMNS}
+    pd.testing.assert_series_equal(aggregated['age'], pd.Series(data['age'].mean(), index=data.index, name='age'))
+    assert information_loss(data, aggregated, COLUMNS) == pytest.approx(1)
+
+
+def test_invalid_k():
+    data = _frame(20)
+    with pytest.raises(ValueError):
+        cluster_labels(data, COLUMNS, 0)
+    with pytest.raises(ValueError):
+        cluster_labels(data, COLUMNS, 50)
@@ -0,0 +1,74 @@
+import itertools
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qi_optimizer import SubsetScorer, optimize_subsets
+
+
+def _frame(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({f'q{i}': rng.integers(0, cardinality, rows) for i, cardinality in enumerate([2, 3, 4, 6, 9, 12])})
+    data.loc[rng.random(rows) < 0.05, 'q2'] = np.nan
+    return data
+
+
+def _k(data, kept):
+    # Missing values count as a value of their own, as in SubsetScorer
+    if not kept:
+        return len(data)
+    return int(data.groupby(kept, dropna=False).size().min())
+
+
+def _smallest_removals(data, target_k):
+    columns = list(data.columns)
+    for size in range(len(columns) + 1):
+        found = [set(removed) for removed in itertools.combinations(columns, size)
+                 if _k(data, [column for column in columns if column not in removed]) >= target_k]
+        if found:
+            return found
+    return []
+
+
+def test_scores_match_groupby():
+    data = _frame()
+    scorer = SubsetScorer(data, data.columns)
+    for removed in [(), ('q5',), ('q0', 'q4'), ('q1', 'q3', 'q5')]:
+        kept = [column for column in data.columns if column not in removed]
+        sizes = data.groupby(kept, dropna=False).size()
+        assert scorer.score(removed) == (int(sizes.min()), int((sizes == 1).sum()))
+
+
+@pytest.mark.parametrize('target_k', [2, 5, 20])
+def test_branch_and_bound_finds_every_smallest_removal(target_k):
+    data = _frame()
+    results, _ = optimize_subsets(data, list(data.columns), target_k)
+    expected = _smallest_removals(data, target_k)
+    assert sorted(map(sorted, (set(result['removed']) for result in results))) == sorted(map(sorted, expected))
+    for result in results:
+        assert result['k_anonymity'] == _k(data, result['kept']) >= target_k
+
+
+@pytest.mark.parametrize('strategy', ['greedy', 'beam'])
+def test_heuristics_reach_k(strategy):
+    data = _frame()
+    smallest = len(_smallest_removals(data, 5)[0])
+    [result], _ = optimize_subsets(data, list(data.columns), 5, strategy)
+    assert result['k_anonymity'] == _k(data, result['kept']) >= 5
+    assert len(result['removed']) >= smallest
+
+
+def test_beam_ties_do_not_depend_on_the_hash_seed():
+    # Ties between candidate sets must not follow the string hashes
+    script = ("import numpy as np, pandas as pd; from qi_optimizer import optimize_subsets; "
+              "rng = np.random.default_rng(0); "
+              "data = pd.DataFrame({c: rng.integers(0, 3, 40).astype(str) for c in 'ABCDEFGH'}); "
+              "print(optimize_subsets(data, list(data.columns), 3, 'beam', beam_width=2)[0][0]['removed'])")
+    outputs = {subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env={**os.environ, 'PYTHONHASHSEED': str(seed)}).stdout for seed in range(4)}
+    assert len(outputs) == 1
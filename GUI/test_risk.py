@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk import RiskProfile, population_class_sizes, record_risks
+
+COLUMNS = ['age', 'zip', 'sex']
+
+
+def _frame(rows, seed):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'age': rng.integers(20, 30, rows),
+        'zip': rng.choice(['1000', '1001', '1002'], rows),
+        'sex': rng.choice(['f', 'm'], rows).astype(object),
+    })
+    data.loc[rng.random(rows) < 0.05, 'sex'] = np.nan
+    return data
+
+
+def _class_sizes(data, reference):
+    # Size in `reference` of each row's class of `data`; missing values are a value of their own
+    counts = reference.groupby(COLUMNS, dropna=False).size().rename('size').reset_index()
+    return data[COLUMNS].merge(counts, on=COLUMNS, how='left')['size'].fillna(0).to_numpy()
+
+
+def test_prosecutor_risk_is_one_over_the_class_size():
+    data = _frame(400, 0)
+    profile = RiskProfile.from_frame(data, COLUMNS)
+    np.testing.assert_allclose(profile.prosecutor, 1 / _class_sizes(data, data), rtol=1e-6)
+    np.testing.assert_allclose(profile.journalist, profile.prosecutor)
+
+
+def test_journalist_risk_uses_the_population_class_sizes():
+    sample = _frame(300, 1)
+    # The sample plus other people; one chunk of 250 rows at a time
+    population = pd.concat([sample, _frame(2000, 2)], ignore_index=True)
+    classes, sizes = population_class_sizes(sample, population, COLUMNS, chunksize=250)
+    np.testing.assert_array_equal(sizes[classes.group_codes], _class_sizes(sample, population))
+    profile = RiskProfile.from_frame(sample, COLUMNS, population=population)
+    np.testing.assert_allclose(profile.journalist, 1 / _class_sizes(sample, population), rtol=1e-6)
+
+
+def test_population_smaller_than_the_sample_class_is_raised_to_it():
+    sample = _frame(200, 3)
+    profile = RiskProfile.from_frame(sample, COLUMNS, population=sample.iloc[:50])
+    assert (profile.journalist <= profile.prosecutor + 1e-7).all()
+
+
+def test_sampling_fraction_estimates_population_sizes():
+    data = _frame(400, 4)
+    profile = RiskProfile.from_frame(data, COLUMNS, sampling_fraction=0.1)
+    np.testing.assert_allclose(profile.journalist, 1 / np.ceil(_class_sizes(data, data) / 0.1), rtol=1e-6)
+
+
+def test_summary():
+    data = _frame(400, 5)
+    risks, summary = record_risks(data, COLUMNS, threshold=0.25)
+    expected = 1 / _class_sizes(data, data)
+    assert summary['records'] == len(data)
+    assert summary['prosecutor']['max'] == pytest.approx(expected.max())
+    assert summary['prosecutor']['mean'] == pytest.approx(expected.mean(), rel=1e-6)
+    assert summary['prosecutor']['share_above_threshold'] == pytest.approx((expected > 0.25).mean())
+    assert summary['marketer']['mean'] == summary['journalist']['mean']
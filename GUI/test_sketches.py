@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import HyperLogLog, StreamingSummary, column_hashes, row_hashes, sketch_file, sketch_frame
+
+COLUMNS = ['age', 'zip', 'sex']
+
+
+def _frame(rows, seed, ages=60, zips=200):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'age': rng.integers(0, ages, rows).astype(str),
+        'zip': rng.integers(0, zips, rows).astype(str),
+        'sex': rng.choice(['f', 'm'], rows).astype(object),
+    })
+    data.loc[rng.random(rows) < 0.02, 'sex'] = np.nan
+    return data
+
+
+def _exact(data, k):
+    # Rows with a missing quasi-identifier are skipped
+    sizes = data.groupby(COLUMNS).size()
+    return {
+        'rows': int(sizes.sum()),
+        'classes': len(sizes),
+        'unique_rows': int((sizes == 1).sum()),
+        'classes_below_k': int((sizes < k).sum()),
+        'records_below_k': int(sizes[sizes < k].sum()),
+        'k_anonymity_at_most': int(sizes.min()),
+    }
+
+
+def _covers(interval, value):
+    return interval['low'] <= value <= interval['high']
+
+
+def test_row_hashes_group_like_groupby():
+    data = _frame(5000, 0).dropna()
+    hashes = row_hashes([column_hashes(data[column]) for column in COLUMNS])
+    assert len(np.unique(hashes)) == len(data.groupby(COLUMNS).size())
+    # Equal values hash equally whatever the dtype of the column
+    np.testing.assert_array_equal(column_hashes(data['zip']), column_hashes(data['zip'].astype('category')))
+
+
+def test_hyperloglog_is_within_its_error():
+    rng = np.random.default_rng(1)
+    for distinct in [100, 5000, 200_000]:
+        sketch = HyperLogLog()
+        values = pd.Series(rng.permutation(distinct * 3) % distinct)
+        for chunk in np.array_split(column_hashes(values), 5):
+            sketch.update(chunk)
+        assert sketch.estimate() == pytest.approx(distinct, rel=3 * sketch.relative_error())
+
+
+def test_summary_is_exact_while_the_sample_holds_every_class():
+    data = _frame(20_000, 2)
+    summary = sketch_frame(data, COLUMNS, k=5, chunksize=3000)
+    assert summary['exact']
+    expected = _exact(data, 5)
+    assert summary['rows'] == expected['rows']
+    assert summary['k_anonymity_at_most'] == expected['k_anonymity_at_most']
+    for key in ['classes', 'unique_rows', 'classes_below_k', 'records_below_k']:
+        assert summary[key]['low'] == summary[key]['estimate'] == summary[key]['high'] == expected[key]
+    assert summary['k_below_threshold'] == (expected['k_anonymity_at_most'] < 5)
+
+
+def test_sampled_summary_covers_the_exact_values():
+    data = _frame(50_000, 0, ages=80, zips=500)
+    summary = StreamingSummary(COLUMNS, k=5, sample_size=2000)
+    for start in range(0, len(data), 7000):
+        summary.update(data.iloc[start:start + 7000])
+    result = summary.summary()
+    assert not result['exact']
+    expected = _exact(data, 5)
+    for key in ['classes', 'unique_rows', 'classes_below_k', 'records_below_k']:
+        assert _covers(result[key], expected[key]), key
+    assert result['k_anonymity_at_most'] >= expected['k_anonymity_at_most']
+    for column in COLUMNS:
+        assert result['column_distinct'][column] == pytest.approx(data[column].nunique(), rel=3 * HyperLogLog().relative_error())
+
+
+def test_file_and_frame_give_the_same_summary(tmp_path):
+    data = _frame(10_000, 4)
+    path = tmp_path / 'data.csv'
+    data.to_csv(path, index=False)
+    assert sketch_file(str(path), COLUMNS, chunksize=1500) == sketch_frame(data, COLUMNS, chunksize=2500)
@@ -0,0 +1,185 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from dp_noise import add_noise
+from hierarchies import Hierarchy, relabel_categories
+from microaggregation import aggregate
+
+KINDS = ('round', 'noise', 'merge', 'microaggregate', 'revert')
+# Edits that do not depend on the rows, so they generalize another table the same way
+REPLAYABLE = ('round', 'merge')
+
+
+def merge_values(values, selected_values, replacement):
+    # Replace every selected value by `replacement`. The column is merged through its
+    # categorical codes, so the cost is in the number of distinct values, not of rows.
+    def relabel(categories):
+        labels = np.asarray(categories, dtype=object).copy()
+        labels[categories.isin(selected_values)] = replacement
+        return labels
+    return relabel_categories(values, relabel)
+
+
+def distinct_values(values):
+    # Values a merge can choose from: the categories of a categorical column (no scan of the
+    # rows), otherwise the distinct non-missing values
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return list(values.cat.categories)
+    return list(values.dropna().unique())
+
+
+class Operation:
+    # One recorded edit: what it is, which columns it touches and what is needed to replay
+    # it exactly (rounding factor, noise seed and bounds, merged values, MDAV clusters)
+    _serials = itertools.count()
+
+    def __init__(self, kind, columns, params=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown operation {kind!r}; expected one of {KINDS}")
+        self.kind = kind
+        self.columns = list(columns)
+        self.params = params or {}
+        self.serial = next(self._serials)
+
+    def apply(self, column, values):
+        if self.kind == 'round':
+            factor = self.params['factor']
+            return (values / factor).round() * factor
+        if self.kind == 'merge':
+            return merge_values(values, self.params['values'], self.params['replacement'])
+        if self.kind == 'noise':
+            release = self.params['releases'][column]
+            noisy, _ = add_noise(values.to_frame(column), [column], release['mechanism'], release['epsilon'],
+                                 release['delta'], bounds={column: release['bounds']}, seed=release['seed'])
+            return pd.Series(noisy[column], index=values.index, name=column)
+        if self.kind == 'microaggregate':
+            return aggregate(values, self.params['labels'])
+        raise ValueError(f"{self.kind!r} is not applied to values")
+
+    def describe(self):
+        columns = ", ".join(self.columns)
+        if self.kind == 'round':
+            return f"Round {columns} to {self.params['factor']:g}"
+        if self.kind == 'merge':
+            return f"Merge {', '.join(map(str, self.params['values']))} into {self.params['replacement']} in {columns}"
+        if self.kind == 'noise':
+            release = next(iter(self.params['releases'].values()))
+            return f"{release['mechanism'].capitalize()} noise (epsilon {release['epsilon']:g}) on {columns}"
+        if self.kind == 'microaggregate':
+            return f"Microaggregate {columns} (MDAV, k {self.params['k']})"
+        return f"Revert {columns}"
+
+
+class TransformJournal:
+    # Edits of a loaded frame kept as a list of operations instead of data copies. The base
+    # frame is never modified; a column's current values are rebuilt on demand by replaying
+    # the applied operations that touch it, and only the latest state of each edited column
+    # is kept, so memory does not grow with the number of edits. operations[:position] are
+    # applied, the rest can be redone.
+    def __init__(self, base):
+        self.base = base
+        self.operations = []
+        self.position = 0
+        self._states = {}
+
+    def frame(self):
+        # The current data: the base columns shared, edited columns replaced
+        data = self.base.copy(deep=False)
+        for column in self.modified_columns():
+            data[column] = self.column(column)
+        return data
+
+    def column(self, column):
+        key = self._history_key(column)
+        state = self._states.get(column)
+        if state is not None and state[0] == key:
+            return state[1]
+        values = self.base[column]
+        for operation in self._replayed(column):
+            values = operation.apply(column, values)
+        self._states[column] = (key, values)
+        return values
+
+    def history(self, columns):
+        # State of the columns when a background job takes its snapshot of them, for record()
+        return {column: self._history_key(column) for column in columns}
+
+    def record(self, kind, columns, params=None, results=None, based_on=None):
+        # Apply and record an operation; `results` passes values that were already computed
+        # (e.g. noise drawn on a worker thread) so they are not computed twice. With based_on
+        # (history() at the snapshot) results of a column edited since are dropped and the
+        # operation is applied to its current values, as a replay would.
+        if results is not None and based_on is not None:
+            results = {column: values for column, values in results.items()
+                       if based_on.get(column) == self._history_key(column)}
+        del self.operations[self.position:]
+        operation = Operation(kind, columns, params)
+        current = {column: self.column(column) for column in operation.columns}
+        self.operations.append(operation)
+        self.position += 1
+        for column in operation.columns:
+            if kind == 'revert':
+                values = self.base[column]
+            elif results is not None and column in results:
+                values = pd.Series(results[column], index=current[column].index, name=column)
+            else:
+                values = operation.apply(column, current[column])
+            self._states[column] = (self._history_key(column), values)
+        return operation
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.operations)
+
+    def undo(self):
+        # Columns whose values changed, or [] when there is nothing to undo
+        if not self.can_undo():
+            return []
+        self.position -= 1
+        return self.operations[self.position].columns
+
+    def redo(self):
+        if not self.can_redo():
+            return []
+        self.position += 1
+        return self.operations[self.position - 1].columns
+
+    def applied(self):
+        return self.operations[:self.position]
+
+    def modified_columns(self):
+        return list(dict.fromkeys(column for operation in self.applied() for column in operation.columns
+                                  if self._replayed(column)))
+
+    def merges(self, column):
+        # (merged values, replacement) of the applied merges of a column, oldest first
+        return [(operation.params['values'], operation.params['replacement']) for operation in self._replayed(column)
+                if operation.kind == 'merge']
+
+    def replayable(self, column):
+        # The applied edits of a column when all of them can be applied to another table's
+        # values of it (e.g. an attacker's), otherwise None
+        operations = self._replayed(column)
+        if any(operation.kind not in REPLAYABLE for operation in operations):
+            return None
+        return operations
+
+    def hierarchy(self, column):
+        # The applied merges of a column as a generalization hierarchy, one level per merge,
+        # to export and apply to other files
+        return Hierarchy.from_merges(column, distinct_values(self.base[column]), self.merges(column))
+
+    def _history_key(self, column):
+        return tuple(operation.serial for operation in self.applied() if column in operation.columns)
+
+    def _replayed(self, column):
+        # Applied operations on a column after its last revert
+        replayed = []
+        for operation in self.applied():
+            if column in operation.columns:
+                replayed = [] if operation.kind == 'revert' else replayed + [operation]
+        return replayed